@@ -16,7 +16,7 @@ from pydantic import BaseModel
 import pytz
 from aio_pika import IncomingMessage, Connection, Channel
 from dotenv import load_dotenv
-from sqlalchemy import or_, update, func
+from sqlalchemy import update, func
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session, aliased
 
@@ -54,6 +54,18 @@ from schemas.scripts.audience_source import (
     DataBodyFromSource,
 )
 from services.sources.math import AudienceSourceMath
+from services.sources.staging import (
+    StagedPerson,
+    copy_staged_persons,
+    merge_staged_persons,
+)
+from services.sources.scoring import (
+    professional_scores,
+    score_customer_conversion_b2b,
+    score_customer_conversion_b2c,
+    score_failed_leads,
+    score_interest_leads,
+)
 from models.audience_sources import AudienceSource
 from models.audience_sources_matched_persons import AudienceSourcesMatchedPerson
 from config.rmq_connection import (
@@ -135,154 +147,38 @@ async def process_matching(
             include_amount=include_amount,
         )
 
-    db_session.commit()
-    with db_session.begin():
-        keys = list(matched_persons.keys())
-        emails_to_query = [k for k in keys if not k.startswith("asid:")]
-        asids_to_query = [
-            k.split("asid:")[1] for k in keys if k.startswith("asid:")
-        ]
-
-        query = db_session.query(AudienceSourcesMatchedPerson).filter(
-            AudienceSourcesMatchedPerson.source_id == source_id
+    reference_date = datetime.now()
+    staged_persons = [
+        StagedPerson(
+            email=data.get("email"),
+            enrichment_user_asid=data["enrichment_user_asid"],
+            count=data["orders_count"],
+            amount=data["orders_amount"] if include_amount else None,
+            start_date=data["start_date"],
+            recency=(
+                (reference_date - data["start_date"]).days
+                if data["start_date"]
+                else None
+            ),
         )
-        filters = []
-        if emails_to_query:
-            filters.append(
-                AudienceSourcesMatchedPerson.email.in_(emails_to_query)
-            )
-        if asids_to_query:
-            filters.append(
-                AudienceSourcesMatchedPerson.enrichment_user_asid.in_(
-                    asids_to_query
-                )
-            )
+        for data in matched_persons.values()
+        if data.get("enrichment_user_asid")
+    ]
 
-        if filters:
-            query = query.filter(or_(*filters))
-
-        rows = query.with_for_update().all()
-
-        existing_by_email = {}
-        existing_by_asid = {}
-        for p in rows:
-            if p.email:
-                existing_by_email[p.email] = p
-            if p.enrichment_user_asid:
-                existing_by_asid[str(p.enrichment_user_asid)] = p
+    db_session.commit()
+    if not staged_persons:
+        return 0
 
-        logging.info(
-            f"Found {len(rows)} existing persons to update (match_mode={match_mode})"
+    with db_session.begin():
+        copy_staged_persons(db_session, staged_persons)
+        count_matched_persons = merge_staged_persons(
+            db_session, source_id, include_amount
         )
 
-        reference_date = datetime.now()
-        matched_persons_to_update = []
-        matched_persons_to_add = []
-        count_matched_persons = 0
-
-        for key, data in matched_persons.items():
-            last_transaction = data["start_date"]
-            recency = (
-                (reference_date - last_transaction).days
-                if last_transaction
-                else None
-            )
-
-            candidate_email = data.get("email")
-            candidate_asid = data.get("enrichment_user_asid")
-
-            existing = None
-            if candidate_email and candidate_email in existing_by_email:
-                existing = existing_by_email[candidate_email]
-            elif candidate_asid and str(candidate_asid) in existing_by_asid:
-                existing = existing_by_asid[str(candidate_asid)]
-
-            if existing:
-                is_persisted = getattr(existing, "id", None) is not None
-                existing.count += data["orders_count"]
-                if include_amount:
-                    existing.amount = (existing.amount or 0) + (
-                        data["orders_amount"] or 0
-                    )
-
-                if last_transaction and (
-                    existing.start_date is None
-                    or last_transaction > existing.start_date
-                ):
-                    existing.start_date = last_transaction
-                    existing.recency = recency
-
-                if not existing.enrichment_user_asid and candidate_asid:
-                    existing.enrichment_user_asid = candidate_asid
-                    existing_by_asid[str(candidate_asid)] = existing
-                if not existing.email and candidate_email:
-                    existing.email = candidate_email
-                    existing_by_email[candidate_email] = existing
-
-                if is_persisted:
-                    matched_persons_to_update.append(
-                        {
-                            "id": existing.id,
-                            "count": existing.count,
-                            "amount": existing.amount
-                            if include_amount
-                            else None,
-                            "start_date": existing.start_date,
-                            "recency": existing.recency,
-                        }
-                    )
-                else:
-                    if existing not in matched_persons_to_add:
-                        matched_persons_to_add.append(existing)
-            else:
-                new_p = AudienceSourcesMatchedPerson(
-                    source_id=source_id,
-                    email=candidate_email,
-                    count=data["orders_count"],
-                    start_date=last_transaction,
-                    recency=recency,
-                    enrichment_user_asid=candidate_asid,
-                )
-                if include_amount:
-                    new_p.amount = data["orders_amount"]
-
-                matched_persons_to_add.append(new_p)
-
-                if candidate_email:
-                    existing_by_email[candidate_email] = new_p
-                if candidate_asid:
-                    existing_by_asid[str(candidate_asid)] = new_p
-
-        if matched_persons_to_add:
-            values_to_insert = [
-                {
-                    "source_id": p.source_id,
-                    "email": p.email,
-                    "count": p.count,
-                    "amount": p.amount if include_amount else None,
-                    "start_date": p.start_date,
-                    "recency": p.recency,
-                    "enrichment_user_asid": p.enrichment_user_asid,
-                }
-                for p in matched_persons_to_add
-            ]
-            stmt = insert(AudienceSourcesMatchedPerson).values(values_to_insert)
-            stmt = stmt.on_conflict_do_nothing(
-                index_elements=["source_id", "enrichment_user_asid"]
-            )
-            result = db_session.execute(stmt)
-            count_matched_persons = getattr(result, "rowcount", 0) or 0
-            logging.info(f"Adding {len(matched_persons_to_add)} new persons")
-
-        matched_persons_to_update = [
-            m for m in matched_persons_to_update if m.get("id")
-        ]
-        if matched_persons_to_update:
-            logging.info(f"Updating {len(matched_persons_to_update)} persons")
-            db_session.bulk_update_mappings(
-                AudienceSourcesMatchedPerson, matched_persons_to_update
-            )
-
+    logging.info(
+        f"Merged {len(staged_persons)} persons, {count_matched_persons} new "
+        f"(match_mode={match_mode})"
+    )
     return count_matched_persons
 
 
@@ -856,69 +752,21 @@ async def normalize_persons_customer_conversion(
     if min_inv > max_inv:
         min_inv, max_inv = max_inv, min_inv
 
-    has_recency_data = any(
-        (p.recency is not None) and (Decimal(str(p.recency)) > 0)
-        for p in persons
-    )
-
     if source_schema.lower() == BusinessType.B2C.value:
         # B2C Algorithm:
-        # For B2C, the LeadValueScore is based solely on the recency of failed lead attempts.
-        # We use the "start_date" field as LastFailedDate.
-        denom_amt = (
-            max_orders_amount - min_orders_amount
-            if max_orders_amount != min_orders_amount
-            else Decimal("0")
+        # The LeadValueScore combines the recency of the last order with the
+        # orders amount; without any dates only the amount counts.
+        amounts = [getattr(p, "sum_amount", 0) or 0 for p in persons]
+        scores = score_customer_conversion_b2c(
+            amounts=amounts,
+            recencies=[p.recency for p in persons],
+            amount_min=min_orders_amount,
+            amount_max=max_orders_amount,
+            inverted_min=min_inv,
+            inverted_max=max_inv,
         )
 
-        for person in persons:
-            # --- amount score (use normalize_decimal to handle min==max safely) ---
-            amt = Decimal(str(getattr(person, "sum_amount", 0) or 0))
-            if denom_amt == 0:
-                amt_score = Decimal("0.5")
-            else:
-                # normalized amount in [0..1]
-                amt_score = AudienceSourceMath.normalize_decimal(
-                    value=amt,
-                    min_val=min_orders_amount,
-                    max_val=max_orders_amount,
-                )
-
-            # --- recency handling ---
-            if has_recency_data:
-                if person.recency is None or Decimal(str(person.recency)) <= 0:
-                    # without date -> worst case
-                    rec_score = Decimal("0")
-                    inv = min_inv
-                else:
-                    # if date
-                    current_recency = Decimal(str(person.recency))
-                    inv = AudienceSourceMath.inverted_decimal(current_recency)
-
-                    # clamp
-                    if inv < min_inv:
-                        inv = min_inv
-                    if inv > max_inv:
-                        inv = max_inv
-
-                    rec_score = AudienceSourceMath.normalize_decimal(
-                        value=inv, min_val=min_inv, max_val=max_inv
-                    )
-
-                w1, w2 = Decimal("0.6"), Decimal("0.4")
-            else:
-                # if no one has dates at all — exclude recency from the formula
-                rec_score = Decimal("0")
-                inv = Decimal("0")
-                w1, w2 = Decimal("0.0"), Decimal("1.0")
-
-            # final score and clamp
-            lead_value = w1 * rec_score + w2 * amt_score
-            if lead_value < Decimal("0.0"):
-                lead_value = Decimal("0.0")
-            if lead_value > Decimal("1.0"):
-                lead_value = Decimal("1.0")
-
+        for idx, person in enumerate(persons):
             updates.append(
                 {
                     "id": person.id,
@@ -927,15 +775,15 @@ async def normalize_persons_customer_conversion(
                     "asid": getattr(person, "asid", None),
                     "recency_min": min_recency,
                     "recency_max": max_recency,
-                    "inverted_recency": inv,
+                    "inverted_recency": scores["inverted_recency"][idx],
                     "inverted_recency_min": min_inv,
                     "inverted_recency_max": max_inv,
-                    "amount": amt,
+                    "amount": Decimal(str(amounts[idx])),
                     "amount_min": min_orders_amount,
                     "amount_max": max_orders_amount,
-                    "recency_score": rec_score,
-                    "sum_score": amt_score,
-                    "value_score": lead_value,
+                    "recency_score": scores["recency_score"][idx],
+                    "sum_score": scores["sum_score"][idx],
+                    "value_score": scores["value_score"][idx],
                 }
             )
 
@@ -948,7 +796,6 @@ async def normalize_persons_customer_conversion(
         #    and non-null professional attributes.
         # For B2B also treat missing recency with the same sentinel logic so recency component
         # contributes minimally when order date is absent
-        sentinel_recency = max_recency
         matched_ids = [UUID(p.id) for p in persons]
 
         rows = (
@@ -969,95 +816,26 @@ async def normalize_persons_customer_conversion(
         )
 
         profile_map: dict[UUID, ProfContact] = {}
-        contact_map: dict[UUID, ProfContact] = {}
         for mp_id, asid in mp_to_asid.items():
             det = asid_to_details.get(asid)
             if det:
                 profile_map[mp_id] = det
-                contact_map[mp_id] = det
 
-        inverted_values = [
-            AudienceSourceMath.inverted_decimal(
-                Decimal(p.recency)
-                if p.recency is not None
-                else sentinel_recency
-            )
-            for p in persons
+        professional_scores_list = [
+            professional_scores(profile_map.get(mp_id)) for mp_id in matched_ids
         ]
-
-        job_level_map = {
-            "Executive": Decimal("1.0"),
-            "Senior": Decimal("0.8"),
-            "Manager": Decimal("0.6"),
-            "Entry": Decimal("0.4"),
-        }
-        department_map = {
-            "Sales": Decimal("1.0"),
-            "Marketing": Decimal("0.8"),
-            "Engineering": Decimal("0.6"),
-        }
-        company_size_map = {
-            "1000+": Decimal("1.0"),
-            "501-1000": Decimal("0.8"),
-            "101-500": Decimal("0.6"),
-            "51-100": Decimal("0.4"),
-        }
+        professional = [score for score, _ in professional_scores_list]
+        completeness = [score for _, score in professional_scores_list]
+        scores = score_customer_conversion_b2b(
+            recencies=[p.recency for p in persons],
+            sentinel_recency=max_recency,
+            professional=professional,
+            completeness=completeness,
+            inverted_min=min_inv,
+            inverted_max=max_inv,
+        )
 
         for idx, person in enumerate(persons):
-            if has_recency_data:
-                recency_inv = inverted_values[idx]
-                recency_score = AudienceSourceMath.normalize_decimal(
-                    recency_inv, min_inv, max_inv
-                )
-                w_rec = Decimal("0.4")
-            else:
-                recency_inv = Decimal("0")
-                recency_score = Decimal("0")
-                w_rec = Decimal("0.0")
-
-            prof = profile_map.get(UUID(person.id))
-            job_level = getattr(prof, "job_level", None)
-            department = getattr(prof, "department", None)
-            company_size = getattr(prof, "company_size", None)
-
-            job_level_weight = job_level_map.get(job_level, Decimal("0.2"))
-            department_weight = department_map.get(department, Decimal("0.4"))
-            company_size_weight = company_size_map.get(
-                company_size, Decimal("0.2")
-            )
-
-            professional_score = (
-                Decimal("0.5") * job_level_weight
-                + Decimal("0.3") * department_weight
-                + Decimal("0.2") * company_size_weight
-            )
-
-            completeness_score = Decimal("0.0")
-            contact = contact_map.get(UUID(person.id))
-            if (
-                contact
-                and contact.business_email
-                and contact.business_email_validation_status == "Valid"
-            ):
-                completeness_score += Decimal("0.4")
-            if contact and contact.linkedin_url:
-                completeness_score += Decimal("0.3")
-            if job_level:
-                completeness_score += Decimal("0.2")
-            if department:
-                completeness_score += Decimal("0.1")
-
-            if has_recency_data:
-                w_prof, w_comp = Decimal("0.4"), Decimal("0.2")
-            else:
-                w_prof, w_comp = Decimal("0.67"), Decimal("0.33")
-
-            lead_value_score_b2b = (
-                w_rec * recency_score
-                + w_prof * professional_score
-                + w_comp * completeness_score
-            )
-
             updates.append(
                 {
                     "id": person.id,
@@ -1065,13 +843,13 @@ async def normalize_persons_customer_conversion(
                     "email": person.email,
                     "recency_min": min_recency,
                     "recency_max": max_recency,
-                    "inverted_recency": recency_inv,
+                    "inverted_recency": scores["inverted_recency"][idx],
                     "inverted_recency_min": min_inv,
                     "inverted_recency_max": max_inv,
-                    "recency_score": recency_score,
-                    "view_score": professional_score,
-                    "sum_score": completeness_score,
-                    "value_score": lead_value_score_b2b,
+                    "recency_score": scores["recency_score"][idx],
+                    "view_score": professional[idx],
+                    "sum_score": completeness[idx],
+                    "value_score": scores["value_score"][idx],
                 }
             )
     else:
@@ -1128,35 +906,18 @@ async def normalize_persons_interest_leads(
 
     updates = []
 
-    for person in persons:
-        current_recency = (
-            Decimal(str(person.recency))
-            if person.recency is not None
-            else Decimal("0.0")
-        )
-        inverted_recency = AudienceSourceMath.inverted_decimal(
-            value=current_recency
-        )
-        recency_normalized = AudienceSourceMath.normalize_decimal(
-            value=inverted_recency,
-            min_val=inverted_min_recency,
-            max_val=inverted_max_recency,
-            coefficient=Decimal("0.5"),
-        )
-
-        orders_count = Decimal(str(person.count))
-        orders_count_score = AudienceSourceMath.normalize_decimal(
-            value=orders_count,
-            min_val=min_count,
-            max_val=max_count,
-            coefficient=Decimal("0.5"),
-        )
-
-        user_value_score = recency_normalized + orders_count_score
+    scores = score_interest_leads(
+        recencies=[p.recency for p in persons],
+        counts=[p.count for p in persons],
+        inverted_min=inverted_min_recency,
+        inverted_max=inverted_max_recency,
+        min_count=min_count,
+        max_count=max_count,
+    )
 
-        if user_value_score < Decimal("0.0") or user_value_score > Decimal(
-            "1.0"
-        ):
+    for idx, person in enumerate(persons):
+        user_value_score = scores["value_score"][idx]
+        if user_value_score < 0 or user_value_score > 1:
             logging.warning(
                 f"UserValueScore for person {person.id} out of bounds: {user_value_score}"
             )
@@ -1171,11 +932,11 @@ async def normalize_persons_interest_leads(
                 "count_max": max_count,
                 "recency_min": min_recency,
                 "recency_max": max_recency,
-                "inverted_recency": inverted_recency,
+                "inverted_recency": scores["inverted_recency"][idx],
                 "inverted_recency_max": inverted_max_recency,
                 "inverted_recency_min": inverted_min_recency,
-                "view_score": orders_count_score,
-                "recency_score": recency_normalized,
+                "view_score": scores["view_score"][idx],
+                "recency_score": scores["recency_score"][idx],
                 "value_score": user_value_score,
             }
         )
@@ -1226,19 +987,13 @@ async def normalize_persons_failed_leads(
 
     updates = []
 
-    for person in persons:
-        current_recency = (
-            Decimal(str(person.recency))
-            if person.recency is not None
-            else Decimal("0.0")
-        )
-        inverted_recency = AudienceSourceMath.inverted_decimal(current_recency)
-        value_score = AudienceSourceMath.normalize_decimal(
-            value=inverted_recency,
-            min_val=inverted_min_recency,
-            max_val=inverted_max_recency,
-        )
+    scores = score_failed_leads(
+        recencies=[p.recency for p in persons],
+        inverted_min=inverted_min_recency,
+        inverted_max=inverted_max_recency,
+    )
 
+    for idx, person in enumerate(persons):
         updates.append(
             {
                 "id": person.id,
@@ -1247,11 +1002,11 @@ async def normalize_persons_failed_leads(
                 "asid": person.asid,
                 "recency_min": min_recency,
                 "recency_max": max_recency,
-                "inverted_recency": inverted_recency,
+                "inverted_recency": scores["inverted_recency"][idx],
                 "inverted_recency_min": inverted_min_recency,
                 "inverted_recency_max": inverted_max_recency,
-                "recency_score": value_score,
-                "value_score": value_score,
+                "recency_score": scores["value_score"][idx],
+                "value_score": scores["value_score"][idx],
             }
         )
 
@@ -6,11 +6,11 @@ import os
 import sys
 import time
 from collections import Counter
-from datetime import datetime, timezone
 from typing import Any
 
+from clickhouse_connect import common as clickhouse_common
 from clickhouse_connect.driver import AsyncClient
-from sqlalchemy import Row, update
+from sqlalchemy import Row
 from typing import List, Tuple, Dict
 
 from domains.leads.entities import DelivrUser, LeadUserAdapter as LeadUser
@@ -26,11 +26,19 @@ sys.path.append(parent_dir)
 
 from services.exceptions import InsufficientCreditsError, MillionVerifierError
 from resolver import Resolver
+from db_dependencies import AsyncClickHouse, Db
+from config.database import SessionLocal
+from config.http import HttpConfig, close_http_clients, get_async_http_pool
 from config.sentry import SentryConfig
+from config.util import try_get_int_env
 from sqlalchemy.exc import PendingRollbackError
 from dotenv import load_dotenv
 from utils import get_utc_aware_date
-from config.rmq_connection import publish_rabbitmq_message_with_channel
+from config.rmq_connection import (
+    declare_delay_queues,
+    publish_delayed_message,
+    publish_rabbitmq_message_with_channel,
+)
 from enums import (
     ProccessDataSyncResult,
     DataSyncImportedStatus,
@@ -38,14 +46,16 @@ from enums import (
     NotificationTitles,
 )
 from models.data_sync_imported_leads import DataSyncImportedLead
+from persistence.data_sync_imported_lead import update_imported_lead_statuses
 from models.integrations.integrations_users_sync import IntegrationUserSync
 from models.integrations.users_domains_integrations import UserIntegration
 from models.five_x_five_users import FiveXFiveUser
 from sqlalchemy.orm import Session
 from aio_pika import IncomingMessage
+from aio_pika.abc import AbstractChannel
 from config.rmq_connection import RabbitMQConnection
 from services.integrations.base import IntegrationService
-from db_dependencies import Db
+from services.integrations.rate_limit import RateKey, get_rate_limiter
 from dependencies import (
     NotificationPersistence,
 )
@@ -53,6 +63,19 @@ from dependencies import (
 load_dotenv()
 
 CRON_DATA_SYNC_LEADS = "cron_data_sync_leads"
+THROTTLE_ATTEMPTS_HEADER = "x-throttle-attempts"
+MAX_THROTTLE_ATTEMPTS = 10
+CONCURRENCY = try_get_int_env("DATA_SYNC_WORKER_CONCURRENCY") or 16
+"""
+Messages processed at once by one worker process
+"""
+INTEGRATION_CONCURRENCY = (
+    try_get_int_env("DATA_SYNC_WORKER_INTEGRATION_CONCURRENCY") or 2
+)
+"""
+Messages of one customer integration processed at once, the rest wait in
+the shortest delay queue so other integrations get the free slots
+"""
 
 for handler in logging.root.handlers[:]:
     logging.root.removeHandler(handler)
@@ -279,63 +302,28 @@ def update_users_integrations(
 
 def bulk_update_imported_leads(
     session: Session,
-    updates: list[dict],
+    updates_pg: list[dict],
+    updates_ch: list[dict],
     integration_data_sync: IntegrationUserSync,
     user_integration: UserIntegration,
 ):
-    for update_item in updates:
-        stmt = (
-            update(DataSyncImportedLead)
-            .where(
-                DataSyncImportedLead.lead_users_id == update_item["lead_id"],
-                DataSyncImportedLead.data_sync_id == integration_data_sync.id,
-            )
-            .values(
-                status=update_item["status"],
-                updated_at=datetime.now(timezone.utc).replace(tzinfo=None),
-            )
-        )
-        session.execute(stmt)
-
-    has_success = any(
-        u["status"] == ProccessDataSyncResult.SUCCESS.value for u in updates
-    )
-
-    if has_success:
-        integration_data_sync.last_sync_date = get_utc_aware_date()
-        if not integration_data_sync.sync_status:
-            integration_data_sync.sync_status = True
-
-        if user_integration.is_failed:
-            user_integration.is_failed = False
-            user_integration.error_message = None
-
-    session.commit()
-
-
-def bulk_update_imported_leads_ch(
-    session: Session,
-    updates: list[dict],
-    integration_data_sync: IntegrationUserSync,
-    user_integration: UserIntegration,
-):
-    """Bulk status update for ClickHouse-sourced records by ch_lead_id."""
-    for update_item in updates:
-        stmt = (
-            update(DataSyncImportedLead)
-            .where(
-                DataSyncImportedLead.ch_lead_id == update_item["lead_id"],
-                DataSyncImportedLead.data_sync_id == integration_data_sync.id,
-            )
-            .values(
-                status=update_item["status"],
-                updated_at=datetime.now(timezone.utc).replace(tzinfo=None),
-            )
+    """Writes back the statuses of a message, one UPDATE per id space:
+    lead_users_id for PG-sourced records, ch_lead_id for ClickHouse ones.
+    """
+    for lead_column, updates in (
+        (DataSyncImportedLead.lead_users_id, updates_pg),
+        (DataSyncImportedLead.ch_lead_id, updates_ch),
+    ):
+        update_imported_lead_statuses(
+            session,
+            integration_data_sync.id,
+            lead_column,
+            ((u["lead_id"], u["status"]) for u in updates),
         )
-        session.execute(stmt)
 
     has_success = any(
-        u["status"] == ProccessDataSyncResult.SUCCESS.value for u in updates
+        u["status"] == ProccessDataSyncResult.SUCCESS.value
+        for u in updates_pg + updates_ch
     )
 
     if has_success:
@@ -390,10 +378,34 @@ async def send_error_msg(
             await rabbitmq_connection.close()
 
 
+async def requeue_throttled(
+    channel: AbstractChannel,
+    message_body: dict,
+    delay: float,
+    attempts: int,
+):
+    """
+    Parks the message in a delay queue so the consumer can serve other
+    integrations while this one is rate limited
+    """
+    logging.info(
+        f"Data sync {message_body.get('data_sync_id')} throttled, "
+        f"retrying in {delay:.1f}s (attempt {attempts + 1})"
+    )
+    await publish_delayed_message(
+        channel,
+        CRON_DATA_SYNC_LEADS,
+        message_body,
+        delay,
+        headers={THROTTLE_ATTEMPTS_HEADER: attempts + 1},
+    )
+
+
 async def ensure_integration(
     message: IncomingMessage,
+    channel: AbstractChannel,
     integration_service: IntegrationService,
-    db_session: Db,
+    db_session: Session,
     ch_client: AsyncClient,
     notification_persistence: NotificationPersistence,
 ):
@@ -404,7 +416,8 @@ async def ensure_integration(
         data_sync_id = message_body.get("data_sync_id")
         users_id = message_body.get("users_id")
         logging.info(f"Data sync id {data_sync_id}")
-        check_data = check_correct_data_sync(
+        check_data = await asyncio.to_thread(
+            check_correct_data_sync,
             pixel_sync_id=data_sync_id,
             pixel_sync_imported_ids=data_sync_imported_ids,
             session=db_session,
@@ -421,6 +434,27 @@ async def ensure_integration(
 
         user_integration = integration_data[0]
         data_sync = integration_data[1]
+
+        rate_limiter = get_rate_limiter()
+        rate_key = RateKey.of(
+            service_name,
+            user_integration.access_token or str(user_integration.id),
+        )
+        attempts = int(
+            (message.headers or {}).get(THROTTLE_ATTEMPTS_HEADER) or 0
+        )
+        can_requeue = attempts < MAX_THROTTLE_ATTEMPTS
+        # per-call integrations take their tokens themselves; for them the
+        # zero-cost reserve only waits out a backoff or debt
+        per_call = rate_limiter.bucket(rate_key).limit.per_call
+        wait = rate_limiter.reserve(
+            rate_key, 0 if per_call else len(pg_rows) + len(ch_rows)
+        )
+        if wait > 0 and can_requeue:
+            await requeue_throttled(channel, message_body, wait, attempts)
+            await message.ack()
+            return
+
         service_map = {
             "klaviyo": integration_service.klaviyo,
             "meta": integration_service.meta,
@@ -451,8 +485,10 @@ async def ensure_integration(
         if leads_ch:
             leads.extend(leads_ch)
 
-        is_email_validation_enabled = get_domain_is_email_validation_enabled(
-            domain_id=data_sync.domain_id, session=db_session
+        is_email_validation_enabled = await asyncio.to_thread(
+            get_domain_is_email_validation_enabled,
+            domain_id=data_sync.domain_id,
+            session=db_session,
         )
         if service:
             try:
@@ -506,7 +542,8 @@ async def ensure_integration(
 
                     case ProccessDataSyncResult.LIST_NOT_EXISTS.value:
                         logging.debug(f"list_not_exists: {service_name}")
-                        update_users_integrations(
+                        await asyncio.to_thread(
+                            update_users_integrations,
                             session=db_session,
                             status=ProccessDataSyncResult.LIST_NOT_EXISTS.value,
                             integration_data_sync_id=data_sync.id,
@@ -529,7 +566,8 @@ async def ensure_integration(
 
                     case ProccessDataSyncResult.QUOTA_EXHAUSTED.value:
                         logging.debug(f"Quota exhausted: {service_name}")
-                        update_users_integrations(
+                        await asyncio.to_thread(
+                            update_users_integrations,
                             session=db_session,
                             status=ProccessDataSyncResult.QUOTA_EXHAUSTED.value,
                             integration_data_sync_id=data_sync.id,
@@ -546,7 +584,8 @@ async def ensure_integration(
 
                     case ProccessDataSyncResult.PAYMENT_REQUIRED.value:
                         logging.debug(f"Quota exhausted: {service_name}")
-                        update_users_integrations(
+                        await asyncio.to_thread(
+                            update_users_integrations,
                             session=db_session,
                             status=ProccessDataSyncResult.PAYMENT_REQUIRED.value,
                             integration_data_sync_id=data_sync.id,
@@ -563,7 +602,8 @@ async def ensure_integration(
 
                     case ProccessDataSyncResult.AUTHENTICATION_FAILED.value:
                         logging.debug(f"authentication_failed: {service_name}")
-                        update_users_integrations(
+                        await asyncio.to_thread(
+                            update_users_integrations,
                             db_session,
                             ProccessDataSyncResult.AUTHENTICATION_FAILED.value,
                             data_sync.id,
@@ -583,7 +623,8 @@ async def ensure_integration(
                         logging.debug(
                             f"Custom variables don't created: {service_name}"
                         )
-                        update_users_integrations(
+                        await asyncio.to_thread(
+                            update_users_integrations,
                             db_session,
                             status=ProccessDataSyncResult.ERROR_CREATE_CUSTOM_VARIABLES.value,
                             integration_data_sync_id=data_sync.id,
@@ -598,6 +639,26 @@ async def ensure_integration(
                         await message.ack()
                         return
 
+            throttled_count = sum(
+                1
+                for r in results
+                if r.get("status")
+                == ProccessDataSyncResult.TOO_MANY_REQUESTS.value
+            )
+            if throttled_count:
+                # integrations reading the rate limit headers already
+                # throttled the bucket themselves
+                if rate_limiter.delay(rate_key) == 0:
+                    rate_limiter.throttled(rate_key)
+                if can_requeue:
+                    # throttled leads stay SENT and go out with the retry
+                    results = [
+                        r
+                        for r in results
+                        if r.get("status")
+                        != ProccessDataSyncResult.TOO_MANY_REQUESTS.value
+                    ]
+
             # Split updates into PG vs CH buckets based on id membership
             updates_pg = []
             updates_ch = []
@@ -633,19 +694,24 @@ async def ensure_integration(
                             f"Skip update for unknown lead_id={lead_id_val}"
                         )
 
-            if updates_pg:
-                bulk_update_imported_leads(
+            if updates_pg or updates_ch:
+                await asyncio.to_thread(
+                    bulk_update_imported_leads,
                     session=db_session,
-                    updates=updates_pg,
+                    updates_pg=updates_pg,
+                    updates_ch=updates_ch,
                     integration_data_sync=data_sync,
                     user_integration=user_integration,
                 )
-            if updates_ch:
-                bulk_update_imported_leads_ch(
-                    session=db_session,
-                    updates=updates_ch,
-                    integration_data_sync=data_sync,
-                    user_integration=user_integration,
+
+            if throttled_count and can_requeue:
+                await requeue_throttled(
+                    channel,
+                    message_body,
+                    rate_limiter.delay(
+                        rate_key, 1 if per_call else throttled_count
+                    ),
+                    attempts,
                 )
 
             logging.info(f"Processed message for service: {service_name}")
@@ -658,7 +724,7 @@ async def ensure_integration(
 
     except PendingRollbackError:
         logging.error("PendingRollbackError occurred, rolling back session.")
-        db_session.rollback()
+        await asyncio.to_thread(db_session.rollback)
         await asyncio.sleep(5)
         await message.reject(requeue=True)
 
@@ -668,6 +734,86 @@ async def ensure_integration(
         await asyncio.sleep(5)
 
 
+class IntegrationSlots:
+    """
+    Per-integration counters of the messages being processed
+    """
+
+    def __init__(self, per_integration: int):
+        self.per_integration = per_integration
+        self.active: Counter = Counter()
+
+    def try_acquire(self, key) -> bool:
+        if self.active[key] >= self.per_integration:
+            return False
+        self.active[key] += 1
+        return True
+
+    def release(self, key):
+        self.active[key] -= 1
+        if self.active[key] <= 0:
+            del self.active[key]
+
+
+async def consume_data_sync(
+    message: IncomingMessage,
+    channel: AbstractChannel,
+    slots: IntegrationSlots,
+    clickhouse: AsyncClient,
+    **handler_kwargs,
+):
+    """
+    Runs ensure_integration with a session and an integration service graph
+    of its own, so no session is shared between concurrent messages. Only
+    the ClickHouse client is shared. aio-pika starts a task per delivery, so
+    prefetch_count bounds the messages in flight.
+    """
+    try:
+        message_body = json.loads(message.body)
+    except ValueError:
+        logging.error(f"Malformed message: {message.body!r}")
+        await message.ack()
+        return
+
+    key = (message_body.get("service_name"), message_body.get("users_id"))
+    if not slots.try_acquire(key):
+        await publish_delayed_message(
+            channel,
+            CRON_DATA_SYNC_LEADS,
+            message_body,
+            0,
+            headers=message.headers,
+        )
+        await message.ack()
+        return
+
+    db_session = SessionLocal()
+    resolver = Resolver()
+    resolver.inject(Db, db_session)
+    resolver.inject(AsyncClickHouse, clickhouse)
+    try:
+        await ensure_integration(
+            message,
+            channel=channel,
+            db_session=db_session,
+            integration_service=await resolver.resolve(IntegrationService),
+            notification_persistence=await resolver.resolve(
+                NotificationPersistence
+            ),
+            **handler_kwargs,
+        )
+    finally:
+        slots.release(key)
+        await resolver.cleanup()
+        await asyncio.to_thread(db_session.close)
+
+
+async def log_http_pool_stats():
+    while True:
+        await asyncio.sleep(HttpConfig.STATS_INTERVAL)
+        get_async_http_pool().log_stats()
+
+
 async def main():
     await SentryConfig.async_initilize()
     log_level = logging.INFO
@@ -679,49 +825,45 @@ async def main():
             sys.exit("Invalid log level argument. Use 'DEBUG' or 'INFO'.")
 
     setup_logging(log_level)
+    # queries of concurrent messages share the ClickHouse client, which
+    # refuses concurrent queries within one session
+    clickhouse_common.set_setting("autogenerate_session_id", False)
     resolver = Resolver()
+    # kept referenced, the loop only holds weak references to tasks
+    stats_task = asyncio.create_task(log_http_pool_stats())
     while True:
         rabbitmq_connection = None
-        db_session = None  # ✅ объявляем до try
-        integration_service = None
         ch = await AsyncDelivrClickHouseClient().connect()
         try:
             rabbitmq_connection = RabbitMQConnection()
             connection = await rabbitmq_connection.connect()
             channel = await connection.channel()
-            await channel.set_qos(prefetch_count=1)
+            await channel.set_qos(prefetch_count=CONCURRENCY)
 
             queue = await channel.declare_queue(
                 name=CRON_DATA_SYNC_LEADS,
                 durable=True,
             )
-            db_session = await resolver.resolve(Db)
-            integration_service = await resolver.resolve(IntegrationService)
-            notification_persistence = await resolver.resolve(
-                NotificationPersistence
-            )
-            with integration_service as int_service:
-                await queue.consume(
-                    functools.partial(
-                        ensure_integration,
-                        integration_service=int_service,
-                        db_session=db_session,
-                        ch_client=ch,
-                        notification_persistence=notification_persistence,
-                    )
+            await declare_delay_queues(channel, CRON_DATA_SYNC_LEADS)
+            await queue.consume(
+                functools.partial(
+                    consume_data_sync,
+                    channel=channel,
+                    slots=IntegrationSlots(INTEGRATION_CONCURRENCY),
+                    clickhouse=await resolver.resolve(AsyncClickHouse),
+                    ch_client=ch,
                 )
-                await asyncio.Future()
+            )
+            await asyncio.Future()
 
         except BaseException as e:
             logging.error("Unhandled Exception:", exc_info=True)
             SentryConfig.capture(e)
         finally:
-            if db_session:
-                logging.info("Closing the database session...")
-                db_session.close()
             if rabbitmq_connection:
                 logging.info("Closing RabbitMQ connection...")
                 await rabbitmq_connection.close()
+            await close_http_clients()
             logging.info("Shutting down...")
             time.sleep(10)
 
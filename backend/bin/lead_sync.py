@@ -1,8 +1,10 @@
 import asyncio
 import json
 import logging
+import multiprocessing
 import os
 import random
+import socket
 import sys
 import time
 import traceback
@@ -14,12 +16,29 @@ import argparse
 import pytz
 import regex
 from dotenv import load_dotenv
-from sqlalchemy import desc
-from sqlalchemy import update
-from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session, aliased
 
 from services.lead_sync.service import LeadSyncService
+from services.lead_sync.customer_routing import CustomerRoutingTable
+from services.lead_sync.cookie_sync_reader import (
+    CookieSyncReader,
+    CookieSyncRow,
+    iter_batches,
+    iter_groups,
+)
+from services.suppression_snapshots import SuppressionSnapshotService
+from services.lead_sync.wakeup import CookieSyncWakeup
+from services.lead_sync.visit_buffer import (
+    FLUSH_SIZE as VISIT_BUFFER_FLUSH_SIZE,
+    BufferedVisit,
+    LeadVisitBuffer,
+)
+from services.lead_sync.partitioning import (
+    PARTITION_BY_CHOICES,
+    PARTITION_BY_DATA_PROVIDER_ID,
+    LeadSyncPartition,
+    build_partitions,
+)
 
 current_dir = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
@@ -27,20 +46,20 @@ sys.path.append(parent_dir)
 
 
 from config.sentry import SentryConfig
-from utils import normalize_url, get_url_params_list, check_certain_urls
+from utils import normalize_url, get_url_params_list
 from enums import NotificationTitles
-from db_dependencies import Db, Clickhouse
+from db_dependencies import Db
 from persistence.leads_persistence import LeadsPersistence
 from persistence.notification import NotificationPersistence
+from persistence.five_x_five_hems import FiveXFiveHemsPersistence
+from persistence.lead_sync_watermarks import LeadSyncWatermarkPersistence
+from persistence.lead_counters import LeadCountersPersistence
 
 from utils import create_company_alias
-from urllib.parse import urlparse, parse_qs
 from resolver import Resolver
 from models.plans import SubscriptionPlan
-from models.five_x_five_cookie_sync_file import FiveXFiveCookieSyncFile
 from models.leads_requests import LeadsRequests
 from models.users_domains import UserDomains
-from models.suppression_rule import SuppressionRule
 from models.lead_company import LeadCompany
 from models.leads_users_companies import LeadUserCompany
 from models.state import States
@@ -48,15 +67,12 @@ from models.five_x_five_locations import FiveXFiveLocations
 from models.leads_users_added_to_cart import LeadsUsersAddedToCart
 from models.leads_users_ordered import LeadsUsersOrdered
 from models.leads_visits import LeadsVisits
-from models.suppressions_list import SuppressionList
 from models.users_unlocked_5x5_users import UsersUnlockedFiveXFiveUser
 from models.integrations.suppressed_contact import SuppressedContact
 from models.five_x_five_users import FiveXFiveUser
 from models.leads_users import LeadUser
 from models.users import Users
 from models.leads_orders import LeadOrders
-from models.integrations.leads_suppresions import LeadsSupperssion
-from models.integrations.users_domains_integrations import UserIntegration
 
 from config.rmq_connection import (
     publish_rabbitmq_message_with_channel,
@@ -76,6 +92,7 @@ def setup_logging(level):
 
 
 LAST_PROCESSED_FILE_PATH = "tmp/last_processed_leads_sync.txt"
+LEASE_DURATION = timedelta(minutes=15)
 AMOUNT_CREDITS = 1
 UNLIMITED = -1
 QUEUE_CREDITS_CHARGING = "credits_charging"
@@ -100,23 +117,6 @@ def normalize_domain(domain):
     return domain.lower()
 
 
-def group_requests_by_date(request_row, groupped_requests):
-    key = f"{request_row.event_date}_{request_row.ip}"
-    if key not in groupped_requests:
-        groupped_requests[key] = []
-    lead_info = {
-        "TROVO_ID:": request_row.trovo_id,
-        "PARTNER_ID": request_row.partner_id,
-        "PARTNER_UID": request_row.partner_uid,
-        "SHA256_LOWER_CASE": request_row.sha256_lower_case,
-        "IP": request_row.ip,
-        "JSON_HEADERS": request_row.json_headers,
-        "EVENT_DATE": request_row.event_date,
-        "UP_ID": request_row.up_id,
-    }
-    groupped_requests[key].append(lead_info)
-
-
 def get_all_five_x_user_emails(
     business_email, personal_emails, additional_personal_emails
 ):
@@ -130,57 +130,64 @@ def get_all_five_x_user_emails(
     return list(emails)
 
 
-def get_up_ids_by_sha256(ch_session, sha256_value: str) -> list[str]:
-    query = """
-        SELECT up_id
-        FROM five_x_five_hems
-        WHERE sha256_lc_hem = unhex({sha256:String})
-    """
-    result = ch_session.query(query, parameters={"sha256": sha256_value})
-    up_ids = [row[0] for row in result.result_rows]
+def collect_sha256_without_up_id(groupped_requests) -> set[str]:
+    return {
+        str(possible_lead.sha256_lower_case).lower()
+        for possible_leads in groupped_requests.values()
+        for possible_lead in possible_leads
+        if possible_lead.up_id is None or possible_lead.up_id == "None"
+    }
+
+
+def collect_up_ids(groupped_requests, up_id_by_sha256: dict[str, str]):
+    up_ids = set()
+    for possible_leads in groupped_requests.values():
+        for possible_lead in possible_leads:
+            up_id = possible_lead.up_id
+            if up_id is None or up_id == "None":
+                up_id = up_id_by_sha256.get(
+                    str(possible_lead.sha256_lower_case).lower()
+                )
+            if up_id is not None:
+                up_ids.add(str(up_id).lower())
     return up_ids
 
 
 async def process_table(
-    ch_session: Clickhouse,
     session: Session,
     states_dict: dict,
     groupped_requests,
+    up_id_by_sha256: dict[str, str],
+    five_x_five_users_by_up_id: dict[str, FiveXFiveUser],
     rabbitmq_connection: RabbitMQConnection,
     subscription_service: SubscriptionService,
     leads_persistence: LeadsPersistence,
     notification_persistence: NotificationPersistence,
     leads_service: LeadSyncService,
+    customer_routing: CustomerRoutingTable,
+    suppression_snapshots: SuppressionSnapshotService,
+    visit_buffer: LeadVisitBuffer,
     root_user=None,
 ):
     results = []
     for key, possible_leads in groupped_requests.items():
         for possible_lead in reversed(possible_leads):
-            up_id = possible_lead["UP_ID"]
+            up_id = possible_lead.up_id
             if up_id is None or up_id == "None":
-                up_ids = get_up_ids_by_sha256(
-                    ch_session=ch_session,
-                    sha256_value=str(possible_lead["SHA256_LOWER_CASE"]),
+                up_id = up_id_by_sha256.get(
+                    str(possible_lead.sha256_lower_case).lower()
                 )
-                if len(up_ids) == 0:
+                if up_id is None:
                     logging.debug(
-                        f"Not found SHA256_LOWER_CASE {possible_lead['SHA256_LOWER_CASE']}"
+                        f"Not resolved SHA256_LOWER_CASE {possible_lead.sha256_lower_case}"
                     )
                     continue
-                elif len(up_ids) > 1:
-                    logging.debug(
-                        f"Too many SHA256_LOWER_CASEs {possible_lead['SHA256_LOWER_CASE']}"
-                    )
-                    continue
-                up_id = up_ids[0][0]
                 logging.info(
-                    f"Lead found by SHA256_LOWER_CASE {possible_lead['SHA256_LOWER_CASE']}"
+                    f"Lead found by SHA256_LOWER_CASE {possible_lead.sha256_lower_case}"
                 )
             if up_id is not None and up_id != "None":
-                five_x_five_user = (
-                    session.query(FiveXFiveUser)
-                    .filter(FiveXFiveUser.up_id == str(up_id).lower())
-                    .first()
+                five_x_five_user = five_x_five_users_by_up_id.get(
+                    str(up_id).lower()
                 )
                 if five_x_five_user:
                     logging.info(f"Lead found by UP_ID {up_id}")
@@ -194,6 +201,9 @@ async def process_table(
                         leads_persistence,
                         notification_persistence,
                         leads_service=leads_service,
+                        customer_routing=customer_routing,
+                        suppression_snapshots=suppression_snapshots,
+                        visit_buffer=visit_buffer,
                         root_user=None,
                     )
                     if result:
@@ -209,6 +219,9 @@ async def process_table(
                             leads_persistence,
                             notification_persistence,
                             leads_service=leads_service,
+                            customer_routing=customer_routing,
+                            suppression_snapshots=suppression_snapshots,
+                            visit_buffer=visit_buffer,
                             root_user=root_user,
                         )
                     break
@@ -395,21 +408,6 @@ async def process_payment_unlocked_five_x_five_user(
     return
 
 
-def check_activate_based_urls(page, suppression_rule):
-    parsed_url = urlparse(page)
-    query_params = parse_qs(parsed_url.query)
-    activate_based_urls = suppression_rule.activate_based_urls.split(", ")
-    if any(
-        url in values
-        for values in query_params.values()
-        for url in activate_based_urls
-    ):
-        logging.info(f"activate_based_urls exists: {page}")
-        return True
-
-    return False
-
-
 def generate_random_order_detail():
     return {
         "platform_order_id": random.randint(1000, 9999),
@@ -612,7 +610,7 @@ def set_behavior_flag(user_domain: UserDomains, behavior_type: str):
 
 async def process_user_data(
     states_dict,
-    possible_lead,
+    possible_lead: CookieSyncRow,
     five_x_five_user: FiveXFiveUser,
     session: Session,
     rabbitmq_connection,
@@ -620,13 +618,16 @@ async def process_user_data(
     leads_persistence: LeadsPersistence,
     notification_persistence: NotificationPersistence,
     leads_service: LeadSyncService,
+    customer_routing: CustomerRoutingTable,
+    suppression_snapshots: SuppressionSnapshotService,
+    visit_buffer: LeadVisitBuffer,
     root_user=None,
 ):
     global count
     domain_count_hash = {}
-    ip = possible_lead["IP"]
+    ip = possible_lead.ip
 
-    partner_uid: str | None = possible_lead["PARTNER_UID"]
+    partner_uid: str | None = possible_lead.partner_uid
     partner_uid_dict = leads_service.decode_partner_uid(str(partner_uid))
 
     if partner_uid_dict is None:
@@ -636,31 +637,10 @@ async def process_user_data(
     partner_uid_client_id = partner_uid_dict.get("client_id")
     page = partner_uid_dict.get("current_page")
     puci = str(partner_uid_client_id)
-    if (
-        puci
-        == "2e23d46218de1cce79dc14427bf97a6484c0c729757007988f6f0dcf17a144a8"
-    ):
-        puci = (
-            "edf1a2e46075f1b2ae6caddad58fac17c702f6a17373a7a0067583c0d2ac34cb"
-        )
-    if (
-        puci
-        == "f8f664a05426a4593af10265803ad4ecb0eae25e7622e753ef0ea08218ec33cb"
-        and page != None
-        and "joinfridays.com" in page
-    ):
-        puci = (
-            "b51f31b2181ab13b0a125f37cac5641f12a29b5bb63b8d54f7b5fb1d3c0cb434"
-        )
     if root_user:
         result = root_user
     else:
-        result = (
-            session.query(Users, UserDomains)
-            .join(UserDomains, UserDomains.user_id == Users.id)
-            .filter(UserDomains.data_provider_id == puci)
-            .first()
-        )
+        result = customer_routing.get_customer(puci, page)
     if not result:
         logging.info(f"Customer not found {partner_uid_client_id}")
         return
@@ -689,7 +669,7 @@ async def process_user_data(
         return
 
     if page is None:
-        json_headers = json.loads(str(possible_lead["JSON_HEADERS"]).lower())
+        json_headers = json.loads(str(possible_lead.json_headers).lower())
         referer = json_headers.get("referer")[0]
         page = referer
     behavior_type = (
@@ -717,104 +697,43 @@ async def process_user_data(
     is_first_request = False
     if not lead_user:
         is_confirmed = True
-        suppression_rule = (
-            session.query(SuppressionRule)
-            .filter(SuppressionRule.domain_id == user_domain_id)
-            .first()
-        )
-        suppression_list = (
-            session.query(SuppressionList)
-            .filter(SuppressionList.domain_id == user_domain_id)
-            .first()
-        )
-        suppressions_emails = []
-        if suppression_list and suppression_list.total_emails:
-            suppressions_emails.extend(
-                suppression_list.total_emails.split(", ")
-            )
-        if suppression_rule and suppression_rule.suppressions_multiple_emails:
-            suppressions_emails.extend(
-                suppression_rule.suppressions_multiple_emails.split(", ")
-            )
-        suppressions_emails = list(set(suppressions_emails))
-        if suppressions_emails:
-            emails_to_check = get_all_five_x_user_emails(
-                five_x_five_user.business_email,
-                five_x_five_user.personal_emails,
-                five_x_five_user.additional_personal_emails,
-            )
-            for email in suppressions_emails:
-                if email in emails_to_check:
-                    suppressed_contact = SuppressedContact(
-                        five_x_five_user_id=five_x_five_user.id,
-                        domain_id=user_domain_id,
-                        suppression_type="email",
-                        suppression_detail=email,
-                        created_at=datetime.now(),
-                    )
-                    session.add(suppressed_contact)
-                    session.commit()
-                    logging.info(f"Suppression email {email}")
-                    return
-        if suppression_rule:
-            if (
-                suppression_rule.is_url_certain_activation
-                and suppression_rule.activate_certain_urls
-            ):
-                is_confirmed = False
-                if check_certain_urls(
-                    page, suppression_rule.activate_certain_urls
-                ):
-                    suppressed_contact = SuppressedContact(
-                        five_x_five_user_id=five_x_five_user.id,
-                        domain_id=user_domain_id,
-                        suppression_type="url",
-                        suppression_detail=normalize_url(page),
-                        created_at=datetime.now(),
-                    )
-                    session.add(suppressed_contact)
-                    session.commit()
-                    return
-
-            if (
-                suppression_rule.is_based_activation
-                and suppression_rule.activate_based_urls
-            ):
-                is_confirmed = False
-                if check_activate_based_urls(page, suppression_rule):
-                    suppressed_contact = SuppressedContact(
-                        five_x_five_user_id=five_x_five_user.id,
-                        domain_id=user_domain_id,
-                        suppression_type="url",
-                        suppression_detail=normalize_url(page),
-                        created_at=datetime.now(),
-                    )
-                    session.add(suppressed_contact)
-                    session.commit()
-                    return
-
+        suppression = suppression_snapshots.get(user_domain_id)
         emails_to_check = get_all_five_x_user_emails(
             five_x_five_user.business_email,
             five_x_five_user.personal_emails,
             five_x_five_user.additional_personal_emails,
         )
-        integrations_ids = [
-            integration.id
-            for integration in session.query(UserIntegration)
-            .filter(UserIntegration.is_with_suppression == True)
-            .all()
-        ]
-        lead_suppression = (
-            session.query(LeadsSupperssion)
-            .filter(
-                LeadsSupperssion.domain_id == user_domain_id,
-                LeadsSupperssion.email.in_(emails_to_check),
-                LeadsSupperssion.integration_id.in_(integrations_ids),
+        suppressed_email = suppression.find_suppressed_email(emails_to_check)
+        if suppressed_email:
+            suppressed_contact = SuppressedContact(
+                five_x_five_user_id=five_x_five_user.id,
+                domain_id=user_domain_id,
+                suppression_type="email",
+                suppression_detail=suppressed_email,
+                created_at=datetime.now(),
             )
-            .first()
-            is not None
-        )
-        if lead_suppression:
+            session.add(suppressed_contact)
+            session.flush()
+            logging.info(f"Suppression email {suppressed_email}")
+            return
+        if suppression.requires_confirmation:
+            is_confirmed = False
+        if suppression.matches_certain_urls(
+            page
+        ) or suppression.matches_based_urls(page):
+            logging.info(f"Suppression url {page}")
+            suppressed_contact = SuppressedContact(
+                five_x_five_user_id=five_x_five_user.id,
+                domain_id=user_domain_id,
+                suppression_type="url",
+                suppression_detail=normalize_url(page),
+                created_at=datetime.now(),
+            )
+            session.add(suppressed_contact)
+            session.flush()
+            return
+
+        if suppression.is_suppressed_by_integration(emails_to_check):
             suppressed_contact = SuppressedContact(
                 five_x_five_user_id=five_x_five_user.id,
                 domain_id=user_domain_id,
@@ -823,7 +742,7 @@ async def process_user_data(
                 created_at=datetime.now(),
             )
             session.add(suppressed_contact)
-            session.commit()
+            session.flush()
             logging.info("Charging option suppressed, skip lead")
             return
 
@@ -880,37 +799,13 @@ async def process_user_data(
                 "domain_id": lead_user.domain_id,
             }
 
-    requested_at_str = str(possible_lead["EVENT_DATE"])
+    requested_at_str = str(possible_lead.event_date)
     requested_at = datetime.fromisoformat(requested_at_str).replace(tzinfo=None)
     thirty_minutes_ago = requested_at - timedelta(minutes=30)
-    current_visit_request = (
-        session.query(LeadsRequests.visit_id)
-        .filter(
-            LeadsRequests.lead_id == lead_user.id,
-            LeadsRequests.requested_at >= thirty_minutes_ago,
-        )
-        .first()
-    )
-    if current_visit_request:
-        visit_id = current_visit_request[0]
-        leads_result = (
-            session.query(
-                LeadsRequests.requested_at,
-                LeadsRequests.page,
-                LeadsVisits.id,
-                LeadsVisits.behavior_type,
-                LeadsVisits.full_time_sec,
-            )
-            .join(LeadsVisits, LeadsRequests.visit_id == LeadsVisits.id)
-            .filter(LeadsRequests.visit_id == visit_id)
-            .all()
-        )
-        leads_requests = []
-        for result_row in leads_result:
-            leads_requests.append([result_row[0], result_row[1]])
-        lead_visit_id = leads_result[0][2]
-        lead_behavior_type = leads_result[0][3]
-        lead_visit_full_time_sec = leads_result[0][4]
+    visit_id = visit_buffer.find_visit_id(lead_user.id, thirty_minutes_ago)
+    if visit_id:
+        lead_visit = visit_buffer.get_visit(visit_id)
+        lead_behavior_type = lead_visit.behavior_type
         if lead_behavior_type == "visitor":
             if behavior_type == "viewed_product":
                 lead_behavior_type = behavior_type
@@ -922,25 +817,23 @@ async def process_user_data(
         process_leads_requests(
             requested_at=requested_at,
             page=page,
-            leads_requests=leads_requests,
-            visit_id=visit_id,
-            lead_visit_full_time_sec=lead_visit_full_time_sec,
-            session=session,
+            lead_visit=lead_visit,
             behavior_type=lead_behavior_type,
             lead_user=lead_user,
         )
     else:
-        lead_visit_id = add_new_leads_visits(
+        lead_visit = add_new_leads_visits(
             visited_datetime=requested_at,
-            lead_id=lead_user.id,
+            page=page,
+            visit_buffer=visit_buffer,
             session=session,
             behavior_type=behavior_type,
             lead_user=lead_user,
             ip=ip,
-        ).id
+        )
+        if is_first_request or lead_user.first_visit_id is None:
+            visit_buffer.set_first_visit(lead_user.id, lead_visit.id)
         if is_first_request == True:
-            lead_user.first_visit_id = lead_visit_id
-            session.flush()
             if not user_domain.is_pixel_installed:
                 user_domain.is_pixel_installed = True
                 user_domain.pixel_installation_date = datetime.now(
@@ -1017,35 +910,19 @@ async def process_user_data(
                 )
                 session.add(new_record)
 
-    prev_leads_requests = (
-        session.query(LeadsRequests)
-        .filter_by(visit_id=lead_visit_id)
-        .order_by(desc(LeadsRequests.id))
-        .first()
-    )
-    if prev_leads_requests:
-        total_sec = (
-            requested_at - prev_leads_requests.requested_at
-        ).total_seconds()
-        if total_sec > 0:
-            prev_leads_requests.spent_time_sec = total_sec
-
-    lead_request = (
-        insert(LeadsRequests)
-        .values(
-            lead_id=lead_user.id,
-            page_parameters=get_url_params_list(page),
-            page=normalize_url(page),
-            requested_at=requested_at,
-            visit_id=lead_visit_id,
-            spent_time_sec=1,
-        )
-        .on_conflict_do_nothing()
+    visit_buffer.add_request(
+        lead_visit,
+        {
+            "lead_id": lead_user.id,
+            "page_parameters": get_url_params_list(page),
+            "page": normalize_url(page),
+            "requested_at": requested_at,
+            "visit_id": lead_visit.id,
+            "spent_time_sec": 1,
+        },
     )
-    session.execute(lead_request)
-    session.flush()
 
-    session.commit()
+    session.flush()
     count += 1
     return domain_count_hash
 
@@ -1062,29 +939,17 @@ def convert_leads_requests_to_utc(leads_requests):
 def process_leads_requests(
     requested_at,
     page,
-    leads_requests,
-    visit_id,
-    lead_visit_full_time_sec,
-    session: Session,
+    lead_visit: BufferedVisit,
     behavior_type,
     lead_user,
 ):
-    lead_id = lead_user.id
-    new_request = [
-        requested_at,
-        page,
-    ]
-    leads_requests.append(new_request)
+    lead_visit.requests.append([requested_at, page])
 
-    leads_requests_sorted = sorted(leads_requests, key=lambda r: r[0])
+    leads_requests_sorted = sorted(lead_visit.requests, key=lambda r: r[0])
 
     start_date_time = leads_requests_sorted[0][0]
     end_date_time = leads_requests_sorted[-1][0]
 
-    start_date = start_date_time.date()
-    start_time = start_date_time.time()
-    end_date = end_date_time.date()
-    end_time = end_date_time.time()
     total_time_sec = int((end_date_time - start_date_time).total_seconds() + 1)
     pages_set = set()
     for i in range(len(leads_requests_sorted)):
@@ -1092,61 +957,108 @@ def process_leads_requests(
         if current_request[1]:
             pages_set.add(normalize_url(current_request[1]))
 
-    pages_count = len(pages_set)
     lead_user.total_visit_time = (
-        lead_user.total_visit_time - lead_visit_full_time_sec + total_time_sec
+        lead_user.total_visit_time - lead_visit.full_time_sec + total_time_sec
     )
 
-    session.query(LeadsVisits).filter_by(id=visit_id).update(
-        {
-            "start_date": start_date,
-            "start_time": start_time,
-            "end_date": end_date,
-            "end_time": end_time,
-            "pages_count": pages_count,
-            "full_time_sec": total_time_sec,
-            "behavior_type": behavior_type,
-        }
-    )
-    session.flush()
+    lead_visit.start_date = start_date_time.date()
+    lead_visit.start_time = start_date_time.time()
+    lead_visit.end_date = end_date_time.date()
+    lead_visit.end_time = end_date_time.time()
+    lead_visit.pages_count = len(pages_set)
+    lead_visit.full_time_sec = total_time_sec
+    lead_visit.behavior_type = behavior_type
+    lead_visit.is_dirty = True
 
 
 def add_new_leads_visits(
     visited_datetime: datetime,
-    lead_id: int,
+    page: str,
+    visit_buffer: LeadVisitBuffer,
     session: Db,
     behavior_type: str,
     lead_user: LeadUser,
     ip: str,
-):
-    start_date = visited_datetime.date()
-    start_time = visited_datetime.time()
-    date_page = visited_datetime + timedelta(seconds=1)
-    end_date = date_page.date()
-    end_time = date_page.time()
-    leads_visits = LeadsVisits(
-        start_date=start_date,
-        start_time=start_time,
-        end_date=end_date,
-        end_time=end_time,
-        pages_count=1,
-        lead_id=lead_id,
-        ip=ip,
+) -> BufferedVisit:
+    lead_visit = visit_buffer.add_visit(
+        lead_id=lead_user.id,
+        visited_at=visited_datetime,
+        page=page,
         behavior_type=behavior_type,
+        ip=ip,
     )
-    session.add(leads_visits)
-    session.flush()
 
     lead_user.total_visit += 1
     lead_user.total_visit_time += 1
 
     session.flush()
-    return leads_visits
+    return lead_visit
+
+
+def read_legacy_last_processed_file() -> datetime | None:
+    try:
+        with open(LAST_PROCESSED_FILE_PATH, "r") as file:
+            last_processed_file = file.read().strip()
+    except FileNotFoundError:
+        return None
+    if not last_processed_file:
+        return None
+    if "." in last_processed_file:
+        return datetime.strptime(last_processed_file, "%Y-%m-%d %H:%M:%S.%f")
+    return datetime.strptime(last_processed_file, "%Y-%m-%d %H:%M:%S")
+
+
+def ensure_watermarks(
+    watermarks: LeadSyncWatermarkPersistence,
+    partitions: list[LeadSyncPartition],
+):
+    # New partition layouts start from the slowest known watermark, or from
+    # the local file written by older versions of this worker.
+    seed = watermarks.get_min_last_event_date()
+    if seed is None:
+        seed = read_legacy_last_processed_file()
+    for partition in partitions:
+        watermarks.ensure(partition.key, seed)
 
 
-def update_last_processed_file(file_key):
-    with open(LAST_PROCESSED_FILE_PATH, "w") as file:
-        file.write(file_key)
+def get_partition_value(
+    request_row,
+    leads_service: LeadSyncService,
+    customer_routing: CustomerRoutingTable,
+) -> str | None:
+    partner_uid_dict = leads_service.decode_partner_uid(
+        str(request_row.partner_uid)
+    )
+    if partner_uid_dict is None:
+        return None
+    route = customer_routing.get_route(
+        str(partner_uid_dict.get("client_id")),
+        partner_uid_dict.get("current_page"),
+    )
+    if route is None:
+        return None
+    return str(route.user_id)
+
+
+def is_root_page(request_row, leads_service: LeadSyncService) -> bool:
+    partner_uid_dict = leads_service.decode_partner_uid(
+        str(request_row.partner_uid)
+    )
+    if partner_uid_dict is None:
+        return False
+    page = partner_uid_dict.get("current_page")
+    return bool(page) and normalize_domain(page) in ROOT_DOMAINS
+
+
+def runs_root_pass(partition: LeadSyncPartition, root_user: Users | None):
+    """
+    With the ip split every partition only reads its own rows, so each one
+    runs the root user over them. Otherwise every partition reads the whole
+    window and the partition of the root user runs it over all rows.
+    """
+    if root_user is None:
+        return False
+    return partition.is_filtered_in_db or partition.owns(str(root_user.id))
 
 
 def get_all_states(db_session: Session):
@@ -1166,7 +1078,7 @@ def deduplicate_domain_counts(domain_count_list: List[dict]):
 
 
 async def process_files(
-    ch_session: Clickhouse,
+    hems_persistence: FiveXFiveHemsPersistence,
     subscription_service: SubscriptionService,
     notification_persistence: NotificationPersistence,
     leads_persistence: LeadsPersistence,
@@ -1174,96 +1086,138 @@ async def process_files(
     rabbitmq_connection: RabbitMQConnection,
     root_user: Users,
     leads_service: LeadSyncService,
+    customer_routing: CustomerRoutingTable,
+    suppression_snapshots: SuppressionSnapshotService,
+    cookie_sync_reader: CookieSyncReader,
+    visit_buffer: LeadVisitBuffer,
+    watermarks: LeadSyncWatermarkPersistence,
+    partition: LeadSyncPartition,
+    worker_id: str,
 ):
     states = get_all_states(db_session)
+    customer_routing.refresh()
+    suppression_snapshots.refresh()
     domain_count_list = []
     states_dict = {state.state_code: state.id for state in states}
+    root_pass = runs_root_pass(partition, root_user)
     while True:
-        try:
-            with open(LAST_PROCESSED_FILE_PATH, "r") as file:
-                last_processed_file = file.read().strip()
-        except FileNotFoundError:
-            last_processed_file = None
-
-        five_x_five_cookie_sync_event_date = db_session.query(
-            FiveXFiveCookieSyncFile.event_date
+        last_processed_event_date = watermarks.get_last_event_date(
+            partition.key
         )
-
-        if last_processed_file:
-            if "." in last_processed_file:
-                date_object = datetime.strptime(
-                    last_processed_file, "%Y-%m-%d %H:%M:%S.%f"
-                )
-            else:
-                date_object = datetime.strptime(
-                    last_processed_file, "%Y-%m-%d %H:%M:%S"
-                )
-            five_x_five_cookie_sync_event_date = (
-                five_x_five_cookie_sync_event_date.filter(
-                    FiveXFiveCookieSyncFile.event_date > date_object
-                )
-            )
-
-        five_x_five_cookie_sync_file = (
-            five_x_five_cookie_sync_event_date.order_by(
-                FiveXFiveCookieSyncFile.event_date
-            )
+        filters = [partition.db_filter()] if partition.is_filtered_in_db else []
+        event_date = cookie_sync_reader.get_next_event_date(
+            last_processed_event_date, filters
         )
-        event_date = five_x_five_cookie_sync_file.limit(1).scalar()
         if not event_date:
-            logging.info("No data in 5x5 files yet")
+            logging.info(f"No new 5x5 files for partition {partition.key}")
             return deduplicate_domain_counts(domain_count_list)
 
         new_dt = event_date + timedelta(hours=1)
 
-        cookie_sync_files_query = db_session.query(
-            FiveXFiveCookieSyncFile
-        ).filter(FiveXFiveCookieSyncFile.event_date.between(event_date, new_dt))
-        cookie_sync_files = cookie_sync_files_query.order_by(
-            FiveXFiveCookieSyncFile.event_date
-        ).all()
-        last_processed_file_name = ""
-        groupped_requests = {}
-        for request_row in cookie_sync_files:
-            group_requests_by_date(request_row, groupped_requests)
-            last_processed_file_name = request_row.event_date
-        if not groupped_requests:
-            logging.info("All 5x5 files processed")
-            return
-        result = await process_table(
-            ch_session,
-            db_session,
-            states_dict,
-            groupped_requests,
-            rabbitmq_connection,
-            subscription_service,
-            leads_persistence,
-            notification_persistence,
-            leads_service=leads_service,
-            root_user=None,
+        last_processed_file_name = event_date
+        groups = iter_groups(
+            cookie_sync_reader.iter_rows(event_date, new_dt, filters)
         )
-        if result:
-            domain_count_list.extend(result)
-        if root_user:
-            await process_table(
-                ch_session,
-                db_session,
-                states_dict,
-                groupped_requests,
-                rabbitmq_connection,
-                subscription_service,
-                leads_persistence,
-                notification_persistence,
-                leads_service=leads_service,
-                root_user=root_user,
-            )
+        for batch in iter_batches(groups):
+            last_processed_file_name = batch[-1][-1].event_date
+            groupped_requests = {}
+            root_groupped_requests = {}
+            for group in batch:
+                if root_pass:
+                    root_group = [
+                        request_row
+                        for request_row in group
+                        if is_root_page(request_row, leads_service)
+                    ]
+                    if root_group:
+                        root_groupped_requests[root_group[0].group_key] = (
+                            root_group
+                        )
+                if partition.is_filtered_in_app:
+                    group = [
+                        request_row
+                        for request_row in group
+                        if partition.owns(
+                            get_partition_value(
+                                request_row, leads_service, customer_routing
+                            )
+                        )
+                    ]
+                if group:
+                    groupped_requests.setdefault(group[0].group_key, []).extend(
+                        group
+                    )
+
+            batch_domain_counts = []
+            if groupped_requests or root_groupped_requests:
+                up_id_by_sha256 = hems_persistence.get_unique_up_ids_by_sha256(
+                    collect_sha256_without_up_id(groupped_requests)
+                    | collect_sha256_without_up_id(root_groupped_requests)
+                )
+                five_x_five_users_by_up_id = (
+                    leads_persistence.get_five_x_five_users_by_up_ids(
+                        collect_up_ids(groupped_requests, up_id_by_sha256)
+                        | collect_up_ids(
+                            root_groupped_requests, up_id_by_sha256
+                        )
+                    )
+                )
+                result = await process_table(
+                    db_session,
+                    states_dict,
+                    groupped_requests,
+                    up_id_by_sha256,
+                    five_x_five_users_by_up_id,
+                    rabbitmq_connection,
+                    subscription_service,
+                    leads_persistence,
+                    notification_persistence,
+                    leads_service=leads_service,
+                    customer_routing=customer_routing,
+                    suppression_snapshots=suppression_snapshots,
+                    visit_buffer=visit_buffer,
+                    root_user=None,
+                )
+                if result:
+                    batch_domain_counts.extend(result)
+                if root_groupped_requests:
+                    await process_table(
+                        db_session,
+                        states_dict,
+                        root_groupped_requests,
+                        up_id_by_sha256,
+                        five_x_five_users_by_up_id,
+                        rabbitmq_connection,
+                        subscription_service,
+                        leads_persistence,
+                        notification_persistence,
+                        leads_service=leads_service,
+                        customer_routing=customer_routing,
+                        suppression_snapshots=suppression_snapshots,
+                        visit_buffer=visit_buffer,
+                        root_user=root_user,
+                    )
+                visit_buffer.flush()
+            # lead rows, visits and the watermark of a batch commit together,
+            # so a failed batch is replayed whole and a committed one never
+            if not watermarks.advance(
+                partition.key,
+                worker_id,
+                last_processed_file_name,
+                LEASE_DURATION,
+            ):
+                logging.warning(f"Lease lost for partition {partition.key}")
+                return deduplicate_domain_counts(domain_count_list)
+            domain_count_list.extend(batch_domain_counts)
         logging.debug(
-            f"Last processed event time {str(last_processed_file_name)}"
+            f"Last processed event time {str(last_processed_file_name)} "
+            f"for partition {partition.key}"
         )
-        update_last_processed_file(str(last_processed_file_name))
 
 
-def process_confirmed(session: Session):
+def process_confirmed(
+    session: Session, suppression_snapshots: SuppressionSnapshotService
+):
     logging.info("Start process confirmed")
 
     lead_users = (
@@ -1278,7 +1232,6 @@ def process_confirmed(session: Session):
         return
 
     threshold_time = datetime.now(timezone.utc) - timedelta(minutes=30)
-    domain_rule_cache = {}
 
     for lead_user in lead_users:
         leads_requests = (
@@ -1305,28 +1258,13 @@ def process_confirmed(session: Session):
             )
             continue
 
-        if lead_user.domain_id in domain_rule_cache:
-            suppression_rule = domain_rule_cache[lead_user.domain_id]
-        else:
-            suppression_rule = (
-                session.query(SuppressionRule)
-                .filter(SuppressionRule.domain_id == lead_user.domain_id)
-                .first()
-            )
-            domain_rule_cache[lead_user.domain_id] = suppression_rule
-
+        suppression = suppression_snapshots.get(lead_user.domain_id)
         is_confirmed = True
         for request in leads_requests:
-            if (
-                suppression_rule
-                and suppression_rule.is_url_certain_activation
-                and suppression_rule.activate_certain_urls
-                and check_certain_urls(
-                    request.page.strip()
-                    + "?"
-                    + request.page_parameters.replace(", ", "&"),
-                    suppression_rule.activate_certain_urls,
-                )
+            if suppression.matches_certain_urls(
+                request.page.strip()
+                + "?"
+                + request.page_parameters.replace(", ", "&")
             ):
                 logging.info(
                     "Suppression rule matched for lead_user id=%s", lead_user.id
@@ -1344,53 +1282,32 @@ def process_confirmed(session: Session):
     logging.info("Lead confirmed")
 
 
-def update_total_leads(db_session: Db):
-    users = db_session.query(Users).all()
-
-    for user in users:
-        total_leads = 0
-        domains = db_session.query(UserDomains).filter_by(user_id=user.id).all()
-
-        for domain in domains:
-            domain_leads = (
-                db_session.query(LeadUser)
-                .filter_by(domain_id=domain.id)
-                .count()
-            )
-            domain.total_leads = domain_leads
-            total_leads += domain_leads
-            db_session.add(domain)
-
-        user.total_leads = total_leads
-        db_session.add(user)
-
-    db_session.commit()
-
+def update_total_leads(lead_counters: LeadCountersPersistence):
+    domains_changed, users_changed = lead_counters.recount()
+    logging.info(
+        f"Total leads recounted: {domains_changed} domains, {users_changed} users changed"
+    )
 
-def update_hash_leads(db_session: Db, domain_count_list: List[dict]):
-    totals = defaultdict(int)
-    for item in domain_count_list:
-        totals[item["user_id"]] += item["count"]
 
-    for user_id, count in totals.items():
-        stmt = (
-            update(Users)
-            .where(Users.id == user_id)
-            .values(total_leads=Users.total_leads + count)
+def verify_total_leads(lead_counters: LeadCountersPersistence):
+    drift = lead_counters.find_drift()
+    for item in drift:
+        logging.warning(
+            f"total_leads drift for {item.entity} {item.entity_id}: "
+            f"stored {item.stored}, actual {item.actual}"
         )
-        db_session.execute(stmt)
+    logging.info(f"Total leads verified: {len(drift)} counters drifted")
+    return drift
 
-    for item in domain_count_list:
-        domain_id = item["domain_id"]
-        count = item["count"]
-        stmt = (
-            update(UserDomains)
-            .where(UserDomains.id == domain_id)
-            .values(total_leads=UserDomains.total_leads + count)
-        )
-        db_session.execute(stmt)
 
-    db_session.commit()
+def update_hash_leads(
+    lead_counters: LeadCountersPersistence, domain_count_list: List[dict]
+):
+    start = time.perf_counter()
+    lead_counters.increment(domain_count_list)
+    logging.info(
+        f"Flushed {len(domain_count_list)} lead counters in {time.perf_counter() - start:.3f}s"
+    )
 
 
 def get_root_user(db_session: Db):
@@ -1410,24 +1327,56 @@ def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("--log", choices=["INFO", "DEBUG"], default="INFO")
     parser.add_argument("--update-total-leads", action="store_true")
+    parser.add_argument(
+        "--verify-total-leads",
+        action="store_true",
+        help="Report total_leads drift and exit without writing",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes started by this instance",
+    )
+    parser.add_argument(
+        "--partitions",
+        type=int,
+        default=None,
+        help="Partitions shared by all instances (defaults to --workers)",
+    )
+    parser.add_argument(
+        "--flush-size",
+        type=int,
+        default=VISIT_BUFFER_FLUSH_SIZE,
+        help="Lead requests buffered before visits and requests are written",
+    )
+    parser.add_argument(
+        "--partition-by",
+        choices=PARTITION_BY_CHOICES,
+        default=PARTITION_BY_DATA_PROVIDER_ID,
+    )
     return parser.parse_args()
 
 
-async def main():
+async def run_worker(args, worker_index: int):
     await SentryConfig.async_initilize()
     resolver = Resolver()
     db_session = await resolver.resolve(Db)
     subscription_service = await resolver.resolve(SubscriptionService)
     notification_persistence = await resolver.resolve(NotificationPersistence)
     leads_persistence = await resolver.resolve(LeadsPersistence)
-    ch_session = await resolver.resolve(Clickhouse)
+    hems_persistence = await resolver.resolve(FiveXFiveHemsPersistence)
     lead_service = await resolver.resolve(LeadSyncService)
+    customer_routing = await resolver.resolve(CustomerRoutingTable)
+    suppression_snapshots = await resolver.resolve(SuppressionSnapshotService)
+    cookie_sync_reader = await resolver.resolve(CookieSyncReader)
+    visit_buffer = await resolver.resolve(LeadVisitBuffer)
+    visit_buffer.flush_size = args.flush_size
+    watermarks = await resolver.resolve(LeadSyncWatermarkPersistence)
+    lead_counters = await resolver.resolve(LeadCountersPersistence)
     rabbitmq_connection = RabbitMQConnection()
     connection = await rabbitmq_connection.connect()
     channel = await connection.channel()
-    args = parse_args()
-    log_level = logging.DEBUG if args.log == "DEBUG" else logging.INFO
-    setup_logging(log_level)
 
     await channel.declare_queue(
         name=QUEUE_CREDITS_CHARGING,
@@ -1439,39 +1388,124 @@ async def main():
 
     await channel.declare_queue(name=EMAIL_NOTIFICATIONS, durable=True)
 
-    logging.info("Started")
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    partitions = build_partitions(
+        args.partitions or args.workers, args.partition_by
+    )
+    # start from a different partition in every worker to avoid lease races
+    offset = worker_index % len(partitions)
+    partitions = partitions[offset:] + partitions[:offset]
+    ensure_watermarks(watermarks, partitions)
+
+    wakeup = CookieSyncWakeup()
+    await wakeup.start()
+
+    logging.info(f"Started worker {worker_id}")
     result = get_root_user(db_session=db_session)
-    if args.update_total_leads:
-        update_total_leads(db_session=db_session)
+    if args.update_total_leads and worker_index == 0:
+        update_total_leads(lead_counters=lead_counters)
     while True:
         try:
-            domain_count_list = await process_files(
-                ch_session=ch_session,
-                subscription_service=subscription_service,
-                notification_persistence=notification_persistence,
-                leads_persistence=leads_persistence,
-                db_session=db_session,
-                rabbitmq_connection=connection,
-                leads_service=lead_service,
-                root_user=result,
-            )
-            await connection.close()
-            process_confirmed(session=db_session)
+            domain_count_list = []
+            for partition in partitions:
+                if not watermarks.try_claim(
+                    partition.key, worker_id, LEASE_DURATION
+                ):
+                    logging.debug(f"Partition {partition.key} is busy")
+                    continue
+                try:
+                    partition_domain_counts = await process_files(
+                        hems_persistence=hems_persistence,
+                        subscription_service=subscription_service,
+                        notification_persistence=notification_persistence,
+                        leads_persistence=leads_persistence,
+                        db_session=db_session,
+                        rabbitmq_connection=connection,
+                        leads_service=lead_service,
+                        customer_routing=customer_routing,
+                        suppression_snapshots=suppression_snapshots,
+                        cookie_sync_reader=cookie_sync_reader,
+                        visit_buffer=visit_buffer,
+                        root_user=result,
+                        watermarks=watermarks,
+                        partition=partition,
+                        worker_id=worker_id,
+                    )
+                    domain_count_list.extend(partition_domain_counts)
+                    if partition.is_primary:
+                        process_confirmed(
+                            session=db_session,
+                            suppression_snapshots=suppression_snapshots,
+                        )
+                finally:
+                    db_session.rollback()
+                    visit_buffer.clear()
+                    watermarks.release(partition.key, worker_id)
             if domain_count_list:
                 update_hash_leads(
-                    db_session=db_session, domain_count_list=domain_count_list
+                    lead_counters=lead_counters,
+                    domain_count_list=domain_count_list,
                 )
-            logging.info("Sleeping for 10 minutes...")
-            time.sleep(60 * 10)
-            connection = await rabbitmq_connection.connect()
-            logging.info("Reconnected to RabbitMQ")
+            logging.info("Waiting for new 5x5 cookie sync rows...")
+            if not await wakeup.wait():
+                logging.info("No notification received, polling")
         except Exception as e:
             db_session.rollback()
             logging.error(f"An error occurred: {str(e)}")
             SentryConfig.capture(e)
             traceback.print_exc()
             await resolver.cleanup()
-            time.sleep(30)
+            await asyncio.sleep(30)
+
+
+def run_worker_process(args, worker_index: int):
+    setup_logging(logging.DEBUG if args.log == "DEBUG" else logging.INFO)
+    asyncio.run(run_worker(args, worker_index))
+
+
+async def run_verify_total_leads():
+    resolver = Resolver()
+    try:
+        verify_total_leads(
+            lead_counters=await resolver.resolve(LeadCountersPersistence)
+        )
+    finally:
+        await resolver.cleanup()
+
+
+def main():
+    args = parse_args()
+    log_level = logging.DEBUG if args.log == "DEBUG" else logging.INFO
+    setup_logging(log_level)
+
+    if args.verify_total_leads:
+        asyncio.run(run_verify_total_leads())
+        return
+
+    if args.workers <= 1:
+        asyncio.run(run_worker(args, worker_index=0))
+        return
+
+    context = multiprocessing.get_context("spawn")
+    processes = {}
+    while True:
+        for worker_index in range(args.workers):
+            process = processes.get(worker_index)
+            if process is not None and process.is_alive():
+                continue
+            if process is not None:
+                logging.error(
+                    f"Worker {worker_index} exited with {process.exitcode}, restarting"
+                )
+            process = context.Process(
+                target=run_worker_process,
+                args=(args, worker_index),
+                daemon=True,
+            )
+            process.start()
+            processes[worker_index] = process
+        time.sleep(30)
 
 
-asyncio.run(main())
+if __name__ == "__main__":
+    main()
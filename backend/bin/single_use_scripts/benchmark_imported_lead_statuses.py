@@ -0,0 +1,177 @@
+"""
+Benchmark of the DataSyncImportedLead status write-back of
+cron_data_sync_worker: one UPDATE ... FROM (VALUES ...) per id space against
+the previous UPDATE per lead.
+
+    python bin/single_use_scripts/benchmark_imported_lead_statuses.py --leads 1000 10000
+
+Runs against the configured database on a temporary copy of
+data_sync_imported_leads, which shadows the real table for the session and
+is dropped with the rolled back transaction. Statements that touch every
+row name pg_temp explicitly, so they can never reach the real table.
+
+No numbers have been recorded yet.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.orm import Session
+
+load_dotenv()
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+backend_dir = os.path.abspath(os.path.join(current_dir, os.pardir, os.pardir))
+sys.path.append(backend_dir)
+
+from config.database import engine
+from enums import DataSyncImportedStatus, ProccessDataSyncResult
+from models.data_sync_imported_leads import DataSyncImportedLead
+from persistence.data_sync_imported_lead import update_imported_lead_statuses
+
+DATA_SYNC_ID = 1
+TEMP_TABLE = "pg_temp.data_sync_imported_leads"
+STATUSES = [
+    ProccessDataSyncResult.SUCCESS.value,
+    ProccessDataSyncResult.INCORRECT_FORMAT.value,
+    ProccessDataSyncResult.VERIFY_EMAIL_FAILED.value,
+]
+
+
+def legacy_write_back(session: Session, updates_pg, updates_ch):
+    """
+    The implementation before the VALUES join
+    """
+    for lead_column, updates in (
+        (DataSyncImportedLead.lead_users_id, updates_pg),
+        (DataSyncImportedLead.ch_lead_id, updates_ch),
+    ):
+        for update_item in updates:
+            session.execute(
+                update(DataSyncImportedLead)
+                .where(
+                    lead_column == update_item["lead_id"],
+                    DataSyncImportedLead.data_sync_id == DATA_SYNC_ID,
+                )
+                .values(
+                    status=update_item["status"],
+                    updated_at=datetime.now(timezone.utc).replace(tzinfo=None),
+                )
+            )
+
+
+def current_write_back(session: Session, updates_pg, updates_ch):
+    for lead_column, updates in (
+        (DataSyncImportedLead.lead_users_id, updates_pg),
+        (DataSyncImportedLead.ch_lead_id, updates_ch),
+    ):
+        update_imported_lead_statuses(
+            session,
+            DATA_SYNC_ID,
+            lead_column,
+            ((u["lead_id"], u["status"]) for u in updates),
+        )
+
+
+def seed(session: Session, leads: int, rng: random.Random):
+    session.execute(text(f"TRUNCATE {TEMP_TABLE}"))
+    pg_ids = list(range(1, leads // 2 + 1))
+    ch_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in pg_ids]
+    common = {
+        "status": DataSyncImportedStatus.SENT.value,
+        "service_name": "klaviyo",
+        "data_sync_id": DATA_SYNC_ID,
+    }
+    session.execute(
+        insert(DataSyncImportedLead),
+        [{**common, "lead_users_id": lead_id} for lead_id in pg_ids]
+        + [{**common, "ch_lead_id": ch_id} for ch_id in ch_ids],
+    )
+    updates_pg = [
+        {"lead_id": lead_id, "status": rng.choice(STATUSES)}
+        for lead_id in pg_ids
+    ]
+    updates_ch = [
+        {"lead_id": ch_id, "status": rng.choice(STATUSES)} for ch_id in ch_ids
+    ]
+    return updates_pg, updates_ch
+
+
+def statuses(session: Session) -> list:
+    return session.execute(
+        select(
+            DataSyncImportedLead.lead_users_id,
+            DataSyncImportedLead.ch_lead_id,
+            DataSyncImportedLead.status,
+        ).order_by(
+            DataSyncImportedLead.lead_users_id, DataSyncImportedLead.ch_lead_id
+        )
+    ).all()
+
+
+def measure(session: Session, write_back, updates_pg, updates_ch, repeat):
+    timings = []
+    for _ in range(repeat):
+        session.execute(
+            text(f"UPDATE {TEMP_TABLE} SET status = :status"),
+            {"status": DataSyncImportedStatus.SENT.value},
+        )
+        start = time.perf_counter()
+        write_back(session, updates_pg, updates_ch)
+        timings.append(time.perf_counter() - start)
+    return min(timings), statuses(session)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--leads", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with Session(engine) as session:
+        session.execute(
+            text(
+                f"CREATE TEMPORARY TABLE {TEMP_TABLE} "
+                "(LIKE public.data_sync_imported_leads INCLUDING ALL) "
+                "ON COMMIT DROP"
+            )
+        )
+        try:
+            for leads in args.leads:
+                updates_pg, updates_ch = seed(session, leads, rng)
+                legacy_time, legacy_rows = measure(
+                    session,
+                    legacy_write_back,
+                    updates_pg,
+                    updates_ch,
+                    args.repeat,
+                )
+                current_time, current_rows = measure(
+                    session,
+                    current_write_back,
+                    updates_pg,
+                    updates_ch,
+                    args.repeat,
+                )
+                assert legacy_rows == current_rows
+
+                print(f"leads: {leads}")
+                print(f"  legacy:  {legacy_time:.3f}s")
+                print(
+                    f"  current: {current_time:.3f}s "
+                    f"({legacy_time / current_time:.1f}x)"
+                )
+        finally:
+            session.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Micro-benchmark of AudienceDataNormalizationService.normalize_dataframe on a
+synthetic frame, against the previous merge / Series.map implementation.
+
+    python bin/single_use_scripts/benchmark_normalization.py --rows 1000000
+
+The geo reference data is synthetic too, uszips.csv is not read.
+"""
+
+import argparse
+import os
+import string
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+backend_dir = os.path.abspath(os.path.join(current_dir, os.pardir, os.pardir))
+sys.path.append(backend_dir)
+
+from schemas.similar_audiences import NormalizationConfig
+from services.similar_audiences.audience_data_normalization import (
+    AudienceDataNormalizationServiceBase,
+    convert_to_int,
+    map_credit_rating,
+    map_net_worth_code,
+)
+
+ZIP_COUNT = 40000
+
+
+def synthetic_geo(rng: np.random.Generator) -> pd.DataFrame:
+    zips = [f"{zip_code:05d}" for zip_code in range(ZIP_COUNT)]
+    states = np.array([f"State {letter}" for letter in string.ascii_uppercase])
+    return pd.DataFrame(
+        {
+            "zip": zips,
+            "city": [f"City {zip_code[:3]}" for zip_code in zips],
+            "state_name": states[rng.integers(0, len(states), ZIP_COUNT)],
+        }
+    )
+
+
+def synthetic_profiles(rng: np.random.Generator, rows: int) -> pd.DataFrame:
+    def choice(values: list, with_none: bool = True) -> np.ndarray:
+        values = np.array(values + ([None] if with_none else []), dtype=object)
+        return values[rng.integers(0, len(values), rows)]
+
+    return pd.DataFrame(
+        {
+            "age": choice([str(age) for age in range(18, 90)] + ["", "x"]),
+            "number_of_children": choice(["0", "1", "2", "3", "4"]),
+            "gender": choice(["M", "F", "U"]),
+            "homeowner": choice(["Y", "N", "U"]),
+            "credit_rating": choice(list("ABCDEU")),
+            "net_worth": choice(list("ABCDEFGHIU")),
+            # a fifth of the zips are missing from the geo table
+            "zip_code5": choice(
+                [f"{zip_code:05d}" for zip_code in range(0, 50000, 7)] + [0]
+            ),
+            "customer_value": rng.random(rows).astype(str),
+        }
+    )
+
+
+def benchmark_config() -> NormalizationConfig:
+    return NormalizationConfig(
+        numerical_features=["age", "number_of_children"],
+        unordered_features=["gender", "homeowner"],
+        ordered_features={
+            "credit_rating": map_credit_rating,
+            "net_worth": map_net_worth_code,
+        },
+    )
+
+
+class BenchmarkNormalizationService(AudienceDataNormalizationServiceBase):
+    def __init__(self, df_geo: pd.DataFrame):
+        super().__init__()
+        self.df_geo = df_geo
+
+    def get_states_dataframe(self) -> pd.DataFrame:
+        return self.df_geo
+
+
+class LegacyNormalizationService(BenchmarkNormalizationService):
+    """
+    The implementation before the geo table and per-unique mapping
+    """
+
+    def convert_int_columns(self, df, int_columns):
+        for name in int_columns:
+            df[name] = df[name].map(convert_to_int).astype("Int64")
+
+    def convert_ordered_features(self, df, rules):
+        for name, operation in rules.items():
+            df[name] = df[name].map(operation).astype("Int64")
+
+    def slice_zipcodes(self, df):
+        df["zip_code5"] = (
+            df["zip_code5"]
+            .fillna(0)
+            .astype(int)
+            .astype(str)
+            .replace("0", "00000")
+        )
+        df["zip_code4"] = df["zip_code5"].str[:4]
+        df["zip_code3"] = df["zip_code5"].str[:3]
+
+    def merge_with_geo(self, df):
+        df_with_geo = df.merge(
+            self.get_states_dataframe(),
+            how="left",
+            left_on="zip_code5",
+            right_on="zip",
+        )
+        df_with_geo["state_city"] = (
+            df_with_geo["state_name"] + "|" + df_with_geo["city"]
+        )
+        return df_with_geo
+
+
+def measure(
+    service: AudienceDataNormalizationServiceBase,
+    profiles: pd.DataFrame,
+    repeat: int,
+):
+    timings = []
+    for _ in range(repeat):
+        df = profiles.copy()
+        start = time.perf_counter()
+        result = service.normalize_dataframe(df, benchmark_config())
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    df_geo = synthetic_geo(rng)
+    profiles = synthetic_profiles(rng, args.rows)
+
+    legacy_time, (legacy_x, legacy_y) = measure(
+        LegacyNormalizationService(df_geo), profiles, args.repeat
+    )
+    current_time, (current_x, current_y) = measure(
+        BenchmarkNormalizationService(df_geo), profiles, args.repeat
+    )
+
+    pd.testing.assert_frame_equal(current_x, legacy_x)
+    pd.testing.assert_series_equal(current_y, legacy_y)
+
+    print(f"rows: {args.rows}")
+    print(f"legacy:  {legacy_time:.3f}s")
+    print(f"current: {current_time:.3f}s ({legacy_time / current_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import asyncio
+import importlib.util
+import logging
+import time
+from dataclasses import asdict, dataclass
+from urllib.parse import urlsplit
+
+import httpx
+
+from config.util import try_get_int_env
+
+logger = logging.getLogger(__name__)
+
+HTTP2 = importlib.util.find_spec("h2") is not None
+"""
+httpx negotiates HTTP/2 only when the optional h2 package is installed
+"""
+
+
+class HttpConfig:
+    """
+    Limits of the process-wide HTTP clients used by integrations
+    """
+
+    MAX_CONNECTIONS = try_get_int_env("HTTP_POOL_MAX_CONNECTIONS") or 300
+    """
+    Connections per destination origin (scheme, host and port)
+    """
+    MAX_KEEPALIVE_CONNECTIONS = (
+        try_get_int_env("HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS") or 100
+    )
+    """
+    Idle connections kept open per destination origin
+    """
+    KEEPALIVE_EXPIRY = try_get_int_env("HTTP_POOL_KEEPALIVE_EXPIRY") or 30
+    """
+    Seconds an idle connection stays in the pool
+    """
+    STATS_INTERVAL = try_get_int_env("HTTP_POOL_STATS_INTERVAL") or 300
+    """
+    Seconds between pool stats logged by long-running workers
+    """
+
+    @classmethod
+    def limits(cls) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=cls.MAX_CONNECTIONS,
+            max_keepalive_connections=cls.MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=cls.KEEPALIVE_EXPIRY,
+        )
+
+    @classmethod
+    def timeout(cls) -> httpx.Timeout:
+        return httpx.Timeout(60.0, connect=10.0)
+
+
+@dataclass
+class PoolMetrics:
+    requests: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    total_seconds: float = 0.0
+
+
+def origin_of(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class AsyncHttpPool:
+    """
+    Keep-alive connection pools shared by every async integration, one
+    httpx.AsyncClient per destination origin so a slow API cannot starve
+    the connections of another.
+
+    Connections belong to the event loop that opened them, so clients are
+    replaced when the pool is first used from a different loop. Close the
+    pool with aclose() before its loop ends.
+    """
+
+    def __init__(
+        self,
+        limits: httpx.Limits | None = None,
+        timeout: httpx.Timeout | None = None,
+        http2: bool = HTTP2,
+    ):
+        self.limits = limits or HttpConfig.limits()
+        self.timeout = timeout or HttpConfig.timeout()
+        self.http2 = http2
+        self.metrics: dict[str, PoolMetrics] = {}
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def client(self, url: str) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._discard_clients()
+            self._loop = loop
+
+        origin = origin_of(url)
+        client = self._clients.get(origin)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=self.limits, timeout=self.timeout, http2=self.http2
+            )
+            self._clients[origin] = client
+        return client
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        httpx.AsyncClient.request on the pool of the url's origin
+        """
+        metrics = self.metrics.setdefault(origin_of(url), PoolMetrics())
+        metrics.requests += 1
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            return await self.client(url).request(method, url, **kwargs)
+        except httpx.HTTPError:
+            metrics.errors += 1
+            raise
+        finally:
+            metrics.in_flight -= 1
+            metrics.total_seconds += time.perf_counter() - start
+
+    def stats(self) -> dict[str, dict]:
+        """
+        Request counters and open connections per origin
+        """
+        stats = {}
+        for origin, metrics in self.metrics.items():
+            client = self._clients.get(origin)
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            connections = getattr(pool, "connections", [])
+            stats[origin] = {
+                **asdict(metrics),
+                "connections": len(connections),
+                "idle_connections": sum(
+                    1 for connection in connections if connection.is_idle()
+                ),
+            }
+        return stats
+
+    def log_stats(self):
+        for origin, stats in self.stats().items():
+            logger.info(f"HTTP pool {origin}: {stats}")
+
+    async def aclose(self):
+        if asyncio.get_running_loop() is not self._loop:
+            self._discard_clients()
+            return
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def _discard_clients(self):
+        """
+        Closes the clients of the previous loop on that loop. A loop that
+        is no longer running cannot close them any more, their sockets are
+        closed when the connections are collected.
+        """
+        clients, self._clients = self._clients, {}
+        open_clients = [c for c in clients.values() if not c.is_closed]
+        if not open_clients:
+            return
+        if self._loop.is_running() and not self._loop.is_closed():
+            for client in open_clients:
+                asyncio.run_coroutine_threadsafe(client.aclose(), self._loop)
+        else:
+            logger.warning(
+                f"{len(open_clients)} HTTP clients were not closed before "
+                "their event loop ended"
+            )
+
+
+_async_pool: AsyncHttpPool | None = None
+_sync_client: httpx.Client | None = None
+
+
+def get_async_http_pool() -> AsyncHttpPool:
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = AsyncHttpPool()
+    return _async_pool
+
+
+async def close_http_clients():
+    """
+    Closes the shared clients, they are opened again on next use
+    """
+    if _async_pool is not None:
+        await _async_pool.aclose()
+    if _sync_client is not None:
+        _sync_client.close()
+
+
+def get_sync_http_client() -> httpx.Client:
+    """
+    Shared blocking client with the default httpx timeout, its pool already
+    keeps connections per origin
+    """
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        _sync_client = httpx.Client(limits=HttpConfig.limits(), http2=HTTP2)
+    return _sync_client
@@ -1,4 +1,4 @@
-from config.util import get_int_env, try_get_int_env
+from config.util import get_int_env, getenv, try_get_int_env
 
 class LookalikesConfig:
     """
@@ -17,4 +17,27 @@ class LookalikesConfig:
     LOOKALIKE_MAX_SIZE = try_get_int_env("LOOKALIKE_MAX_SIZE")
     """
     How many rows to process at most. Useful when debugging on localhost/dev. 
-    """
\ No newline at end of file
+    """
+    BUCKETS_PER_TASK = try_get_int_env("LOOKALIKE_BUCKETS_PER_TASK") or 2
+    """
+    How many of the 100 cityHash64(asid) buckets one filler task scans.
+    Smaller ranges balance better between processes.
+    """
+    CACHE_DIR = getenv("LOOKALIKE_CACHE_DIR", optional=True)
+    """
+    Where normalized training frames are cached, DATA_FOLDER/lookalike_cache
+    by default
+    """
+    CACHE_MAX_BYTES = (
+        try_get_int_env("LOOKALIKE_CACHE_MAX_BYTES") or 2 * 1024**3
+    )
+    """
+    Size limit of the training frame cache, least recently used frames are
+    evicted first
+    """
+    INGESTED_AT_COLUMN = getenv("LOOKALIKE_INGESTED_AT_COLUMN", optional=True)
+    """
+    DateTime column of enrichment_users that ingestion stamps on new and
+    changed rows. When set, refreshing a lookalike with an unchanged model
+    only rescores rows newer than its watermark; unset means full rescoring.
+    """
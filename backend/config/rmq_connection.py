@@ -1,7 +1,7 @@
 import os
 from typing import Mapping, Union
 
-from aio_pika import Message, connect_robust
+from aio_pika import DeliveryMode, Message, connect_robust
 import json
 import logging
 
@@ -16,6 +16,12 @@ aio_pika_logger = logging.getLogger("aio_pika")
 aio_pika_logger.setLevel(logging.CRITICAL)
 logging.getLogger("aiormq").setLevel(logging.CRITICAL)
 
+DELAY_TIERS = (1, 5, 30, 120, 600)
+"""
+Seconds of the delay queues, a delayed message waits for the first tier
+that is not shorter than its delay
+"""
+
 
 class RabbitMQConnection:
     def __init__(self):
@@ -56,3 +62,48 @@ async def publish_rabbitmq_message_with_channel(
         )
     except Exception as e:
         logger.error(e)
+
+
+def delay_queue_name(queue_name: str, seconds: int) -> str:
+    return f"{queue_name}_delay_{seconds}s"
+
+
+async def declare_delay_queues(channel: AbstractChannel, queue_name: str):
+    """
+    Declares one queue per delay tier whose messages expire back into
+    queue_name through the default exchange.
+    """
+    for seconds in DELAY_TIERS:
+        await channel.declare_queue(
+            name=delay_queue_name(queue_name, seconds),
+            durable=True,
+            arguments={
+                "x-message-ttl": seconds * 1000,
+                "x-dead-letter-exchange": "",
+                "x-dead-letter-routing-key": queue_name,
+            },
+        )
+
+
+async def publish_delayed_message(
+    channel: AbstractChannel,
+    queue_name: str,
+    message_body: Mapping[str, object],
+    delay: float,
+    headers: Mapping[str, object] | None = None,
+):
+    """
+    Publishes to queue_name after at least delay seconds, capped at the
+    longest tier. The delay queues must exist, see declare_delay_queues.
+    """
+    seconds = next(
+        (tier for tier in DELAY_TIERS if tier >= delay), DELAY_TIERS[-1]
+    )
+    message = Message(
+        body=json.dumps(message_body).encode("utf-8"),
+        headers=dict(headers or {}),
+        delivery_mode=DeliveryMode.PERSISTENT,
+    )
+    await channel.default_exchange.publish(
+        message, routing_key=delay_queue_name(queue_name, seconds)
+    )
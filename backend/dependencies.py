@@ -130,12 +130,6 @@ def get_company_persistence(db: Session = Depends(get_db)):
     return CompanyPersistence(db=db)
 
 
-def get_suppression_persistence(
-    db: Session = Depends(get_db),
-) -> SuppressionPersistence:
-    return SuppressionPersistence(db)
-
-
 def get_accounts_service(
     user_persistence: UserPersistence,
     partner_persistence: PartnersPersistence,
@@ -521,9 +515,7 @@ def get_payouts_service(
 
 def get_suppression_service(
     leads_persistence: LeadsPersistence,
-    suppression_persistence: SuppressionPersistence = Depends(
-        get_suppression_persistence
-    ),
+    suppression_persistence: SuppressionPersistence,
 ):
     return SuppressionService(
         suppression_persistence=suppression_persistence,
@@ -16,14 +16,14 @@ from models.integrations.users_domains_integrations import UserIntegration
 from models.premium_source_syncs.meta import MetaPremiumSourceSync
 from resolver import injectable
 from schemas.integrations.integrations import MetaCredentials
-from services.integrations.meta import MetaIntegrationsService
+from enums import ProccessDataSyncResult
+from services.integrations.meta import MetaError, MetaIntegrationsService
 from domains.premium_sources.sync.config import (
     META_BATCH_SIZE,
     SYNC_API_CONCURRENCY,
     RETRY_ATTEMPTS,
     RETRY_BACKOFF_BASE,
 )
-from domains.premium_sources.sync.utils import run_blocking
 
 
 @injectable
@@ -170,12 +170,14 @@ class MetaPremiumSourceSyncService:
                 attempt = 0
                 while True:
                     try:
-                        return await run_blocking(
-                            self.meta.add_hashed_emails_to_list,
-                            access_token,
-                            list_id,
-                            chunk,
+                        status = await self.meta.add_hashed_emails_to_list(
+                            access_token, list_id, chunk
                         )
+                        if status != ProccessDataSyncResult.SUCCESS.value:
+                            raise MetaError(
+                                f"Meta rejected hashed emails: {status}"
+                            )
+                        return status
                     except Exception as e:
                         attempt += 1
                         if attempt >= RETRY_ATTEMPTS:
@@ -193,15 +195,15 @@ class MetaPremiumSourceSyncService:
             tasks.append(asyncio.create_task(send_chunk(chunk)))
 
         results = await asyncio.gather(*tasks, return_exceptions=True)
+        for r in results:
+            if isinstance(r, Exception):
+                raise r
+
         logger.info(
             f"Successfully sent {len(hashes)} hashed emails to Meta "
             f"(list_id={list_id}) in {len(tasks)} chunks"
         )
 
-        for r in results:
-            if isinstance(r, Exception):
-                raise r
-
         logger.debug(
             f"sent {len(hashes)} hashed emails to meta in {len(tasks)} chunks"
         )
@@ -1,6 +1,8 @@
 import logging
+from contextlib import asynccontextmanager
 
 from config.base import Base
+from config.http import close_http_clients
 from config.hubspot import HubspotConfig
 from config.sentry import SentryConfig
 from config.util import EnvVarError
@@ -38,7 +40,16 @@ except EnvVarError as e:
         f"Error initializing Hubspot: {e}\n\t\tHubspot CRM integration is disabled"
     )
 
-app = FastAPI(docs_url=None, redoc_url=None, openapi_url=None)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_http_clients()
+
+
+app = FastAPI(
+    docs_url=None, redoc_url=None, openapi_url=None, lifespan=lifespan
+)
 external_api = FastAPI(docs_url=None, redoc_url=None, openapi_url=None)
 
 
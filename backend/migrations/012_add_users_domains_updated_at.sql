@@ -0,0 +1,17 @@
+ALTER TABLE users_domains
+    ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT (now() at time zone 'utc');
+
+CREATE INDEX users_domains_updated_at_idx ON users_domains (updated_at);
+
+CREATE OR REPLACE FUNCTION users_domains_set_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = now() at time zone 'utc';
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER users_domains_updated_at_trigger
+    BEFORE UPDATE ON users_domains
+    FOR EACH ROW
+    EXECUTE FUNCTION users_domains_set_updated_at();
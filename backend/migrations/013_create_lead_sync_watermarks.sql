@@ -0,0 +1,9 @@
+CREATE TABLE lead_sync_watermarks (
+    partition_key VARCHAR(64) PRIMARY KEY,
+    last_event_date TIMESTAMP,
+    worker_id VARCHAR(128),
+    lease_until TIMESTAMPTZ,
+    updated_at TIMESTAMP NOT NULL DEFAULT (now() at time zone 'utc')
+);
+
+ALTER TABLE lead_sync_watermarks OWNER TO maximiz_dev;
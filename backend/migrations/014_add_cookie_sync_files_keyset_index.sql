@@ -0,0 +1,2 @@
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "5x5_cookie_sync_files_event_date_ip_id_idx"
+    ON "5x5_cookie_sync_files" (event_date, (COALESCE(ip, '')), id);
@@ -0,0 +1,12 @@
+CREATE OR REPLACE FUNCTION notify_cookie_sync_files_inserted()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('cookie_sync_files_inserted', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER cookie_sync_files_inserted_trigger
+    AFTER INSERT ON "5x5_cookie_sync_files"
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_cookie_sync_files_inserted();
@@ -0,0 +1,5 @@
+ALTER TABLE enrichment_models ADD COLUMN cache_key VARCHAR(64);
+
+CREATE INDEX enrichment_models_cache_key_idx
+    ON enrichment_models (cache_key, created_at DESC)
+    WHERE cache_key IS NOT NULL;
@@ -0,0 +1,8 @@
+CREATE TABLE lookalike_score_watermarks (
+    lookalike_id UUID PRIMARY KEY REFERENCES audience_lookalikes(id) ON DELETE CASCADE,
+    scoring_key VARCHAR(64) NOT NULL,
+    ingested_at TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT (now() at time zone 'utc')
+);
+
+ALTER TABLE lookalike_score_watermarks OWNER TO maximiz_dev;
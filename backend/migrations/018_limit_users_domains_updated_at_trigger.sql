@@ -0,0 +1,15 @@
+-- only the columns lead_sync routing reads move updated_at, counter and
+-- flag writes no longer make the routing refresh reload the domain
+DROP TRIGGER IF EXISTS users_domains_updated_at_trigger ON users_domains;
+
+CREATE TRIGGER users_domains_updated_at_trigger
+    BEFORE UPDATE OF user_id, data_provider_id, domain, is_enable
+    ON users_domains
+    FOR EACH ROW
+    WHEN (
+        OLD.user_id IS DISTINCT FROM NEW.user_id
+        OR OLD.data_provider_id IS DISTINCT FROM NEW.data_provider_id
+        OR OLD.domain IS DISTINCT FROM NEW.domain
+        OR OLD.is_enable IS DISTINCT FROM NEW.is_enable
+    )
+    EXECUTE FUNCTION users_domains_set_updated_at();
@@ -0,0 +1,2 @@
+ALTER TABLE enrichment_lookalike_scores
+    ADD COLUMN IF NOT EXISTS generation UInt64 DEFAULT 0;
@@ -0,0 +1,2 @@
+ALTER TABLE lookalike_score_watermarks
+    ADD COLUMN scores_generation BIGINT;
@@ -0,0 +1,17 @@
+CREATE TABLE meta_upload_sessions (
+    data_sync_id BIGINT NOT NULL REFERENCES integrations_users_sync(id) ON DELETE CASCADE,
+    leads_key VARCHAR(64) NOT NULL,
+    custom_audience_id VARCHAR(64) NOT NULL,
+    session_id BIGINT NOT NULL,
+    batch_count INTEGER NOT NULL,
+    estimated_num_total INTEGER NOT NULL,
+    batch_results JSONB NOT NULL,
+    lead_batches JSONB NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT (now() at time zone 'utc'),
+    PRIMARY KEY (data_sync_id, leads_key)
+);
+
+CREATE INDEX meta_upload_sessions_updated_at_idx
+    ON meta_upload_sessions (updated_at);
+
+ALTER TABLE meta_upload_sessions OWNER TO maximiz_dev;
@@ -84,6 +84,9 @@ from .users import Users
 from .users_account_notification import UserAccountNotification
 from .users_domains import UserDomains
 from .users_unlocked_5x5_users import UsersUnlockedFiveXFiveUser
+from .lead_sync_watermarks import LeadSyncWatermark
+from .lookalike_score_watermarks import LookalikeScoreWatermark
+from .meta_upload_sessions import MetaUploadSession
 from .audience_linkedin_verification import AudienceLinkedinVerification
 from .audience_smarts_validations import AudienceSmartValidation
 from .usa_zip_codes import UsaZipCode
@@ -191,6 +194,9 @@ __all__ = [
     "UserAccountNotification",
     "UserDomains",
     "UsersUnlockedFiveXFiveUser",
+    "LeadSyncWatermark",
+    "LookalikeScoreWatermark",
+    "MetaUploadSession",
     "EnrichmentUsersEmails",
     "AudienceLinkedinVerification",
     "AudiencePostalVerification",
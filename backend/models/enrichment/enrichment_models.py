@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 
-from sqlalchemy import UUID, Column, ForeignKey, TIMESTAMP, text
+from sqlalchemy import UUID, VARCHAR, Column, ForeignKey, TIMESTAMP, text
 from sqlalchemy.dialects.postgresql import BYTEA
 from sqlalchemy.orm import mapped_column, Mapped
 
@@ -22,6 +22,7 @@ class EnrichmentModels(Base):
         nullable=False,
     )
     model: Mapped[bytes] = mapped_column(BYTEA, nullable=False)
+    cache_key: Mapped[str | None] = mapped_column(VARCHAR(64), nullable=True)
     created_at = Column(
         TIMESTAMP,
         nullable=False,
@@ -7,6 +7,7 @@ from sqlalchemy import (
     Sequence,
     Index,
     UniqueConstraint,
+    text,
 )
 from .base import Base
 
@@ -15,6 +16,12 @@ class FiveXFiveCookieSyncFile(Base):
     __tablename__ = "5x5_cookie_sync_files"
     __table_args__ = (
         Index("5x5_cookie_sync_files_event_date_idx", "event_date"),
+        Index(
+            "5x5_cookie_sync_files_event_date_ip_id_idx",
+            "event_date",
+            text("COALESCE(ip, '')"),
+            "id",
+        ),
         UniqueConstraint(
             "file_name",
             "up_id",
@@ -0,0 +1,20 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, TIMESTAMP, VARCHAR
+
+from .base import Base
+
+
+class LeadSyncWatermark(Base):
+    __tablename__ = "lead_sync_watermarks"
+
+    partition_key = Column(VARCHAR(64), primary_key=True, nullable=False)
+    last_event_date = Column(TIMESTAMP, nullable=True)
+    worker_id = Column(VARCHAR(128), nullable=True)
+    lease_until = Column(TIMESTAMP(timezone=True), nullable=True)
+    updated_at = Column(
+        TIMESTAMP,
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc).replace(tzinfo=None),
+        onupdate=lambda: datetime.now(timezone.utc).replace(tzinfo=None),
+    )
@@ -0,0 +1,27 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import BigInteger, UUID, Column, ForeignKey, TIMESTAMP, VARCHAR
+
+from .base import Base
+
+
+class LookalikeScoreWatermark(Base):
+    __tablename__ = "lookalike_score_watermarks"
+
+    lookalike_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("audience_lookalikes.id", ondelete="CASCADE"),
+        primary_key=True,
+        nullable=False,
+    )
+    scoring_key = Column(VARCHAR(64), nullable=False)
+    ingested_at = Column(TIMESTAMP, nullable=False)
+    # generation of enrichment_lookalike_scores rows readers see, NULL for
+    # rows written by a full scoring
+    scores_generation = Column(BigInteger, nullable=True)
+    updated_at = Column(
+        TIMESTAMP,
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc).replace(tzinfo=None),
+        onupdate=lambda: datetime.now(timezone.utc).replace(tzinfo=None),
+    )
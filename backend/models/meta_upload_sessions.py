@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    ForeignKey,
+    Integer,
+    TIMESTAMP,
+    VARCHAR,
+)
+from sqlalchemy.dialects.postgresql import JSONB
+
+from .base import Base
+
+
+class MetaUploadSession(Base):
+    __tablename__ = "meta_upload_sessions"
+
+    data_sync_id = Column(
+        BigInteger,
+        ForeignKey("integrations_users_sync.id", ondelete="CASCADE"),
+        primary_key=True,
+        nullable=False,
+    )
+    # digest of the lead ids the data sync worker re-queues with the message
+    leads_key = Column(VARCHAR(64), primary_key=True, nullable=False)
+    custom_audience_id = Column(VARCHAR(64), nullable=False)
+    session_id = Column(BigInteger, nullable=False)
+    batch_count = Column(Integer, nullable=False)
+    estimated_num_total = Column(Integer, nullable=False)
+    # batch_seq -> result of every batch sent so far
+    batch_results = Column(JSONB, nullable=False)
+    # lead id -> batch_seq of the leads still to be sent
+    lead_batches = Column(JSONB, nullable=False)
+    updated_at = Column(
+        TIMESTAMP,
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc).replace(tzinfo=None),
+        onupdate=lambda: datetime.now(timezone.utc).replace(tzinfo=None),
+    )
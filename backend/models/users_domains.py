@@ -44,6 +44,13 @@ class UserDomains(Base):
         nullable=False,
         default=lambda: datetime.now(timezone.utc).replace(tzinfo=None),
     )
+    updated_at = Column(
+        TIMESTAMP,
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc).replace(tzinfo=None),
+        # bumped by a trigger when a column lead_sync routing reads changes
+        server_default=text("(now() at time zone 'utc')"),
+    )
     pixel_installation_date = Column(
         TIMESTAMP,
         nullable=True,
@@ -75,6 +82,7 @@ class UserDomains(Base):
             unique=True,
         ),
         Index("users_domains_is_enable_idx", is_enable),
+        Index("users_domains_updated_at_idx", updated_at),
         UniqueConstraint("api_key", name="users_domains_unique"),
     )
 
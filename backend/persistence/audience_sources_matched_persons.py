@@ -1,6 +1,6 @@
 import logging
 
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from uuid import UUID
 from typing import List, Tuple
@@ -52,3 +52,26 @@ class AudienceSourcesMatchedPersonsPersistence:
         )
 
         return self.db.execute(query).scalars().all()
+
+    def snapshot_fingerprint(self, source_id: UUID) -> tuple[int, str, int]:
+        """
+        Order-independent fingerprint of the (asid, value_score) pairs of a
+        source: row count, value sum and a sum of per-row hashes.
+        """
+        row_hash = func.hashtext(
+            func.concat(
+                AudienceSourcesMatchedPerson.enrichment_user_asid,
+                ":",
+                AudienceSourcesMatchedPerson.value_score,
+            )
+        )
+        query = select(
+            func.count(),
+            func.coalesce(
+                func.sum(AudienceSourcesMatchedPerson.value_score), 0
+            ),
+            func.coalesce(func.sum(row_hash), 0),
+        ).where(AudienceSourcesMatchedPerson.source_id == source_id)
+
+        count, value_sum, hash_sum = self.db.execute(query).one()
+        return count, str(value_sum), hash_sum
@@ -1,11 +1,47 @@
-from typing import List
-from sqlalchemy import select
+from datetime import datetime, timezone
+from typing import Iterable, List
+from sqlalchemy import VARCHAR, Column, cast, column, select, update, values
 from sqlalchemy.dialects.postgresql import insert
 
 from db_dependencies import Db
 from enums import DataSyncImportedStatus
 from models import DataSyncImportedLead, IntegrationUserSync
 from resolver import injectable
+from sqlalchemy.orm import Session
+
+
+def update_imported_lead_statuses(
+    db: Session,
+    data_sync_id: int,
+    lead_column: Column,
+    statuses: Iterable[tuple[object, str]],
+) -> int:
+    """
+    Sets the status of the data sync's leads, matched by lead_column, in one
+    UPDATE ... FROM (VALUES ...). The last status of a repeated lead wins.
+    """
+    latest = dict(statuses)
+    if not latest:
+        return 0
+
+    rows = values(
+        column("lead_id", VARCHAR),
+        column("status", VARCHAR),
+        name="statuses",
+    ).data([(str(lead_id), status) for lead_id, status in latest.items()])
+    stmt = (
+        update(DataSyncImportedLead)
+        .where(
+            DataSyncImportedLead.data_sync_id == data_sync_id,
+            lead_column == cast(rows.c.lead_id, lead_column.type),
+        )
+        .values(
+            status=rows.c.status,
+            updated_at=datetime.now(timezone.utc).replace(tzinfo=None),
+        )
+    )
+    result = db.execute(stmt, execution_options={"synchronize_session": False})
+    return result.rowcount
 
 
 @injectable
@@ -1,5 +1,5 @@
 import logging
-from time import sleep
+from time import sleep, time_ns
 from typing import List, Tuple
 from uuid import UUID
 
@@ -7,6 +7,7 @@ from db_dependencies import Db, Clickhouse, ClickhouseInserter
 from models.enrichment.enrichment_lookalike_scores import (
     EnrichmentLookalikeScore,
 )
+from models.lookalike_score_watermarks import LookalikeScoreWatermark
 from resolver import injectable
 
 
@@ -27,6 +28,18 @@ class EnrichmentLookalikeScoresPersistence:
         self.db.add(new_score)
         return new_score
 
+    def current_generation(self, lookalike_id: UUID) -> int:
+        """
+        Generation of the scores readers should see: the one published in
+        lookalike_score_watermarks, or 0 for scores of a full scoring
+        """
+        generation = (
+            self.db.query(LookalikeScoreWatermark.scores_generation)
+            .filter(LookalikeScoreWatermark.lookalike_id == lookalike_id)
+            .scalar()
+        )
+        return generation or 0
+
     def select_top(
         self, lookalike_id: UUID, source_asids: list[UUID], top_count: int
     ) -> list[dict]:
@@ -35,6 +48,7 @@ class EnrichmentLookalikeScoresPersistence:
         query = """
         select asid, score from enrichment_lookalike_scores
             where lookalike_id = %(lookalike_id)s
+            and generation = %(generation)s
             and asid not in %(source_uuids)s 
             order by score desc
             limit %(total_rows)s
@@ -44,6 +58,7 @@ class EnrichmentLookalikeScoresPersistence:
             query,
             parameters={
                 "lookalike_id": lookalike_id,
+                "generation": self.current_generation(lookalike_id),
                 "source_uuids": source_asids,
                 "total_rows": top_count,
             },
@@ -54,14 +69,54 @@ class EnrichmentLookalikeScoresPersistence:
         logger.info(f"rows: {len(rows)}  ")
         return rows
 
+    def select_scores(self, lookalike_id: UUID) -> dict[UUID, float]:
+        result = self.ch.query(
+            "SELECT asid, score FROM enrichment_lookalike_scores WHERE lookalike_id = %(lookalike_id)s AND generation = %(generation)s",
+            parameters={
+                "lookalike_id": lookalike_id,
+                "generation": self.current_generation(lookalike_id),
+            },
+        )
+        return {asid: float(score) for asid, score in result.result_rows}
+
     def bulk_insert(self, lookalike_id: UUID, scores: List[Tuple[UUID, float]]):
         self.clickhouse_bulk_insert(lookalike_id, scores)
 
+    def stage(
+        self, lookalike_id: UUID, scores: List[Tuple[UUID, float]]
+    ) -> int:
+        """
+        Writes ``scores`` under a new generation, which readers ignore until
+        it is published in lookalike_score_watermarks. Returns the generation.
+        """
+        generation = time_ns()
+        self.clickhouse_bulk_insert(lookalike_id, scores, generation)
+        return generation
+
+    def drop_other_generations(self, lookalike_id: UUID, generation: int):
+        """
+        Drops the replaced scores, and the staged ones of an interrupted
+        refresh, once ``generation`` is published
+        """
+        self.ch.command(
+            "DELETE FROM enrichment_lookalike_scores WHERE lookalike_id = %(lookalike_id)s AND generation != %(generation)s",
+            parameters={"lookalike_id": lookalike_id, "generation": generation},
+        )
+
     def clickhouse_bulk_insert(
-        self, lookalike_id: UUID, scores: list[tuple[UUID, float]]
+        self,
+        lookalike_id: UUID,
+        scores: list[tuple[UUID, float]],
+        generation: int = 0,
     ):
-        rows = [(asid, lookalike_id, score) for asid, score in scores]
-        query_result = self.ch.insert("enrichment_lookalike_scores", rows)
+        rows = [
+            (asid, lookalike_id, score, generation) for asid, score in scores
+        ]
+        query_result = self.ch.insert(
+            "enrichment_lookalike_scores",
+            rows,
+            column_names=["asid", "lookalike_id", "score", "generation"],
+        )
         logger.info(f"Written rows to scores: {query_result.written_rows}")
 
     def commit(self):
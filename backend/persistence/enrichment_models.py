@@ -20,10 +20,15 @@ class EnrichmentModelsPersistence:
         self.db = db
 
     def save(
-        self, lookalike_id: UUID, model: CatBoostRegressor
+        self,
+        lookalike_id: UUID,
+        model: CatBoostRegressor,
+        cache_key: str | None = None,
     ) -> EnrichmentModels:
         new_model = EnrichmentModels(
-            lookalike_id=lookalike_id, model=model._serialize_model()
+            lookalike_id=lookalike_id,
+            model=model._serialize_model(),
+            cache_key=cache_key,
         )
 
         self.db.add(new_model)
@@ -45,5 +50,15 @@ class EnrichmentModelsPersistence:
         (model,) = result
         return model
 
+    def by_cache_key(self, cache_key: str) -> Optional[EnrichmentModels]:
+        stmt = (
+            select(EnrichmentModels)
+            .where(EnrichmentModels.cache_key == cache_key)
+            .order_by(EnrichmentModels.created_at.desc())
+            .limit(1)
+        )
+
+        return self.db.execute(stmt).scalars().first()
+
 
 EnrichmentModelsPersistenceDep = EnrichmentModelsPersistence
@@ -1,5 +1,6 @@
 import logging
 import time
+from datetime import datetime
 from typing import Iterable, List
 from uuid import UUID
 
@@ -35,6 +36,21 @@ class EnrichmentUsersPersistence:
         (count,) = result.first_row
         return count
 
+    def count_changed_since(self, column: str, since: datetime) -> int:
+        result = self.clickhouse.query(
+            f"SELECT count() FROM enrichment_users WHERE {column} > %(since)s",
+            parameters={"since": since},
+        )
+        (count,) = result.first_row
+        return count
+
+    def get_max(self, column: str):
+        result = self.clickhouse.query(
+            f"SELECT max({column}) FROM enrichment_users"
+        )
+        (value,) = result.first_row
+        return value
+
     def __normalize_and_filter_asids(self, asids: Iterable) -> List[str]:
         seen = set()
         out = []
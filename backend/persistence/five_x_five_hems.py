@@ -0,0 +1,59 @@
+import logging
+from typing import Iterable
+
+from db_dependencies import Clickhouse
+from resolver import injectable
+
+logger = logging.getLogger(__name__)
+
+SHA256_BATCH_SIZE = 10_000
+
+
+@injectable
+class FiveXFiveHemsPersistence:
+    def __init__(self, clickhouse: Clickhouse):
+        self.clickhouse = clickhouse
+
+    def get_unique_up_ids_by_sha256(
+        self, sha256_values: Iterable[str]
+    ) -> dict[str, str]:
+        """
+        Resolves many hashed emails at once.
+
+        Returns a sha256 -> up_id map containing only hashes that match exactly
+        one row; hashes with zero or several matches are left out.
+        """
+        hashes = sorted(
+            {
+                str(value).lower()
+                for value in sha256_values
+                if value and str(value) != "None"
+            }
+        )
+        if not hashes:
+            return {}
+
+        query = """
+            SELECT lower(hex(sha256_lc_hem)) AS sha256, groupArray(2)(up_id) AS up_ids
+            FROM five_x_five_hems
+            WHERE sha256_lc_hem IN (
+                SELECT unhex(arrayJoin({sha256_values:Array(String)}))
+            )
+            GROUP BY sha256_lc_hem
+        """
+        up_id_by_sha256 = {}
+        for i in range(0, len(hashes), SHA256_BATCH_SIZE):
+            chunk = hashes[i : i + SHA256_BATCH_SIZE]
+            result = self.clickhouse.query(
+                query, parameters={"sha256_values": chunk}
+            )
+            for sha256, up_ids in result.result_rows:
+                if len(up_ids) > 1:
+                    logger.debug(f"Too many SHA256_LOWER_CASEs {sha256}")
+                    continue
+                up_id_by_sha256[sha256] = str(up_ids[0])
+
+        logger.debug(
+            f"Resolved {len(up_id_by_sha256)} of {len(hashes)} SHA256_LOWER_CASEs"
+        )
+        return up_id_by_sha256
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+
+from db_dependencies import Db
+from models.meta_upload_sessions import MetaUploadSession
+from resolver import injectable
+
+# older sessions are started over rather than resumed
+SESSION_TTL = timedelta(days=1)
+
+
+@injectable
+class MetaUploadSessionPersistence:
+    def __init__(self, db: Db):
+        self.db = db
+
+    def get(
+        self, data_sync_id: int, leads_key: str
+    ) -> MetaUploadSession | None:
+        session = self.db.get(MetaUploadSession, (data_sync_id, leads_key))
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if session is None or session.updated_at < now - SESSION_TTL:
+            return None
+        return session
+
+    def save(
+        self,
+        data_sync_id: int,
+        leads_key: str,
+        custom_audience_id: str,
+        session_id: int,
+        batch_count: int,
+        estimated_num_total: int,
+        batch_results: dict[int, str],
+        lead_batches: dict[str, int],
+        replaces: str | None = None,
+    ):
+        """
+        Stores the session under the leads still to be sent, in place of
+        the state it was resumed from
+        """
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        self.__delete(data_sync_id, replaces)
+        self.db.execute(
+            delete(MetaUploadSession).where(
+                MetaUploadSession.updated_at < now - SESSION_TTL
+            )
+        )
+        stmt = insert(MetaUploadSession).values(
+            data_sync_id=data_sync_id,
+            leads_key=leads_key,
+            custom_audience_id=custom_audience_id,
+            session_id=session_id,
+            batch_count=batch_count,
+            estimated_num_total=estimated_num_total,
+            batch_results=batch_results,
+            lead_batches=lead_batches,
+            updated_at=now,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["data_sync_id", "leads_key"],
+            set_={
+                "custom_audience_id": stmt.excluded.custom_audience_id,
+                "session_id": stmt.excluded.session_id,
+                "batch_count": stmt.excluded.batch_count,
+                "estimated_num_total": stmt.excluded.estimated_num_total,
+                "batch_results": stmt.excluded.batch_results,
+                "lead_batches": stmt.excluded.lead_batches,
+                "updated_at": now,
+            },
+        )
+        self.db.execute(stmt)
+        self.db.commit()
+
+    def delete(self, data_sync_id: int, leads_key: str):
+        self.__delete(data_sync_id, leads_key)
+        self.db.commit()
+
+    def __delete(self, data_sync_id: int, leads_key: str | None):
+        if leads_key is None:
+            return
+        self.db.execute(
+            delete(MetaUploadSession).where(
+                MetaUploadSession.data_sync_id == data_sync_id,
+                MetaUploadSession.leads_key == leads_key,
+            )
+        )
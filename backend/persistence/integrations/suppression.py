@@ -1,7 +1,10 @@
 from sqlalchemy.orm import Session
 
 from db_dependencies import Db
+from sqlalchemy import func
+
 from models.integrations.leads_suppresions import LeadsSupperssion
+from models.integrations.users_domains_integrations import UserIntegration
 from resolver import injectable
 
 
@@ -35,3 +38,42 @@ class IntegrationsSuppressionPersistence:
             )
         except Exception:
             ...
+
+    def get_suppression_integration_ids(self) -> set[int]:
+        rows = (
+            self.db.query(UserIntegration.id)
+            .filter(UserIntegration.is_with_suppression == True)
+            .all()
+        )
+        return {row[0] for row in rows}
+
+    def get_max_id(self) -> int:
+        return self.db.query(
+            func.coalesce(func.max(LeadsSupperssion.id), 0)
+        ).scalar()
+
+    def get_domain_ids_added_after(self, last_id: int) -> set[int]:
+        rows = (
+            self.db.query(LeadsSupperssion.domain_id)
+            .filter(LeadsSupperssion.id > last_id)
+            .distinct()
+            .all()
+        )
+        return {row[0] for row in rows}
+
+    def get_suppressed_emails(
+        self, domain_id: int, integration_ids: set[int]
+    ) -> set[str]:
+        if not integration_ids:
+            return set()
+        rows = (
+            self.db.query(LeadsSupperssion.email)
+            .filter(
+                LeadsSupperssion.domain_id == domain_id,
+                LeadsSupperssion.integration_id.in_(integration_ids),
+                LeadsSupperssion.email.isnot(None),
+            )
+            .distinct()
+            .all()
+        )
+        return {row[0] for row in rows}
@@ -0,0 +1,179 @@
+import logging
+from dataclasses import dataclass
+
+from collections import defaultdict
+
+from sqlalchemy import BigInteger, Integer, column, func, select, update, values
+
+from db_dependencies import Db
+from models.leads_users import LeadUser
+from models.users import Users
+from models.users_domains import UserDomains
+from resolver import injectable
+
+logger = logging.getLogger(__name__)
+
+INCREMENT_CHUNK_SIZE = 1000
+
+
+@dataclass
+class LeadCounterDrift:
+    entity: str
+    entity_id: int
+    stored: int
+    actual: int
+
+
+@injectable
+class LeadCountersPersistence:
+    """
+    Set-based maintenance of users.total_leads and users_domains.total_leads.
+    """
+
+    def __init__(self, db: Db):
+        self.db = db
+
+    @staticmethod
+    def _actual_domain_counts():
+        return (
+            select(
+                UserDomains.id.label("domain_id"),
+                UserDomains.user_id.label("user_id"),
+                func.count(LeadUser.id).label("total_leads"),
+            )
+            .select_from(UserDomains)
+            .outerjoin(LeadUser, LeadUser.domain_id == UserDomains.id)
+            .group_by(UserDomains.id)
+            .subquery()
+        )
+
+    @classmethod
+    def _actual_user_counts(cls):
+        domain_counts = cls._actual_domain_counts()
+        return (
+            select(
+                Users.id.label("user_id"),
+                func.coalesce(func.sum(domain_counts.c.total_leads), 0).label(
+                    "total_leads"
+                ),
+            )
+            .select_from(Users)
+            .outerjoin(domain_counts, domain_counts.c.user_id == Users.id)
+            .group_by(Users.id)
+            .subquery()
+        )
+
+    def _increment_table(self, model, deltas: dict[int, int], chunk_size: int):
+        rows = sorted(deltas.items())
+        for i in range(0, len(rows), chunk_size):
+            chunk = values(
+                column("id", BigInteger),
+                column("delta", Integer),
+                name="deltas",
+            ).data(rows[i : i + chunk_size])
+            self.db.execute(
+                update(model)
+                .where(model.id == chunk.c.id)
+                .values(total_leads=model.total_leads + chunk.c.delta)
+                .execution_options(synchronize_session=False)
+            )
+
+    def increment(
+        self,
+        domain_count_list: list[dict],
+        chunk_size: int = INCREMENT_CHUNK_SIZE,
+    ):
+        """
+        Adds new lead counts with one UPDATE ... FROM (VALUES ...) per table
+        and chunk. Rows are sorted by id so concurrent workers lock them in
+        the same order.
+        """
+        user_deltas = defaultdict(int)
+        domain_deltas = defaultdict(int)
+        for item in domain_count_list:
+            user_deltas[item["user_id"]] += item["count"]
+            domain_deltas[item["domain_id"]] += item["count"]
+
+        self._increment_table(Users, user_deltas, chunk_size)
+        self._increment_table(UserDomains, domain_deltas, chunk_size)
+        self.db.commit()
+
+    def recount(self) -> tuple[int, int]:
+        """
+        Recounts both counters from leads_users in two UPDATE ... FROM
+        statements and returns how many domain and user rows changed.
+        """
+        domain_counts = self._actual_domain_counts()
+        domains_result = self.db.execute(
+            update(UserDomains)
+            .where(
+                UserDomains.id == domain_counts.c.domain_id,
+                UserDomains.total_leads.is_distinct_from(
+                    domain_counts.c.total_leads
+                ),
+            )
+            .values(total_leads=domain_counts.c.total_leads)
+            .execution_options(synchronize_session=False)
+        )
+
+        # domains are already up to date, so users sum them instead of
+        # scanning leads_users a second time
+        user_counts = (
+            select(
+                Users.id.label("user_id"),
+                func.coalesce(func.sum(UserDomains.total_leads), 0).label(
+                    "total_leads"
+                ),
+            )
+            .select_from(Users)
+            .outerjoin(UserDomains, UserDomains.user_id == Users.id)
+            .group_by(Users.id)
+            .subquery()
+        )
+        users_result = self.db.execute(
+            update(Users)
+            .where(
+                Users.id == user_counts.c.user_id,
+                Users.total_leads.is_distinct_from(user_counts.c.total_leads),
+            )
+            .values(total_leads=user_counts.c.total_leads)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return domains_result.rowcount, users_result.rowcount
+
+    def find_drift(self) -> list[LeadCounterDrift]:
+        """
+        Compares the stored counters with leads_users without writing.
+        """
+        domain_counts = self._actual_domain_counts()
+        domain_rows = self.db.execute(
+            select(
+                UserDomains.id,
+                UserDomains.total_leads,
+                domain_counts.c.total_leads,
+            )
+            .join(domain_counts, domain_counts.c.domain_id == UserDomains.id)
+            .where(
+                UserDomains.total_leads.is_distinct_from(
+                    domain_counts.c.total_leads
+                )
+            )
+        ).all()
+
+        user_counts = self._actual_user_counts()
+        user_rows = self.db.execute(
+            select(Users.id, Users.total_leads, user_counts.c.total_leads)
+            .join(user_counts, user_counts.c.user_id == Users.id)
+            .where(
+                Users.total_leads.is_distinct_from(user_counts.c.total_leads)
+            )
+        ).all()
+
+        return [
+            LeadCounterDrift("domain", domain_id, stored or 0, actual)
+            for domain_id, stored, actual in domain_rows
+        ] + [
+            LeadCounterDrift("user", user_id, stored or 0, actual)
+            for user_id, stored, actual in user_rows
+        ]
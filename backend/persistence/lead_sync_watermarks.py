@@ -0,0 +1,102 @@
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, or_, update
+from sqlalchemy.dialects.postgresql import insert
+
+from db_dependencies import Db
+from models.lead_sync_watermarks import LeadSyncWatermark
+from resolver import injectable
+
+logger = logging.getLogger(__name__)
+
+
+@injectable
+class LeadSyncWatermarkPersistence:
+    def __init__(self, db: Db):
+        self.db = db
+
+    def get_min_last_event_date(self) -> datetime | None:
+        return self.db.query(
+            func.min(LeadSyncWatermark.last_event_date)
+        ).scalar()
+
+    def ensure(self, partition_key: str, seed: datetime | None):
+        stmt = (
+            insert(LeadSyncWatermark)
+            .values(partition_key=partition_key, last_event_date=seed)
+            .on_conflict_do_nothing(index_elements=["partition_key"])
+        )
+        self.db.execute(stmt)
+        self.db.commit()
+
+    def get_last_event_date(self, partition_key: str) -> datetime | None:
+        return (
+            self.db.query(LeadSyncWatermark.last_event_date)
+            .filter(LeadSyncWatermark.partition_key == partition_key)
+            .scalar()
+        )
+
+    def try_claim(
+        self, partition_key: str, worker_id: str, lease: timedelta
+    ) -> bool:
+        """
+        Takes the partition lease if it is free, expired or already ours.
+        The check and the write are one UPDATE, so two workers racing for
+        the same partition cannot both win.
+        """
+        result = self.db.execute(
+            update(LeadSyncWatermark)
+            .where(
+                LeadSyncWatermark.partition_key == partition_key,
+                or_(
+                    LeadSyncWatermark.lease_until.is_(None),
+                    LeadSyncWatermark.lease_until < func.now(),
+                    LeadSyncWatermark.worker_id == worker_id,
+                ),
+            )
+            .values(worker_id=worker_id, lease_until=func.now() + lease)
+        )
+        self.db.commit()
+        return result.rowcount == 1
+
+    def advance(
+        self,
+        partition_key: str,
+        worker_id: str,
+        last_event_date: datetime,
+        lease: timedelta,
+    ) -> bool:
+        """
+        Moves the watermark, extends the lease and commits the transaction,
+        so the work done up to the watermark lands together with it. Returns
+        False when the lease was lost to another worker, in which case the
+        whole transaction is rolled back.
+        """
+        result = self.db.execute(
+            update(LeadSyncWatermark)
+            .where(
+                LeadSyncWatermark.partition_key == partition_key,
+                LeadSyncWatermark.worker_id == worker_id,
+            )
+            .values(
+                last_event_date=last_event_date,
+                lease_until=func.now() + lease,
+            )
+        )
+        if result.rowcount != 1:
+            self.db.rollback()
+            return False
+        self.db.commit()
+        return True
+
+    def release(self, partition_key: str, worker_id: str):
+        self.db.execute(
+            update(LeadSyncWatermark)
+            .where(
+                LeadSyncWatermark.partition_key == partition_key,
+                LeadSyncWatermark.worker_id == worker_id,
+            )
+            .values(worker_id=None, lease_until=None)
+        )
+        self.db.commit()
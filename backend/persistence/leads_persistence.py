@@ -1,7 +1,7 @@
 import logging
 import math
 from datetime import datetime, timedelta, timezone
-from typing import List
+from typing import Iterable, List
 from uuid import UUID
 
 import pytz
@@ -629,6 +629,31 @@ class LeadsPersistence:
 
         return leads_ids
 
+    def get_five_x_five_users_by_up_ids(
+        self, up_ids: Iterable[str], chunk_size: int = 1000
+    ) -> dict[str, FiveXFiveUser]:
+        """
+        Loads 5x5 users in chunked IN queries, keyed by lower-cased up_id.
+
+        lead_sync loads them once per batch and commits the batch as a
+        whole with its visits and watermark. The rows are expunged so that
+        they stay usable detached and a commit or rollback of the caller
+        never expires them into one reload each.
+        """
+        users_by_up_id = {}
+        unique_up_ids = sorted({str(up_id).lower() for up_id in up_ids})
+        for i in range(0, len(unique_up_ids), chunk_size):
+            chunk = unique_up_ids[i : i + chunk_size]
+            users = (
+                self.db.query(FiveXFiveUser)
+                .filter(FiveXFiveUser.up_id.in_(chunk))
+                .all()
+            )
+            for user in users:
+                self.db.expunge(user)
+                users_by_up_id[str(user.up_id).lower()] = user
+        return users_by_up_id
+
     def unconfirm_leads(self, leads_ids: list[int]):
         self.db.query(LeadUser).filter(LeadUser.id.in_(leads_ids)).update(
             {LeadUser.is_confirmed: False}
@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+from uuid import UUID
+
+from sqlalchemy.dialects.postgresql import insert
+
+from db_dependencies import Db
+from models.lookalike_score_watermarks import LookalikeScoreWatermark
+from resolver import injectable
+
+
+@injectable
+class LookalikeScoreWatermarkPersistence:
+    def __init__(self, db: Db):
+        self.db = db
+
+    def get(self, lookalike_id: UUID) -> LookalikeScoreWatermark | None:
+        return self.db.get(LookalikeScoreWatermark, lookalike_id)
+
+    def save(
+        self,
+        lookalike_id: UUID,
+        scoring_key: str,
+        ingested_at: datetime,
+        scores_generation: int | None = None,
+    ):
+        stmt = insert(LookalikeScoreWatermark).values(
+            lookalike_id=lookalike_id,
+            scoring_key=scoring_key,
+            ingested_at=ingested_at,
+            scores_generation=scores_generation,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["lookalike_id"],
+            set_={
+                "scoring_key": stmt.excluded.scoring_key,
+                "ingested_at": stmt.excluded.ingested_at,
+                "scores_generation": stmt.excluded.scores_generation,
+                "updated_at": datetime.now(timezone.utc).replace(tzinfo=None),
+            },
+        )
+        self.db.execute(stmt)
+        self.db.commit()
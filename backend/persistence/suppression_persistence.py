@@ -2,17 +2,19 @@ from datetime import datetime
 
 import math
 
+from db_dependencies import Db
 from models.suppressions_list import SuppressionList
-from sqlalchemy.orm import Session
 from enums import SuppressionStatus
 from fastapi import HTTPException, status
 from models.suppression_rule import SuppressionRule
-from sqlalchemy import func
+from sqlalchemy import Text, cast, func
 from models.integrations.suppressed_contact import SuppressedContact
+from resolver import injectable
 
 
+@injectable
 class SuppressionPersistence:
-    def __init__(self, db: Session):
+    def __init__(self, db: Db):
         self.db = db
 
     def get_all_suppression_list(self, domain_id: int):
@@ -203,3 +205,36 @@ class SuppressionPersistence:
             .filter(SuppressedContact.domain_id == domain_id)
             .scalar()
         )
+
+    def get_rule_fingerprints(self) -> dict[int, str]:
+        rows = self.db.query(
+            SuppressionRule.domain_id,
+            func.md5(
+                func.concat_ws(
+                    "|",
+                    cast(SuppressionRule.is_url_certain_activation, Text),
+                    SuppressionRule.activate_certain_urls,
+                    cast(SuppressionRule.is_based_activation, Text),
+                    SuppressionRule.activate_based_urls,
+                    SuppressionRule.suppressions_multiple_emails,
+                )
+            ),
+        ).all()
+        return {domain_id: fingerprint for domain_id, fingerprint in rows}
+
+    def get_list_fingerprints(self) -> dict[int, tuple[int, int, int]]:
+        rows = (
+            self.db.query(
+                SuppressionList.domain_id,
+                func.count(SuppressionList.id),
+                func.max(SuppressionList.id),
+                func.sum(SuppressionList.id),
+            )
+            .filter(SuppressionList.domain_id.isnot(None))
+            .group_by(SuppressionList.domain_id)
+            .all()
+        )
+        return {
+            domain_id: (count, max_id, int(sum_id))
+            for domain_id, count, max_id, sum_id in rows
+        }
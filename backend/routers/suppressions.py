@@ -12,7 +12,6 @@ from schemas.suppressions import SuppressionRequest, CollectionRuleRequest
 from dependencies import get_db
 from sqlalchemy.orm import Session
 from persistence.suppression_persistence import SuppressionPersistence
-from dependencies import get_suppression_persistence
 
 router = APIRouter()
 
@@ -201,9 +200,7 @@ async def process_page_views_limit(
 
 @router.get("/suppressed-contacts-count")
 async def get_suppressed_contacts_count(
-    suppression_persistence: SuppressionPersistence = Depends(
-        get_suppression_persistence
-    ),
+    suppression_persistence: SuppressionPersistence,
     domain=Depends(check_domain),
 ):
     count = suppression_persistence.get_contacts_count(domain.id)
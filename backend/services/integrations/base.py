@@ -1,9 +1,6 @@
-import ssl
-
-import httpx
-import truststore
 from fastapi import HTTPException
 
+from config.http import get_sync_http_client
 from db_dependencies import Db
 from enums import DataSyncType
 from enums import ProccessDataSyncResult, DomainStatus
@@ -91,9 +88,7 @@ class IntegrationService:
         green_arrow: GreenArrowIntegrationsService,
     ):
         self.db = db
-        self.client = httpx.Client(
-            verify=truststore.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
-        )
+        self.client = get_sync_http_client()
         self.integration_persistence = integration_persistence
         self.user_persistence = user_persistence
         self.lead_persistence = lead_persistence
@@ -349,4 +344,5 @@ class IntegrationService:
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        self.client.close()
+        # the client is shared by the whole process
+        pass
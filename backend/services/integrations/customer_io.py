@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import uuid
 from typing import Any
@@ -241,7 +242,7 @@ class CustomerIoIntegrationsService(AbstractIntegrationService):
                     f"Failed to send user with lead_id={lead_user.id}, 5x5_user_id={fxf_user.id}, exception found:\n{e}"
                 )
 
-        client.flush()
+        await asyncio.to_thread(client.flush)
 
         return results
 
@@ -318,8 +319,8 @@ class CustomerIoIntegrationsService(AbstractIntegrationService):
                 continue
 
             if field_name == "visited_date":
-                visited_date = self.leads_persistence.get_visited_date(
-                    lead_visit_id
+                visited_date = await asyncio.to_thread(
+                    self.leads_persistence.get_visited_date, lead_visit_id
                 )
                 if visited_date:
                     customer_io_traits[field_name] = visited_date.strftime(
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 from datetime import datetime
@@ -426,14 +427,16 @@ class GoHighLevelIntegrationsService:
         is_email_validation_enabled: bool,
     ):
         results = []
-        access_token = self.refresh_ghl_token(user_integration)
+        access_token = await asyncio.to_thread(
+            self.refresh_ghl_token, user_integration
+        )
 
         if not access_token:
             logging.error(
                 f"GHL access token is invalid for integration {user_integration.id}"
             )
             integration_data_sync.sync_status = False
-            self.db.commit()
+            await asyncio.to_thread(self.db.commit)
             return []
 
         for lead_user, five_x_five_user in user_data:
@@ -454,8 +457,10 @@ class GoHighLevelIntegrationsService:
                 )
                 continue
             else:
-                result = self.upsert_contact(
-                    access_token=access_token, contact_data=contact_data
+                result = await asyncio.to_thread(
+                    self.upsert_contact,
+                    access_token=access_token,
+                    contact_data=contact_data,
                 )
                 if result == ProccessDataSyncResult.INCORRECT_FORMAT.value:
                     results.append(
@@ -515,8 +520,8 @@ class GoHighLevelIntegrationsService:
             "address1": get_valid_location(five_x_five_user)[0],
             "city": get_valid_location(five_x_five_user)[1],
             "state": get_valid_location(five_x_five_user)[2],
-            "visited_date": self.lead_persistence.get_visited_date(
-                lead_visit_id
+            "visited_date": await asyncio.to_thread(
+                self.lead_persistence.get_visited_date, lead_visit_id
             )
             if any(f["type"] == "visited_date" for f in data_map)
             else None,
@@ -539,7 +544,9 @@ class GoHighLevelIntegrationsService:
         }
 
         custom_fields = []
-        existing_fields = self.list_custom_fields(access_token, location_id)
+        existing_fields = await asyncio.to_thread(
+            self.list_custom_fields, access_token, location_id
+        )
 
         for field in data_map:
             t = field["type"]
@@ -562,7 +569,8 @@ class GoHighLevelIntegrationsService:
 
             if field_name not in existing_fields:
                 try:
-                    resp = self.create_custom_field(
+                    resp = await asyncio.to_thread(
+                        self.create_custom_field,
                         access_token=access_token,
                         location_id=location_id,
                         key=field_name,
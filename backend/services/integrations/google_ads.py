@@ -1,8 +1,8 @@
+import asyncio
 import hashlib
 import logging
 import os
 import re
-import time
 from typing import Tuple, Annotated
 
 
@@ -50,6 +50,7 @@ from services.integrations.commonIntegration import resolve_main_email_and_phone
 from services.integrations.million_verifier import (
     MillionVerifierIntegrationsService,
 )
+from services.integrations.rate_limit import RateKey, get_rate_limiter
 from utils import (
     validate_and_format_phone,
     get_valid_email,
@@ -64,6 +65,8 @@ from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
 
+THROTTLED_RETRIES = 3
+
 
 class NewList(BaseModel):
     name: str
@@ -337,15 +340,24 @@ class GoogleAdsIntegrationsService:
         if not profiles:
             return results
 
-        list_response = self.__add_profile_to_list(
+        list_response = await asyncio.to_thread(
+            self.__add_profile_to_list,
             access_token=user_integration.access_token,
             customer_id=integration_data_sync.customer_id,
             user_list_id=integration_data_sync.list_id,
             profiles=profiles,
         )
-
-        if list_response == ProccessDataSyncResult.TOO_MANY_REQUESTS.value:
-            return self.__add_profile_to_list(
+        # the audience data sync agent has no delay queue, so throttled
+        # uploads wait out the backoff here without blocking the event loop
+        rate_key = RateKey.of(
+            SourcePlatformEnum.GOOGLE_ADS.value, user_integration.access_token
+        )
+        for _ in range(THROTTLED_RETRIES):
+            if list_response != ProccessDataSyncResult.TOO_MANY_REQUESTS.value:
+                break
+            await get_rate_limiter().acquire(rate_key, 0)
+            list_response = await asyncio.to_thread(
+                self.__add_profile_to_list,
                 access_token=user_integration.access_token,
                 customer_id=integration_data_sync.customer_id,
                 user_list_id=integration_data_sync.list_id,
@@ -393,21 +405,14 @@ class GoogleAdsIntegrationsService:
         if not profiles:
             return results
 
-        list_response = self.__add_profile_to_list(
+        list_response = await asyncio.to_thread(
+            self.__add_profile_to_list,
             access_token=user_integration.access_token,
             customer_id=integration_data_sync.customer_id,
             user_list_id=integration_data_sync.list_id,
             profiles=profiles,
         )
 
-        if list_response == ProccessDataSyncResult.TOO_MANY_REQUESTS.value:
-            return self.__add_profile_to_list(
-                access_token=user_integration.access_token,
-                customer_id=integration_data_sync.customer_id,
-                user_list_id=integration_data_sync.list_id,
-                profiles=profiles,
-            )
-
         if list_response != ProccessDataSyncResult.SUCCESS.value:
             for result in results:
                 if result["status"] == ProccessDataSyncResult.SUCCESS.value:
@@ -450,6 +455,7 @@ class GoogleAdsIntegrationsService:
     def __add_profile_to_list(
         self, access_token, customer_id, user_list_id, profiles
     ):
+        rate_key = RateKey.of(SourcePlatformEnum.GOOGLE_ADS.value, access_token)
         client = self.get_google_ads_client(access_token)
         ad_user_data_consent = client.enums.ConsentStatusEnum.GRANTED
         ad_personalization_consent = client.enums.ConsentStatusEnum.GRANTED
@@ -476,7 +482,7 @@ class GoogleAdsIntegrationsService:
                 r"Retry in \d+ seconds", msg
             ):
                 logger.warning(f"Rate limit exceeded: {msg}")
-                time.sleep(10)
+                get_rate_limiter().throttled(rate_key)
                 return ProccessDataSyncResult.TOO_MANY_REQUESTS.value
             else:
                 logger.error(f"Quota exhausted: {msg}")
@@ -496,11 +502,11 @@ class GoogleAdsIntegrationsService:
                 and "Too many requests" in message
             ):
                 m = re.search(r"Retry in (\d+) seconds", message)
-                retry_secs = int(m.group(1)) if m else 10
+                retry_secs = int(m.group(1)) if m else None
                 logger.warning(
                     f"Rate limit exceeded (request {request_id}): retry in {retry_secs}s – {message}"
                 )
-                time.sleep(retry_secs)
+                get_rate_limiter().throttled(rate_key, retry_secs)
                 return ProccessDataSyncResult.TOO_MANY_REQUESTS.value
 
             if (
@@ -522,7 +528,7 @@ class GoogleAdsIntegrationsService:
                 r"Retry in \d+ seconds", msg
             ):
                 logger.warning(f"Rate limit exceeded: {msg}")
-                time.sleep(10)
+                get_rate_limiter().throttled(rate_key)
                 return ProccessDataSyncResult.TOO_MANY_REQUESTS.value
             else:
                 logger.error(f"GoogleAds error: {ex}")
@@ -564,7 +570,9 @@ class GoogleAdsIntegrationsService:
 
         address_parts = get_valid_location(five_x_five_user)
 
-        visited_date = self.leads_persistence.get_visited_date(lead_visit_id)
+        visited_date = await asyncio.to_thread(
+            self.leads_persistence.get_visited_date, lead_visit_id
+        )
 
         return GoogleAdsProfile(
             email=first_email,
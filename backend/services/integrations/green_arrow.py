@@ -1,3 +1,4 @@
+import asyncio
 from datetime import date, datetime
 import json
 import logging
@@ -262,7 +263,9 @@ class GreenArrowIntegrationsService:
         base = base_url.rstrip("/")
         get_url = f"{base}/mailing_lists/{list_id}/custom_fields"
 
-        resp = self.client.get(get_url, headers=headers)
+        resp = await asyncio.to_thread(
+            self.client.get, get_url, headers=headers
+        )
 
         if resp.status_code not in (200, 201):
             logging.warning(
@@ -296,7 +299,9 @@ class GreenArrowIntegrationsService:
                 "custom_field": {"name": field_name, "field_type": "text"}
             }
             try:
-                r = self.client.post(post_url, headers=headers, json=payload)
+                r = await asyncio.to_thread(
+                    self.client.post, post_url, headers=headers, json=payload
+                )
             except httpx.RequestError as e:
                 logging.warning(
                     "Network error creating custom_field %s: %s", field_name, e
@@ -719,8 +724,12 @@ class GreenArrowIntegrationsService:
         }
 
         try:
-            resp = self.client.post(
-                url, headers=headers, json=payload, timeout=60.0
+            resp = await asyncio.to_thread(
+                self.client.post,
+                url,
+                headers=headers,
+                json=payload,
+                timeout=60.0,
             )
         except Exception as exc:
             logging.error("HTTP error when starting subscriber_import: %s", exc)
@@ -9,6 +9,7 @@ import httpcore
 import httpx
 from fastapi import HTTPException, Depends
 
+from config.http import get_async_http_pool
 from enums import (
     SourcePlatformEnum,
     IntegrationsStatus,
@@ -34,6 +35,7 @@ from services.integrations.commonIntegration import *
 from services.integrations.million_verifier import (
     MillionVerifierIntegrationsService,
 )
+from services.integrations.rate_limit import RateKey, get_rate_limiter
 from utils import (
     get_valid_email,
     get_valid_location,
@@ -90,13 +92,16 @@ class HubspotIntegrationsService:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.request(
-                    method=method,
-                    url=url,
-                    headers=headers,
-                    json=json,
-                )
+            response = await get_async_http_pool().request(
+                method=method,
+                url=url,
+                headers=headers,
+                json=json,
+            )
+            get_rate_limiter().observe(
+                RateKey.of(SourcePlatformEnum.HUBSPOT.value, access_token),
+                response,
+            )
             return response
 
         except httpx.ConnectTimeout:
@@ -6,10 +6,10 @@ from datetime import date, datetime
 from typing import Tuple
 
 import httpx
-from aiolimiter import AsyncLimiter
 
 from fastapi import HTTPException
 
+from config.http import get_async_http_pool
 from enums import (
     IntegrationsStatus,
     SourcePlatformEnum,
@@ -33,6 +33,7 @@ from services.integrations.commonIntegration import *
 from services.integrations.million_verifier import (
     MillionVerifierIntegrationsService,
 )
+from services.integrations.rate_limit import RateKey, get_rate_limiter
 from utils import (
     format_phone_number,
     get_valid_email,
@@ -65,13 +66,7 @@ class InstantlyIntegrationsService:
         self.sync_persistence = sync_persistence
         self.client = requests.Session()
 
-        limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
-        timeout = httpx.Timeout(10.0, connect=5.0, read=20.0)
-
-        self.async_client = httpx.AsyncClient(
-            base_url=self.BASE_URL, limits=limits, timeout=timeout
-        )
-        self.global_limiter = AsyncLimiter(100, 10.0)
+        self._timeout = httpx.Timeout(10.0, connect=5.0, read=20.0)
 
     def __handle_request(
         self,
@@ -599,15 +594,21 @@ class InstantlyIntegrationsService:
             "Accept": "application/json",
         }
 
+        rate_key = RateKey.of(SourcePlatformEnum.INSTANTLY.value, api_key)
         base_backoffs = [1.0, 2.0, 4.0]
         attempts_total = max_retries + 1
 
         for attempt in range(1, attempts_total + 1):
             try:
-                async with self.global_limiter:
-                    resp = await self.async_client.post(
-                        "/leads", json=lead_payload, headers=headers
-                    )
+                await get_rate_limiter().acquire(rate_key)
+                resp = await get_async_http_pool().request(
+                    "POST",
+                    f"{self.BASE_URL}/leads",
+                    json=lead_payload,
+                    headers=headers,
+                    timeout=self._timeout,
+                )
+                get_rate_limiter().observe(rate_key, resp)
 
                 try:
                     _body = resp.json()
@@ -632,13 +633,8 @@ class InstantlyIntegrationsService:
                     )
 
                 if status == 429:
+                    # the data sync worker re-queues the lead with a delay
                     logging.warning("[Instantly]: TOO MANY REQUESTS")
-                    if attempt < attempts_total:
-                        backoff = base_backoffs[
-                            min(attempt - 1, len(base_backoffs) - 1)
-                        ]
-                        await asyncio.sleep(backoff)
-                        continue
                     return False, ProccessDataSyncResult.TOO_MANY_REQUESTS.value
 
                 if 500 <= status < 600:
@@ -9,6 +9,7 @@ import httpcore
 import httpx
 from fastapi import HTTPException, Depends
 
+from config.http import get_async_http_pool
 from enums import (
     IntegrationsStatus,
     SourcePlatformEnum,
@@ -39,6 +40,7 @@ from services.data_sync_imported_lead import DataSyncImportedService
 from services.integrations.million_verifier import (
     MillionVerifierIntegrationsService,
 )
+from services.integrations.rate_limit import RateKey, get_rate_limiter
 from utils import (
     get_valid_email,
     get_http_client,
@@ -115,13 +117,15 @@ class KlaviyoIntegrationsService:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.request(
-                    method=method,
-                    url=url,
-                    headers=headers,
-                    json=json,
-                )
+            response = await get_async_http_pool().request(
+                method=method,
+                url=url,
+                headers=headers,
+                json=json,
+            )
+            get_rate_limiter().observe(
+                RateKey.of(SourcePlatformEnum.KLAVIYO.value, api_key), response
+            )
             return response
 
         except httpx.ConnectTimeout:
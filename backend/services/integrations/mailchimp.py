@@ -1,3 +1,4 @@
+import asyncio
 import hashlib
 import json
 import logging
@@ -430,8 +431,11 @@ class MailchimpIntegrationsService:
         if not profiles:
             return results
 
-        profile = self.__create_profile(
-            user_integration, integration_data_sync, profiles
+        profile = await asyncio.to_thread(
+            self.__create_profile,
+            user_integration,
+            integration_data_sync,
+            profiles,
         )
         if profile in (
             ProccessDataSyncResult.AUTHENTICATION_FAILED.value,
@@ -696,11 +700,13 @@ class MailchimpIntegrationsService:
             or getattr(five_x_five_user, "company_zip", None),
         }
 
-        time_on_site, url_visited = self.leads_persistence.get_visit_stats(
-            five_x_five_user.id
+        time_on_site, url_visited = await asyncio.to_thread(
+            self.leads_persistence.get_visit_stats, five_x_five_user.id
         )
 
-        visited_date = self.leads_persistence.get_visited_date(lead_visit_id)
+        visited_date = await asyncio.to_thread(
+            self.leads_persistence.get_visited_date, lead_visit_id
+        )
 
         result = {
             "email_address": email,
@@ -1,6 +1,9 @@
+import asyncio
 import hashlib
 import json
 import os
+import secrets
+from dataclasses import dataclass, field
 from datetime import datetime, timezone, timedelta
 from typing import List, Tuple, Annotated
 from uuid import UUID
@@ -12,6 +15,7 @@ from facebook_business.api import FacebookAdsApi
 from facebook_business.exceptions import FacebookRequestError
 from fastapi import HTTPException, Depends
 
+from config.http import get_async_http_pool
 from config.meta import MetaConfig
 from enums import (
     IntegrationsStatus,
@@ -28,6 +32,9 @@ from persistence.domains import UserDomainsPersistence
 from persistence.integrations.integrations_persistence import (
     IntegrationsPersistence,
 )
+from persistence.integrations.meta_upload_sessions import (
+    MetaUploadSessionPersistence,
+)
 from persistence.integrations.user_sync import IntegrationsUserSyncPersistence
 from persistence.leads_persistence import LeadsPersistence
 from resolver import injectable
@@ -47,6 +54,7 @@ from services.integrations.commonIntegration import resolve_main_email_and_phone
 from services.integrations.million_verifier import (
     MillionVerifierIntegrationsService,
 )
+from services.integrations.rate_limit import RateKey, get_rate_limiter
 from utils import (
     get_valid_email,
     format_phone_number,
@@ -61,12 +69,107 @@ API_VERSION = "v23.0"
 
 logger = logging.getLogger(__name__)
 
+# app, user, ad account and custom audience throttling
+RATE_LIMIT_CODES = {4, 17, 32, 613, 80003}
+
+UPLOAD_BATCH_SIZE = 10_000
+"""
+Rows Meta accepts in one custom audience users request
+"""
+UPLOAD_CONCURRENCY = 4
+UPLOAD_ATTEMPTS = 3
+RETRYABLE_UPLOAD_RESULTS = {
+    ProccessDataSyncResult.TOO_MANY_REQUESTS.value,
+    ProccessDataSyncResult.UNEXPECTED_ERROR.value,
+}
+UPLOAD_SCHEMA = [
+    "EMAIL",
+    "PHONE",
+    "GEN",
+    "DOBY",
+    "DOBM",
+    "DOBD",
+    "FN",
+    "LN",
+    "FI",
+    "ST",
+    "CT",
+    "ZIP",
+    "COUNTRY",
+]
+
 SUBCODE_MESSAGES = {
     2446375: "Daily budget is too small. Increase the campaign daily budget.",
     1870090: "Custom Audience Terms not accepted. Ask admin to accept Terms for this account.",
 }
 
 
+@dataclass
+class AudienceUploadSession:
+    """
+    Multi-batch upload of profiles to a custom audience. Batches that Meta
+    accepted are skipped when the session is uploaded again, the rest keep
+    their session_id and batch_seq. A session resumed by a later message
+    only holds the profiles of the batches still to be sent.
+    """
+
+    custom_audience_id: str
+    profiles: list
+    schema: list[str] = field(default_factory=lambda: list(UPLOAD_SCHEMA))
+    """
+    Columns of the profile rows
+    """
+    session_id: int = field(default_factory=lambda: secrets.randbits(62) + 1)
+    batch_results: dict[int, str] = field(default_factory=dict)
+    batch_seqs: list[int] = field(default_factory=list)
+    """
+    batch_seq of each profile, UPLOAD_BATCH_SIZE profiles per batch in order
+    unless resumed
+    """
+    batch_count: int = 0
+    estimated_num_total: int = 0
+
+    def __post_init__(self):
+        if not self.batch_seqs:
+            self.batch_seqs = [
+                index // UPLOAD_BATCH_SIZE + 1
+                for index in range(len(self.profiles))
+            ]
+        self.batch_count = self.batch_count or max(self.batch_seqs, default=1)
+        self.estimated_num_total = self.estimated_num_total or len(
+            self.profiles
+        )
+
+    def batch(self, batch_seq: int) -> list:
+        return [
+            profile
+            for profile, seq in zip(self.profiles, self.batch_seqs)
+            if seq == batch_seq
+        ]
+
+    def pending(self) -> list[int]:
+        return [
+            batch_seq
+            for batch_seq in sorted(set(self.batch_seqs))
+            if self.batch_results.get(batch_seq)
+            != ProccessDataSyncResult.SUCCESS.value
+        ]
+
+    def result_of(self, profile_index: int) -> str | None:
+        return self.batch_results.get(self.batch_seqs[profile_index])
+
+    @property
+    def status(self) -> str:
+        """
+        SUCCESS, or the result of the first batch that failed
+        """
+        for batch_seq in sorted(set(self.batch_seqs)):
+            result = self.batch_results.get(batch_seq)
+            if result != ProccessDataSyncResult.SUCCESS.value:
+                return result or ProccessDataSyncResult.UNEXPECTED_ERROR.value
+        return ProccessDataSyncResult.SUCCESS.value
+
+
 class MetaError(Exception):
     def __init__(self, user_message: str | None):
         super().__init__(self, user_message)
@@ -87,12 +190,14 @@ class MetaIntegrationsService:
         sync_persistence: IntegrationsUserSyncPersistence,
         client: Annotated[httpx.Client, Depends(get_http_client)],
         million_verifier_integrations: MillionVerifierIntegrationsService,
+        upload_session_persistence: MetaUploadSessionPersistence,
     ):
         self.domain_persistence = domain_persistence
         self.integrations_persisntece = integrations_persistence
         self.leads_persistence = leads_persistence
         self.sync_persistence = sync_persistence
         self.million_verifier_integrations = million_verifier_integrations
+        self.upload_session_persistence = upload_session_persistence
         self.client = client
 
     def _ensure_act_prefix(slef, ad_account_id: str) -> str:
@@ -945,6 +1050,7 @@ class MetaIntegrationsService:
         validations: dict = {},
     ):
         profiles: list[list[str]] = []
+        profile_results: list[int] = []
         results = []
         for enrichment_user in enrichment_users:
             profile = self.__hash_mapped_meta_user(
@@ -968,34 +1074,27 @@ class MetaIntegrationsService:
 
             if profile:
                 profiles.append(profile)
+                profile_results.append(len(results) - 1)
 
         if not profiles:
             return results
 
-        bulk_result = self.__create_user(
-            custom_audience_id=integration_data_sync.list_id,
+        upload = await self.upload_profiles(
+            AudienceUploadSession(integration_data_sync.list_id, profiles),
             access_token=user_integration.access_token,
-            profiles=profiles,
         )
-
-        if bulk_result != ProccessDataSyncResult.SUCCESS.value:
-            for result in results:
-                if result["status"] == ProccessDataSyncResult.SUCCESS.value:
-                    result["status"] = bulk_result
-
+        self.__apply_upload_results(upload, results, profile_results)
         return results
 
     async def add_hashed_emails_to_list(
         self, access_token: str, list_id: str, hashed_emails: list[str]
     ):
         profiles = [[hashed_email] for hashed_email in hashed_emails]
-        bulk_result = self.__create_user(
-            custom_audience_id=list_id,
+        upload = await self.upload_profiles(
+            AudienceUploadSession(list_id, profiles, schema=["EMAIL"]),
             access_token=access_token,
-            profiles=profiles,
         )
-
-        return bulk_result
+        return upload.status
 
     async def process_data_sync_lead(
         self,
@@ -1005,6 +1104,8 @@ class MetaIntegrationsService:
         is_email_validation_enabled: bool,
     ):
         profiles = []
+        profile_leads: list[str] = []
+        profile_results: list[int] = []
         results = []
         for lead_user, five_x_five_user in user_data:
             profile = await self.__hash_mapped_meta_user_lead(
@@ -1026,67 +1127,248 @@ class MetaIntegrationsService:
                 )
 
             profiles.append(profile)
+            profile_leads.append(str(lead_user.id))
+            profile_results.append(len(results) - 1)
 
         if not profiles:
             return results
 
-        bulk_result = self.__create_user(
-            custom_audience_id=integration_data_sync.list_id,
+        # throttled leads are re-queued by the data sync worker, which
+        # resumes the session saved under them
+        leads_key = self.__leads_key(
+            str(lead_user.id) for lead_user, _ in user_data
+        )
+        upload, resumed = await asyncio.to_thread(
+            self.__resume_upload,
+            integration_data_sync,
+            leads_key,
+            profiles,
+            profile_leads,
+        )
+        upload = await self.upload_profiles(
+            upload,
             access_token=user_integration.access_token,
-            profiles=profiles,
+            attempts=1,
+            resumable=True,
         )
-        if bulk_result != ProccessDataSyncResult.SUCCESS.value:
-            for result in results:
-                if result["status"] == ProccessDataSyncResult.SUCCESS.value:
-                    result["status"] = bulk_result
-
+        await asyncio.to_thread(
+            self.__save_upload,
+            integration_data_sync.id,
+            leads_key if resumed else None,
+            upload,
+            profile_leads,
+        )
+        self.__apply_upload_results(upload, results, profile_results)
         return results
 
-    def __create_user(
-        self, custom_audience_id: str, access_token: str, profiles: List[dict]
-    ):
-        payload = {
-            "schema": [
-                "EMAIL",
-                "PHONE",
-                "GEN",
-                "DOBY",
-                "DOBM",
-                "DOBD",
-                "FN",
-                "LN",
-                "FI",
-                "ST",
-                "CT",
-                "ZIP",
-                "COUNTRY",
+    @staticmethod
+    def __leads_key(lead_ids) -> str:
+        return hashlib.sha256(",".join(sorted(lead_ids)).encode()).hexdigest()
+
+    def __resume_upload(
+        self,
+        integration_data_sync: IntegrationUserSync,
+        leads_key: str,
+        profiles: list,
+        profile_leads: list[str],
+    ) -> Tuple[AudienceUploadSession, bool]:
+        """
+        The session saved for these leads by the message that was throttled,
+        or a new one
+        """
+        saved = self.upload_session_persistence.get(
+            integration_data_sync.id, leads_key
+        )
+        if (
+            saved is None
+            or saved.custom_audience_id != integration_data_sync.list_id
+            or any(
+                lead_id not in saved.lead_batches for lead_id in profile_leads
+            )
+        ):
+            return (
+                AudienceUploadSession(integration_data_sync.list_id, profiles),
+                False,
+            )
+
+        upload = AudienceUploadSession(
+            integration_data_sync.list_id,
+            profiles,
+            session_id=saved.session_id,
+            batch_results={
+                int(batch_seq): result
+                for batch_seq, result in saved.batch_results.items()
+            },
+            batch_seqs=[
+                saved.lead_batches[lead_id] for lead_id in profile_leads
             ],
-            "data": profiles,
-        }
-        session = {
-            "session_id": 1,
-            "batch_seq": 1,
-            "last_batch_flag": True,
-            "estimated_num_total": len(profiles),
+            batch_count=saved.batch_count,
+            estimated_num_total=saved.estimated_num_total,
+        )
+        logger.info(
+            f"Resuming Meta upload session {upload.session_id}, "
+            f"batches {upload.pending()}"
+        )
+        return upload, True
+
+    def __save_upload(
+        self,
+        data_sync_id: int,
+        resumed_key: str | None,
+        upload: AudienceUploadSession,
+        profile_leads: list[str],
+    ):
+        """
+        Saves the session under the leads of its throttled batches, which
+        stay SENT for the next message, and drops it once nothing is left
+        """
+        lead_batches = {
+            lead_id: batch_seq
+            for lead_id, batch_seq in zip(profile_leads, upload.batch_seqs)
+            if upload.batch_results.get(batch_seq)
+            == ProccessDataSyncResult.TOO_MANY_REQUESTS.value
         }
-        url = f"https://graph.facebook.com/{API_VERSION}/{custom_audience_id}/users"
-        response = self.__handle_request(
-            method="POST",
-            url=url,
-            params={"access_token": access_token},
-            data={
-                "session": json.dumps(session),
-                "payload": json.dumps(payload),
-                "app_id": APP_ID,
+        if not lead_batches:
+            if resumed_key is not None:
+                self.upload_session_persistence.delete(
+                    data_sync_id, resumed_key
+                )
+            return
+
+        self.upload_session_persistence.save(
+            data_sync_id,
+            self.__leads_key(lead_batches),
+            custom_audience_id=upload.custom_audience_id,
+            session_id=upload.session_id,
+            batch_count=upload.batch_count,
+            estimated_num_total=upload.estimated_num_total,
+            batch_results={
+                str(batch_seq): result
+                for batch_seq, result in upload.batch_results.items()
             },
+            lead_batches=lead_batches,
+            replaces=resumed_key,
         )
 
-        result = response.json()
+    @staticmethod
+    def __apply_upload_results(
+        upload: AudienceUploadSession,
+        results: list[dict],
+        profile_results: list[int],
+    ):
+        for profile_index, result_index in enumerate(profile_results):
+            status = upload.result_of(profile_index)
+            if status != ProccessDataSyncResult.SUCCESS.value:
+                results[result_index]["status"] = (
+                    status or ProccessDataSyncResult.UNEXPECTED_ERROR.value
+                )
+
+    async def upload_profiles(
+        self,
+        upload: AudienceUploadSession,
+        access_token: str,
+        attempts: int = UPLOAD_ATTEMPTS,
+        resumable: bool = False,
+    ) -> AudienceUploadSession:
+        """
+        Sends the pending batches of the session, UPLOAD_CONCURRENCY at a
+        time, and the last one once the others are done or out of attempts,
+        so that its last_batch_flag closes the session. Batches that failed
+        with a retryable result are resent up to attempts times. A resumable
+        session is continued by a later call, so its last batch is held back
+        as throttled while other batches are throttled.
+        """
+        semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+        async def send(batch_seq: int):
+            async with semaphore:
+                upload.batch_results[batch_seq] = await self.__upload_batch(
+                    upload, batch_seq, access_token
+                )
+
+        throttled = ProccessDataSyncResult.TOO_MANY_REQUESTS.value
+        last = upload.batch_count
+        for attempt in range(1, attempts + 1):
+            # batches never sent, or failed with a retryable result
+            pending = [
+                batch_seq
+                for batch_seq in upload.pending()
+                if batch_seq not in upload.batch_results
+                or upload.batch_results[batch_seq] in RETRYABLE_UPLOAD_RESULTS
+            ]
+            if not pending:
+                break
+
+            others = [batch_seq for batch_seq in pending if batch_seq != last]
+            await asyncio.gather(*(send(batch_seq) for batch_seq in others))
+            if last not in pending:
+                continue
+            # the last batch closes the session, so it waits for the retries
+            if attempt < attempts:
+                waits_for = RETRYABLE_UPLOAD_RESULTS
+            else:
+                waits_for = {throttled} if resumable else set()
+            if not any(
+                upload.batch_results[batch_seq] in waits_for
+                for batch_seq in others
+            ):
+                await send(last)
+            elif attempt == attempts:
+                upload.batch_results[last] = throttled
 
         logger.info(
-            f"Meta API response for list {custom_audience_id}: "
-            f"sent {len(profiles)} contacts, result={result}"
+            f"Meta upload session {upload.session_id} for list "
+            f"{upload.custom_audience_id}: {len(upload.profiles)} contacts, "
+            f"batches={upload.batch_results}"
         )
+        return upload
+
+    async def __upload_batch(
+        self, upload: AudienceUploadSession, batch_seq: int, access_token: str
+    ) -> str:
+        profiles = upload.batch(batch_seq)
+        session = {
+            "session_id": upload.session_id,
+            "batch_seq": batch_seq,
+            "last_batch_flag": batch_seq == upload.batch_count,
+            "estimated_num_total": upload.estimated_num_total,
+        }
+        payload = {"schema": upload.schema, "data": profiles}
+        url = f"https://graph.facebook.com/{API_VERSION}/{upload.custom_audience_id}/users"
+        rate_key = RateKey.of(SourcePlatformEnum.META.value, access_token)
+
+        await get_rate_limiter().acquire(rate_key)
+        try:
+            response = await get_async_http_pool().request(
+                "POST",
+                url,
+                params={"access_token": access_token},
+                data={
+                    "session": json.dumps(session),
+                    "payload": json.dumps(payload),
+                    "app_id": APP_ID,
+                },
+            )
+            result = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error(
+                f"Meta batch {batch_seq} of session {upload.session_id} "
+                f"failed: {e}"
+            )
+            return ProccessDataSyncResult.UNEXPECTED_ERROR.value
+
+        logger.debug(
+            f"Meta batch {batch_seq}/{upload.batch_count} of session "
+            f"{upload.session_id}: sent {len(profiles)} contacts, "
+            f"result={result}"
+        )
+
+        if result.get("error", {}).get("code") in RATE_LIMIT_CODES:
+            get_rate_limiter().throttled(rate_key)
+            return ProccessDataSyncResult.TOO_MANY_REQUESTS.value
+        get_rate_limiter().observe(rate_key, response)
+        if response.status_code == 429:
+            return ProccessDataSyncResult.TOO_MANY_REQUESTS.value
 
         if result.get("error", {}).get("type") == "OAuthException":
             return ProccessDataSyncResult.AUTHENTICATION_FAILED.value
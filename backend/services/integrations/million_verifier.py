@@ -6,10 +6,12 @@ import traceback
 from typing import Any
 import httpcore
 import httpx
-from aiolimiter import AsyncLimiter
 
+from config.database import SessionLocal
+from config.http import get_async_http_pool
 from persistence.million_verifier import MillionVerifierPersistence
 from resolver import injectable
+from services.integrations.rate_limit import RateKey, get_rate_limiter
 from services.exceptions import InsufficientCreditsError, MillionVerifierError
 
 logging.basicConfig(
@@ -30,16 +32,30 @@ class MillionVerifierIntegrationsService:
         self.api_url = "https://api.millionverifier.com/api/v3/"
         self.bulk_api_url = "https://bulkapi.millionverifier.com/bulkapi/v2/"
 
-        rate_per_sec = 300
-        max_connections = 300
-        limits = httpx.Limits(
-            max_connections=max_connections,
-            max_keepalive_connections=max_connections,
+        self._timeout = httpx.Timeout(
+            connect=5.0, read=10.0, write=5.0, pool=10.0
         )
-        timeout = httpx.Timeout(connect=5.0, read=10.0, write=5.0, pool=10.0)
+        self.rate_key = RateKey.of("million_verifier", self.api_key)
 
-        self._client = httpx.AsyncClient(timeout=timeout, limits=limits)
-        self.global_limiter = AsyncLimiter(rate_per_sec, 1)
+    async def __find_checked_email(self, email: str):
+        return await asyncio.to_thread(
+            self.__in_own_session, "find_checked_email", email=email
+        )
+
+    async def __save_checked_email(self, **values):
+        await asyncio.to_thread(
+            self.__in_own_session, "save_checked_email", **values
+        )
+
+    @staticmethod
+    def __in_own_session(method: str, **kwargs):
+        """
+        Emails of one message are verified concurrently, so every threaded
+        lookup opens its own session instead of sharing the injected one
+        """
+        with SessionLocal() as session:
+            persistence = MillionVerifierPersistence(session)
+            return getattr(persistence, method)(**kwargs)
 
     async def __async_handle_request(
         self,
@@ -59,24 +75,20 @@ class MillionVerifierIntegrationsService:
         attempt = 0
         while attempt <= max_retries:
             try:
-                async with httpx.AsyncClient(timeout=60.0) as client:
-                    response = await client.request(
-                        method=method,
-                        url=url,
-                        headers=headers,
-                        json=json,
-                        params=params,
-                        files=files,
-                    )
+                response = await get_async_http_pool().request(
+                    method=method,
+                    url=url,
+                    headers=headers,
+                    json=json,
+                    params=params,
+                    files=files,
+                    timeout=60.0,
+                )
 
                 if response.status_code == 429:
-                    retry_after = int(
-                        response.headers.get("Retry-After", retry_delay)
-                    )
-                    logging.warning(
-                        f"Rate limited. Retrying after {retry_after} seconds..."
-                    )
-                    await asyncio.sleep(retry_after)
+                    get_rate_limiter().observe(self.rate_key, response)
+                    logging.warning("Rate limited, waiting for the limiter")
+                    await get_rate_limiter().acquire(self.rate_key)
                     attempt += 1
                     continue
 
@@ -117,9 +129,7 @@ class MillionVerifierIntegrationsService:
 
     async def is_email_verify(self, email: str):
         is_verify = False
-        checked_email = self.million_verifier_persistence.find_checked_email(
-            email=email
-        )
+        checked_email = await self.__find_checked_email(email)
         if checked_email:
             return checked_email.is_verify
 
@@ -147,7 +157,7 @@ class MillionVerifierIntegrationsService:
             if result_error:
                 logger.debug(f"millionverifier error: {result_error}")
 
-        self.million_verifier_persistence.save_checked_email(
+        await self.__save_checked_email(
             email=email, is_verify=is_verify, verify_result=subresult_value
         )
 
@@ -163,9 +173,7 @@ class MillionVerifierIntegrationsService:
     # ---------- DDOS SINGLE API ----------
 
     async def _fetch_email_verify_wrapper(self, email: str) -> tuple[bool, str]:
-        checked_email = self.million_verifier_persistence.find_checked_email(
-            email=email
-        )
+        checked_email = await self.__find_checked_email(email)
         if checked_email:
             return checked_email.is_verify, checked_email.verify_result
 
@@ -197,19 +205,20 @@ class MillionVerifierIntegrationsService:
 
         while attempt <= max_retries:
             try:
-                async with self.global_limiter:
-                    response = await self._client.get(
-                        self.api_url, params=params
-                    )
+                await get_rate_limiter().acquire(self.rate_key)
+                response = await get_async_http_pool().request(
+                    "GET",
+                    self.api_url,
+                    params=params,
+                    timeout=self._timeout,
+                )
+                get_rate_limiter().observe(self.rate_key, response)
 
                 if response.status_code == 429:
-                    retry_after = int(
-                        response.headers.get("Retry-After") or retry_delay
-                    )
+                    # the next acquire waits out Retry-After
                     logger.warning(
-                        f"MillionVerifier rate limited, retry after {retry_after}s (attempt {attempt})"
+                        f"MillionVerifier rate limited (attempt {attempt})"
                     )
-                    await asyncio.sleep(retry_after)
                     attempt += 1
                     continue
 
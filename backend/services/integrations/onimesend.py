@@ -1,3 +1,4 @@
+import asyncio
 import json
 import logging
 import os
@@ -194,7 +195,8 @@ class OmnisendIntegrationService:
                 )
 
             properties = (
-                self.__map_properties(
+                await asyncio.to_thread(
+                    self.__map_properties,
                     five_x_five_user,
                     integration_data_sync.data_map,
                     lead_user.first_visit_id,
@@ -221,7 +223,8 @@ class OmnisendIntegrationService:
         if not bulk_profiles:
             return results
 
-        profile = self.__create_bulk_profiles(
+        profile = await asyncio.to_thread(
+            self.__create_bulk_profiles,
             bulk_profiles,
             user_integration.access_token,
         )
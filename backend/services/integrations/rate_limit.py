@@ -0,0 +1,236 @@
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Mapping, NamedTuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+BASE_BACKOFF = 5.0
+MAX_BACKOFF = 600.0
+# reset headers above this are epoch timestamps, not seconds
+EPOCH_THRESHOLD = 10**9
+
+
+class RateKey(NamedTuple):
+    platform: str
+    credential: str
+
+    @classmethod
+    def of(cls, platform: str, credential: str | None) -> "RateKey":
+        """
+        Keys by a digest so access tokens are not kept around in clear
+        """
+        digest = hashlib.sha256((credential or "").encode()).hexdigest()
+        return cls(platform, digest[:16])
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    rate: float
+    """
+    Tokens per second; one token is one lead or one API call
+    """
+    burst: float
+    per_call: bool = False
+    """
+    The integration takes one token per API call itself, so the data sync
+    worker must not charge it for the leads of a message as well
+    """
+
+
+DEFAULT_LIMIT = RateLimit(rate=10.0, burst=100.0)
+PLATFORM_LIMITS = {
+    "klaviyo": RateLimit(rate=10.0, burst=75.0),
+    "hubspot": RateLimit(rate=10.0, burst=100.0),
+    "meta": RateLimit(rate=20.0, burst=200.0, per_call=True),
+    "google_ads": RateLimit(rate=5.0, burst=50.0),
+    "mailchimp": RateLimit(rate=10.0, burst=10.0),
+    "instantly": RateLimit(rate=10.0, burst=100.0, per_call=True),
+    "million_verifier": RateLimit(rate=300.0, burst=300.0),
+}
+
+
+@dataclass
+class TokenBucket:
+    """
+    Token bucket that may go into debt: a cost above the burst is accepted
+    once the bucket is full and paid back by waiting. Throttling halves
+    the rate and every accepted response adds a sixteenth back.
+    """
+
+    limit: RateLimit
+    rate: float
+    tokens: float
+    updated_at: float
+    blocked_until: float = 0.0
+    strikes: int = 0
+
+    def _refill(self, now: float):
+        elapsed = max(now - self.updated_at, 0.0)
+        self.tokens = min(self.limit.burst, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, cost: float, now: float) -> float:
+        self._refill(now)
+        wait = max(self.blocked_until - now, 0.0)
+        needed = min(cost, self.limit.burst)
+        if self.tokens < needed:
+            wait = max(wait, (needed - self.tokens) / self.rate)
+        return wait
+
+    def take(self, cost: float, now: float):
+        self._refill(now)
+        self.tokens -= cost
+
+    def throttle(self, retry_after: float | None, now: float):
+        if retry_after is None:
+            retry_after = min(BASE_BACKOFF * 2**self.strikes, MAX_BACKOFF)
+        self.strikes += 1
+        self.blocked_until = max(self.blocked_until, now + retry_after)
+        self.rate = max(self.rate / 2, self.limit.rate / 16)
+        self.tokens = min(self.tokens, 0.0)
+
+    def block(self, until: float):
+        self.blocked_until = max(self.blocked_until, until)
+
+    def recover(self):
+        self.strikes = 0
+        self.rate = min(self.limit.rate, self.rate + self.limit.rate / 16)
+
+
+def _header_seconds(value: str | None) -> float | None:
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            moment = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        seconds = moment.timestamp() - datetime.now(timezone.utc).timestamp()
+    else:
+        if seconds > EPOCH_THRESHOLD:
+            seconds -= time.time()
+    return max(seconds, 0.0)
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> float | None:
+    """
+    Seconds from Retry-After, either delta seconds or an HTTP date
+    """
+    return _header_seconds(headers.get("Retry-After"))
+
+
+def exhausted_for_seconds(headers: Mapping[str, str]) -> float | None:
+    """
+    Seconds until the window resets when the rate limit headers report no
+    remaining requests
+    """
+    for prefix in ("X-RateLimit", "RateLimit"):
+        remaining = headers.get(f"{prefix}-Remaining")
+        if remaining is None:
+            continue
+        try:
+            if float(remaining) > 0:
+                return None
+        except ValueError:
+            return None
+        return _header_seconds(headers.get(f"{prefix}-Reset"))
+    return None
+
+
+class RateLimiterRegistry:
+    """
+    Token buckets per platform and credential, shared by every integration
+    of the process.
+
+    ``reserve`` never waits: it either takes the tokens or returns how long
+    the caller should stay away, which lets the data sync worker park the
+    message in a delay queue instead of holding the consumer. ``acquire``
+    waits in process for callers that cannot be re-queued.
+    """
+
+    def __init__(
+        self,
+        limits: Mapping[str, RateLimit] = PLATFORM_LIMITS,
+        default: RateLimit = DEFAULT_LIMIT,
+        clock=time.monotonic,
+    ):
+        self.limits = limits
+        self.default = default
+        self.clock = clock
+        self._buckets: dict[RateKey, TokenBucket] = {}
+
+    def bucket(self, key: RateKey) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            limit = self.limits.get(key.platform, self.default)
+            bucket = TokenBucket(
+                limit=limit,
+                rate=limit.rate,
+                tokens=limit.burst,
+                updated_at=self.clock(),
+            )
+            self._buckets[key] = bucket
+        return bucket
+
+    def delay(self, key: RateKey, cost: float = 1) -> float:
+        return self.bucket(key).wait_time(cost, self.clock())
+
+    def reserve(self, key: RateKey, cost: float = 1) -> float:
+        """
+        Takes ``cost`` tokens and returns 0, or returns the seconds to wait
+        without taking anything
+        """
+        bucket = self.bucket(key)
+        now = self.clock()
+        wait = bucket.wait_time(cost, now)
+        if wait <= 0:
+            bucket.take(cost, now)
+        return wait
+
+    async def acquire(self, key: RateKey, cost: float = 1):
+        while (wait := self.reserve(key, cost)) > 0:
+            await asyncio.sleep(wait)
+
+    def throttled(self, key: RateKey, retry_after: float | None = None):
+        logger.warning(
+            f"Rate limited by {key.platform}, backing off "
+            f"{retry_after if retry_after is not None else 'exponentially'}"
+        )
+        self.bucket(key).throttle(retry_after, self.clock())
+
+    def observe(self, key: RateKey, response: httpx.Response):
+        """
+        Adapts the bucket to a response: 429 throttles, exhausted rate limit
+        headers block until their reset, anything else recovers the rate
+        """
+        if response.status_code == 429:
+            self.throttled(key, retry_after_seconds(response.headers))
+            return
+
+        bucket = self.bucket(key)
+        exhausted_for = exhausted_for_seconds(response.headers)
+        if exhausted_for is not None:
+            bucket.block(self.clock() + exhausted_for)
+        elif response.is_success:
+            bucket.recover()
+
+
+_rate_limiter: RateLimiterRegistry | None = None
+
+
+def get_rate_limiter() -> RateLimiterRegistry:
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiterRegistry()
+    return _rate_limiter
@@ -385,7 +385,9 @@ class SalesForceIntegrationsService:
     ):
         profiles = []
         results = []
-        access_token = self.get_access_token(user_integration.access_token)
+        access_token = await asyncio.to_thread(
+            self.get_access_token, user_integration.access_token
+        )
         country_state_map = self._get_country_state_map_list()
         if not access_token:
             return [
@@ -423,7 +425,8 @@ class SalesForceIntegrationsService:
         if not profiles:
             return results
 
-        response_result = self.bulk_upsert_leads(
+        response_result = await asyncio.to_thread(
+            self.bulk_upsert_leads,
             profiles=profiles,
             instance_url=user_integration.instance_url,
             access_token=access_token,
@@ -445,7 +448,9 @@ class SalesForceIntegrationsService:
     ):
         profiles = []
         results = []
-        access_token = self.get_access_token(user_integration.access_token)
+        access_token = await asyncio.to_thread(
+            self.get_access_token, user_integration.access_token
+        )
         country_state_map = self._get_country_state_map_list()
         if not access_token:
             return [
@@ -480,7 +485,8 @@ class SalesForceIntegrationsService:
         if not profiles:
             return results
 
-        response_result = self.bulk_upsert_leads(
+        response_result = await asyncio.to_thread(
+            self.bulk_upsert_leads,
             profiles=profiles,
             instance_url=user_integration.instance_url,
             access_token=access_token,
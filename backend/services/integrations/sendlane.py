@@ -1,3 +1,4 @@
+import asyncio
 from models import UserIntegration, IntegrationUserSync, LeadUser
 from resolver import injectable
 from utils import (
@@ -286,7 +287,8 @@ class SendlaneIntegrationService:
         if not profiles:
             return results
 
-        result_bulk = self.bulk_add_contacts(
+        result_bulk = await asyncio.to_thread(
+            self.bulk_add_contacts,
             access_token=user_integration.access_token,
             profiles=profiles,
             list_id=integration_data_sync.list_id,
@@ -318,7 +320,9 @@ class SendlaneIntegrationService:
             return first_email
 
         first_phone = get_valid_phone(lead)
-        visited_date = self.leads_persistence.get_visited_date(lead_visit_id)
+        visited_date = await asyncio.to_thread(
+            self.leads_persistence.get_visited_date, lead_visit_id
+        )
 
         profile = {
             "email": first_email,
@@ -1,3 +1,4 @@
+import asyncio
 import base64
 import json
 import logging
@@ -285,7 +286,8 @@ class SlackService:
                     }
                 )
 
-            result = self.send_message_to_channels(
+            result = await asyncio.to_thread(
+                self.send_message_to_channels,
                 user_text,
                 user_integration.access_token,
                 integration_data_sync.list_id,
@@ -318,7 +320,9 @@ class SlackService:
         ):
             return first_email
 
-        visited_date = self.lead_persistence.get_visited_date(lead_visit_id)
+        visited_date = await asyncio.to_thread(
+            self.lead_persistence.get_visited_date, lead_visit_id
+        )
 
         data = {
             "LinkedIn URL": five_x_five_user.linkedin_url,
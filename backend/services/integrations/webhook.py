@@ -220,7 +220,8 @@ class WebhookIntegrationService:
                     }
                 )
 
-            profile = self.__send_profile(
+            profile = await asyncio.to_thread(
+                self.__send_profile,
                 data=data,
                 integration_data_sync=integration_data_sync,
             )
@@ -432,8 +433,8 @@ class WebhookIntegrationService:
                 properties[mapping["value"]] = ""
 
         if "time_on_site" in mapped_fields or "url_visited" in mapped_fields:
-            time_on_site, url_visited = self.leads_persistence.get_visit_stats(
-                five_x_five_user.id
+            time_on_site, url_visited = await asyncio.to_thread(
+                self.leads_persistence.get_visit_stats, five_x_five_user.id
             )
             for mapping in data_map:
                 if mapping["type"] == "time_on_site":
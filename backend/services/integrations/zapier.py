@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime
 from typing import List, Tuple, Annotated
 
@@ -135,7 +136,9 @@ class ZapierIntegrationService:
                     }
                 )
 
-            profile = self.__create_profile(data, integration_data_sync)
+            profile = await asyncio.to_thread(
+                self.__create_profile, data, integration_data_sync
+            )
             if profile == ProccessDataSyncResult.AUTHENTICATION_FAILED.value:
                 for result in results:
                     result["status"] = (
@@ -182,8 +185,8 @@ class ZapierIntegrationService:
         ):
             return first_email
 
-        time_on_site, url_visited = self.leads_persistence.get_visit_stats(
-            five_x_five_user.id
+        time_on_site, url_visited = await asyncio.to_thread(
+            self.leads_persistence.get_visit_stats, five_x_five_user.id
         )
         lead_dict = {
             "id": five_x_five_user.id,
@@ -0,0 +1,124 @@
+import itertools
+from datetime import datetime
+from typing import Iterable, Iterator, NamedTuple
+
+from sqlalchemy import func, tuple_
+
+from db_dependencies import Db
+from models.five_x_five_cookie_sync_file import FiveXFiveCookieSyncFile
+from resolver import injectable
+
+PAGE_SIZE = 5000
+GROUPS_PER_BATCH = 2000
+
+
+class CookieSyncRow(NamedTuple):
+    id: int
+    event_date: datetime
+    ip: str | None
+    partner_uid: str | None
+    sha256_lower_case: str | None
+    up_id: str | None
+    json_headers: str | None
+
+    @property
+    def group_key(self) -> str:
+        return f"{self.event_date}_{self.ip}"
+
+
+def iter_groups(rows: Iterable[CookieSyncRow]) -> Iterator[list[CookieSyncRow]]:
+    """
+    Rows come ordered by (event_date, ip), so every group is contiguous and
+    can be emitted as soon as the next key shows up.
+    """
+    for _, group in itertools.groupby(rows, key=lambda row: row.group_key):
+        yield list(group)
+
+
+def iter_batches(
+    groups: Iterable[list[CookieSyncRow]], size: int = GROUPS_PER_BATCH
+) -> Iterator[list[list[CookieSyncRow]]]:
+    """
+    Batches only end where the event_date changes, so a batch holds every
+    row of its last event_date and the watermark can be moved past it.
+    """
+    batch = []
+    for group in groups:
+        if (
+            len(batch) >= size
+            and group[0].event_date != batch[-1][0].event_date
+        ):
+            yield batch
+            batch = []
+        batch.append(group)
+    if batch:
+        yield batch
+
+
+@injectable
+class CookieSyncReader:
+    """
+    Keyset-paged reader over 5x5_cookie_sync_files.
+
+    Pages are separate queries, so the commit lead_sync makes after each
+    batch, with its leads, visits and watermark, does not invalidate the
+    reader the way it would close a server-side cursor.
+    """
+
+    def __init__(self, db: Db):
+        self.db = db
+
+    def _query(self, filters: list):
+        return self.db.query(FiveXFiveCookieSyncFile).filter(*filters)
+
+    def get_next_event_date(
+        self, after: datetime | None, filters: list
+    ) -> datetime | None:
+        query = self._query(filters).with_entities(
+            FiveXFiveCookieSyncFile.event_date
+        )
+        if after:
+            query = query.filter(FiveXFiveCookieSyncFile.event_date > after)
+        return (
+            query.order_by(FiveXFiveCookieSyncFile.event_date).limit(1).scalar()
+        )
+
+    def iter_rows(
+        self,
+        start: datetime,
+        end: datetime,
+        filters: list,
+        page_size: int = PAGE_SIZE,
+    ) -> Iterator[CookieSyncRow]:
+        ip = func.coalesce(FiveXFiveCookieSyncFile.ip, "")
+        sort_key = tuple_(
+            FiveXFiveCookieSyncFile.event_date, ip, FiveXFiveCookieSyncFile.id
+        )
+        query = (
+            self._query(filters)
+            .with_entities(
+                FiveXFiveCookieSyncFile.id,
+                FiveXFiveCookieSyncFile.event_date,
+                FiveXFiveCookieSyncFile.ip,
+                FiveXFiveCookieSyncFile.partner_uid,
+                FiveXFiveCookieSyncFile.sha256_lower_case,
+                FiveXFiveCookieSyncFile.up_id,
+                FiveXFiveCookieSyncFile.json_headers,
+            )
+            .filter(FiveXFiveCookieSyncFile.event_date.between(start, end))
+            .order_by(FiveXFiveCookieSyncFile.event_date, ip)
+            .order_by(FiveXFiveCookieSyncFile.id)
+        )
+
+        last_key = None
+        while True:
+            page_query = query
+            if last_key is not None:
+                page_query = page_query.filter(sort_key > tuple_(*last_key))
+            page = page_query.limit(page_size).all()
+            for row in page:
+                yield CookieSyncRow(*row)
+            if len(page) < page_size:
+                return
+            last = page[-1]
+            last_key = (last.event_date, last.ip or "", last.id)
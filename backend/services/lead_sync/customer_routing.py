@@ -0,0 +1,150 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from db_dependencies import Db
+from models.users import Users
+from models.users_domains import UserDomains
+from resolver import injectable
+
+logger = logging.getLogger(__name__)
+
+REFRESH_OVERLAP = timedelta(minutes=5)
+"""
+updated_at is the start of the writing transaction, so rows committed up to
+this long after it are still picked up by the next refresh
+"""
+
+
+@dataclass(frozen=True)
+class PuciRemap:
+    source: str
+    target: str
+    page_contains: str | None = None
+
+
+PUCI_REMAPS = (
+    PuciRemap(
+        source="2e23d46218de1cce79dc14427bf97a6484c0c729757007988f6f0dcf17a144a8",
+        target="edf1a2e46075f1b2ae6caddad58fac17c702f6a17373a7a0067583c0d2ac34cb",
+    ),
+    PuciRemap(
+        source="f8f664a05426a4593af10265803ad4ecb0eae25e7622e753ef0ea08218ec33cb",
+        target="b51f31b2181ab13b0a125f37cac5641f12a29b5bb63b8d54f7b5fb1d3c0cb434",
+        page_contains="joinfridays.com",
+    ),
+)
+
+
+@dataclass
+class CustomerRoute:
+    user: Users
+    user_domain: UserDomains
+    data_provider_id: str
+
+    @property
+    def user_id(self) -> int:
+        return self.user.id
+
+    @property
+    def domain_id(self) -> int:
+        return self.user_domain.id
+
+
+@injectable
+class CustomerRoutingTable:
+    """
+    In-memory data_provider_id -> (user, domain) routing for lead_sync.
+
+    The table is loaded once and then refreshed incrementally by
+    users_domains.updated_at, which the database only bumps when a column
+    routing reads changes. Routes keep the loaded rows of the lead_sync
+    session, so resolving the customer of a cookie-sync row is a dict
+    lookup instead of a Users JOIN UserDomains query.
+    """
+
+    def __init__(self, db: Db):
+        self.db = db
+        self._routes: dict[str, CustomerRoute] = {}
+        self._provider_id_by_domain_id: dict[int, str] = {}
+        self._last_updated_at: datetime | None = None
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    def refresh(self):
+        query = (
+            self.db.query(UserDomains, Users)
+            .join(Users, Users.id == UserDomains.user_id)
+            .execution_options(populate_existing=True)
+        )
+        if self._last_updated_at is not None:
+            query = query.filter(
+                UserDomains.updated_at
+                >= self._last_updated_at - REFRESH_OVERLAP
+            )
+
+        changed = 0
+        for user_domain, user in query:
+            self._set_route(user, user_domain)
+            if self._last_updated_at is None or (
+                user_domain.updated_at > self._last_updated_at
+            ):
+                self._last_updated_at = user_domain.updated_at
+            changed += 1
+
+        live_domain_ids = {
+            domain_id for (domain_id,) in self.db.query(UserDomains.id)
+        }
+        for domain_id in list(self._provider_id_by_domain_id):
+            if domain_id not in live_domain_ids:
+                self.forget(domain_id)
+
+        logger.info(
+            f"Customer routing refreshed: {changed} changed, {len(self._routes)} total"
+        )
+
+    def _set_route(self, user: Users, user_domain: UserDomains):
+        self.forget(user_domain.id)
+        data_provider_id = user_domain.data_provider_id
+        if not data_provider_id:
+            return
+        previous = self._routes.get(data_provider_id)
+        if previous is not None:
+            self._provider_id_by_domain_id.pop(previous.domain_id, None)
+        self._routes[data_provider_id] = CustomerRoute(
+            user=user,
+            user_domain=user_domain,
+            data_provider_id=data_provider_id,
+        )
+        self._provider_id_by_domain_id[user_domain.id] = data_provider_id
+
+    def forget(self, domain_id: int):
+        data_provider_id = self._provider_id_by_domain_id.pop(domain_id, None)
+        if data_provider_id is not None:
+            self._routes.pop(data_provider_id, None)
+
+    @staticmethod
+    def remap_client_id(client_id: str, page: str | None) -> str:
+        for remap in PUCI_REMAPS:
+            if client_id != remap.source:
+                continue
+            if remap.page_contains is not None and (
+                page is None or remap.page_contains not in page
+            ):
+                continue
+            client_id = remap.target
+        return client_id
+
+    def get_route(
+        self, client_id: str, page: str | None
+    ) -> CustomerRoute | None:
+        return self._routes.get(self.remap_client_id(client_id, page))
+
+    def get_customer(
+        self, client_id: str, page: str | None
+    ) -> tuple[Users, UserDomains] | None:
+        route = self.get_route(client_id, page)
+        if route is None:
+            return None
+        return route.user, route.user_domain
@@ -0,0 +1,68 @@
+import zlib
+from dataclasses import dataclass
+
+from sqlalchemy import BigInteger, cast, func
+
+from models.five_x_five_cookie_sync_file import FiveXFiveCookieSyncFile
+
+PARTITION_BY_DATA_PROVIDER_ID = "data_provider_id"
+PARTITION_BY_IP = "ip"
+PARTITION_BY_CHOICES = (PARTITION_BY_DATA_PROVIDER_ID, PARTITION_BY_IP)
+
+
+def stable_partition(value: str | None, partitions_count: int) -> int:
+    # crc32 instead of hash(): str hashing is randomized per process
+    return zlib.crc32(str(value or "").encode()) % partitions_count
+
+
+@dataclass(frozen=True)
+class LeadSyncPartition:
+    """
+    One slice of the cookie-sync stream.
+
+    With ``ip`` the slice is filtered in Postgres with hashtext(ip). With
+    ``data_provider_id`` rows are assigned in Python after decoding the
+    partner uid, so that all domains of one customer land in the same
+    partition and their credit counters are only written by one worker.
+    """
+
+    index: int
+    count: int
+    partition_by: str = PARTITION_BY_DATA_PROVIDER_ID
+
+    @property
+    def key(self) -> str:
+        return f"{self.partition_by}:{self.index}/{self.count}"
+
+    @property
+    def is_primary(self) -> bool:
+        return self.index == 0
+
+    @property
+    def is_filtered_in_db(self) -> bool:
+        return self.count > 1 and self.partition_by == PARTITION_BY_IP
+
+    @property
+    def is_filtered_in_app(self) -> bool:
+        return self.count > 1 and self.partition_by != PARTITION_BY_IP
+
+    def db_filter(self):
+        bucket = func.mod(
+            func.abs(
+                cast(func.hashtext(FiveXFiveCookieSyncFile.ip), BigInteger)
+            ),
+            self.count,
+        )
+        return bucket == self.index
+
+    def owns(self, value: str | None) -> bool:
+        if self.count == 1:
+            return True
+        return stable_partition(value, self.count) == self.index
+
+
+def build_partitions(count: int, partition_by: str) -> list[LeadSyncPartition]:
+    return [
+        LeadSyncPartition(index=index, count=count, partition_by=partition_by)
+        for index in range(count)
+    ]
@@ -0,0 +1,336 @@
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta
+
+from sqlalchemy import (
+    BigInteger,
+    Date,
+    Integer,
+    Time,
+    VARCHAR,
+    column,
+    func,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert
+
+from db_dependencies import Db
+from models.leads_requests import LeadsRequests
+from models.leads_users import LeadUser
+from models.leads_visits import LeadsVisits
+from resolver import injectable
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SIZE = 1000
+
+
+@dataclass
+class BufferedVisit:
+    id: int
+    lead_id: int
+    start_date: date
+    start_time: dt_time
+    end_date: date
+    end_time: dt_time
+    pages_count: int
+    full_time_sec: int
+    behavior_type: str
+    ip: str | None = None
+    is_new: bool = False
+    is_dirty: bool = False
+    # [requested_at, page] of every request seen in this visit
+    requests: list[list] = field(default_factory=list)
+    # newest request, either a pending insert row or (id, requested_at)
+    last_pending_request: dict | None = None
+    last_stored_request: tuple[int, datetime] | None = None
+
+
+@injectable
+class LeadVisitBuffer:
+    """
+    Accumulates leads_visits and leads_requests writes of lead_sync and
+    flushes them with multi-row statements.
+
+    New visit ids are reserved from leads_visits_id_seq in blocks, so a
+    visit can be referenced by requests and by leads_users.first_visit_id
+    before it is inserted. Lookups go through the buffer first, which keeps
+    the per-request visit logic unchanged while rows are still pending.
+    """
+
+    def __init__(self, db: Db):
+        self.db = db
+        self.flush_size = FLUSH_SIZE
+        self._visit_ids: list[int] = []
+        self._visits: dict[int, BufferedVisit] = {}
+        self._visit_ids_by_lead: dict[int, list[int]] = {}
+        self._pending_requests: list[dict] = []
+        self._spent_time_updates: dict[int, int] = {}
+        self._first_visit_ids: dict[int, int] = {}
+
+    def _reserve_visit_id(self) -> int:
+        if not self._visit_ids:
+            sequence = func.nextval("leads_visits_id_seq")
+            self._visit_ids = list(
+                self.db.execute(
+                    select(sequence).select_from(
+                        func.generate_series(1, self.flush_size)
+                    )
+                ).scalars()
+            )
+            self._visit_ids.reverse()
+        return self._visit_ids.pop()
+
+    def _track(self, visit: BufferedVisit):
+        self._visits[visit.id] = visit
+        self._visit_ids_by_lead.setdefault(visit.lead_id, []).append(visit.id)
+
+    def find_visit_id(self, lead_id: int, since: datetime) -> int | None:
+        for visit_id in self._visit_ids_by_lead.get(lead_id, ()):
+            visit = self._visits[visit_id]
+            if any(request[0] >= since for request in visit.requests):
+                return visit_id
+
+        row = (
+            self.db.query(LeadsRequests.visit_id)
+            .filter(
+                LeadsRequests.lead_id == lead_id,
+                LeadsRequests.requested_at >= since,
+            )
+            .first()
+        )
+        return row[0] if row else None
+
+    def get_visit(self, visit_id: int) -> BufferedVisit:
+        visit = self._visits.get(visit_id)
+        if visit is not None:
+            return visit
+
+        stored_visit = self.db.get(LeadsVisits, visit_id)
+        stored_requests = (
+            self.db.query(
+                LeadsRequests.id,
+                LeadsRequests.requested_at,
+                LeadsRequests.page,
+            )
+            .filter(LeadsRequests.visit_id == visit_id)
+            .order_by(LeadsRequests.id)
+            .all()
+        )
+        visit = BufferedVisit(
+            id=visit_id,
+            lead_id=stored_visit.lead_id,
+            start_date=stored_visit.start_date,
+            start_time=stored_visit.start_time,
+            end_date=stored_visit.end_date,
+            end_time=stored_visit.end_time,
+            pages_count=stored_visit.pages_count,
+            full_time_sec=stored_visit.full_time_sec,
+            behavior_type=stored_visit.behavior_type,
+            ip=stored_visit.ip,
+            requests=[
+                [requested_at, page]
+                for _, requested_at, page in stored_requests
+            ],
+        )
+        if stored_requests:
+            request_id, requested_at, _ = stored_requests[-1]
+            visit.last_stored_request = (request_id, requested_at)
+        self._track(visit)
+        return visit
+
+    def add_visit(
+        self,
+        lead_id: int,
+        visited_at: datetime,
+        page: str,
+        behavior_type: str,
+        ip: str | None,
+    ) -> BufferedVisit:
+        ended_at = visited_at + timedelta(seconds=1)
+        visit = BufferedVisit(
+            id=self._reserve_visit_id(),
+            lead_id=lead_id,
+            start_date=visited_at.date(),
+            start_time=visited_at.time(),
+            end_date=ended_at.date(),
+            end_time=ended_at.time(),
+            pages_count=1,
+            full_time_sec=LeadsVisits.full_time_sec.default.arg,
+            behavior_type=behavior_type,
+            ip=ip,
+            is_new=True,
+            is_dirty=True,
+            requests=[[visited_at, page]],
+        )
+        self._track(visit)
+        return visit
+
+    def set_first_visit(self, lead_id: int, visit_id: int):
+        # only fills an empty first_visit_id, so repeating it for a lead
+        # whose first visit was already written is harmless
+        self._first_visit_ids.setdefault(lead_id, visit_id)
+
+    def add_request(self, visit: BufferedVisit, row: dict):
+        """
+        Queues a leads_requests row and closes the spent time of the
+        previous request of the same visit.
+        """
+        requested_at = row["requested_at"]
+        if visit.last_pending_request is not None:
+            total_sec = (
+                requested_at - visit.last_pending_request["requested_at"]
+            ).total_seconds()
+            if total_sec > 0:
+                visit.last_pending_request["spent_time_sec"] = total_sec
+        elif visit.last_stored_request is not None:
+            request_id, previous_requested_at = visit.last_stored_request
+            total_sec = (requested_at - previous_requested_at).total_seconds()
+            if total_sec > 0:
+                self._spent_time_updates[request_id] = total_sec
+
+        visit.last_pending_request = row
+        self._pending_requests.append(row)
+        # every dirty visit has a pending request, so requests bound the
+        # size of the whole flush
+        if len(self._pending_requests) >= self.flush_size:
+            self.flush()
+
+    def _insert_visits(self, visits: list[BufferedVisit]):
+        for i in range(0, len(visits), self.flush_size):
+            self.db.execute(
+                insert(LeadsVisits)
+                .values(
+                    [
+                        {
+                            "id": visit.id,
+                            "lead_id": visit.lead_id,
+                            "start_date": visit.start_date,
+                            "start_time": visit.start_time,
+                            "end_date": visit.end_date,
+                            "end_time": visit.end_time,
+                            "pages_count": visit.pages_count,
+                            "full_time_sec": visit.full_time_sec,
+                            "behavior_type": visit.behavior_type,
+                            "ip": visit.ip,
+                        }
+                        for visit in visits[i : i + self.flush_size]
+                    ]
+                )
+                .on_conflict_do_nothing()
+            )
+
+    def _update_visits(self, visits: list[BufferedVisit]):
+        for i in range(0, len(visits), self.flush_size):
+            chunk = values(
+                column("id", BigInteger),
+                column("start_date", Date),
+                column("start_time", Time),
+                column("end_date", Date),
+                column("end_time", Time),
+                column("pages_count", Integer),
+                column("full_time_sec", Integer),
+                column("behavior_type", VARCHAR),
+                name="visits",
+            ).data(
+                [
+                    (
+                        visit.id,
+                        visit.start_date,
+                        visit.start_time,
+                        visit.end_date,
+                        visit.end_time,
+                        visit.pages_count,
+                        visit.full_time_sec,
+                        visit.behavior_type,
+                    )
+                    for visit in visits[i : i + self.flush_size]
+                ]
+            )
+            self.db.execute(
+                update(LeadsVisits)
+                .where(LeadsVisits.id == chunk.c.id)
+                .values(
+                    start_date=chunk.c.start_date,
+                    start_time=chunk.c.start_time,
+                    end_date=chunk.c.end_date,
+                    end_time=chunk.c.end_time,
+                    pages_count=chunk.c.pages_count,
+                    full_time_sec=chunk.c.full_time_sec,
+                    behavior_type=chunk.c.behavior_type,
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+    def _update_by_id(self, attribute, rows: list[tuple], *where):
+        model = attribute.class_
+        for i in range(0, len(rows), self.flush_size):
+            chunk = values(
+                column("id", BigInteger),
+                column("value", BigInteger),
+                name="updates",
+            ).data(rows[i : i + self.flush_size])
+            self.db.execute(
+                update(model)
+                .where(model.id == chunk.c.id, *where)
+                .values({attribute.key: chunk.c.value})
+                .execution_options(synchronize_session=False)
+            )
+
+    def flush(self):
+        """
+        Writes everything that is pending into the current transaction, which
+        the caller commits together with the lead rows. Visits go first
+        because requests and leads_users.first_visit_id reference them.
+        """
+        start = time.perf_counter()
+        dirty_visits = sorted(
+            (visit for visit in self._visits.values() if visit.is_dirty),
+            key=lambda visit: visit.id,
+        )
+        new_visits = [visit for visit in dirty_visits if visit.is_new]
+        updated_visits = [visit for visit in dirty_visits if not visit.is_new]
+        requests = self._pending_requests
+        spent_time_updates = sorted(self._spent_time_updates.items())
+        first_visit_ids = sorted(self._first_visit_ids.items())
+        if not (
+            dirty_visits or requests or spent_time_updates or first_visit_ids
+        ):
+            return
+
+        self._insert_visits(new_visits)
+        self._update_visits(updated_visits)
+        for i in range(0, len(requests), self.flush_size):
+            self.db.execute(
+                insert(LeadsRequests)
+                .values(requests[i : i + self.flush_size])
+                .on_conflict_do_nothing()
+            )
+        self._update_by_id(LeadsRequests.spent_time_sec, spent_time_updates)
+        self._update_by_id(
+            LeadUser.first_visit_id,
+            first_visit_ids,
+            LeadUser.first_visit_id.is_(None),
+        )
+
+        logger.info(
+            f"Flushed {len(new_visits)} new visits, {len(updated_visits)} "
+            f"updated visits, {len(requests)} requests, "
+            f"{len(spent_time_updates)} spent times in "
+            f"{time.perf_counter() - start:.3f}s"
+        )
+        self.clear()
+
+    def clear(self):
+        """
+        Drops pending rows and cached visits after a rollback. Reserved
+        visit ids are kept; unused ones only leave gaps in the sequence.
+        """
+        self._visits.clear()
+        self._visit_ids_by_lead.clear()
+        self._pending_requests = []
+        self._spent_time_updates.clear()
+        self._first_visit_ids.clear()
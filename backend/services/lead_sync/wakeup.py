@@ -0,0 +1,72 @@
+import asyncio
+import logging
+
+import asyncpg
+
+from config.database import sql_config
+
+logger = logging.getLogger(__name__)
+
+COOKIE_SYNC_CHANNEL = "cookie_sync_files_inserted"
+FALLBACK_INTERVAL = 60 * 10
+DEBOUNCE_SECONDS = 5
+
+
+class CookieSyncWakeup:
+    """
+    Wakes lead_sync when the cookie-sync importers commit new rows.
+
+    Migration 015 adds a statement-level trigger that sends a NOTIFY on
+    ``cookie_sync_files_inserted``; this class keeps one dedicated asyncpg
+    connection LISTENing on it. ``wait`` still returns after
+    ``fallback_interval`` so a missed notification (e.g. while the listener
+    was reconnecting) only delays leads instead of stalling them.
+    """
+
+    def __init__(
+        self,
+        fallback_interval: float = FALLBACK_INTERVAL,
+        debounce: float = DEBOUNCE_SECONDS,
+    ):
+        self.fallback_interval = fallback_interval
+        self.debounce = debounce
+        self._event = asyncio.Event()
+        self._connection: asyncpg.Connection | None = None
+
+    def _on_notification(self, connection, pid, channel, payload):
+        self._event.set()
+
+    async def start(self):
+        if self._connection is not None and not self._connection.is_closed():
+            return
+        try:
+            self._connection = await asyncpg.connect(sql_config.url)
+            await self._connection.add_listener(
+                COOKIE_SYNC_CHANNEL, self._on_notification
+            )
+            logger.info(f"Listening on {COOKIE_SYNC_CHANNEL}")
+        except (OSError, asyncpg.PostgresError) as e:
+            self._connection = None
+            logger.warning(f"Could not listen on {COOKIE_SYNC_CHANNEL}: {e}")
+
+    async def wait(self) -> bool:
+        """
+        Returns True when woken by a notification and False on the fallback
+        timeout.
+        """
+        await self.start()
+        try:
+            await asyncio.wait_for(
+                self._event.wait(), timeout=self.fallback_interval
+            )
+        except asyncio.TimeoutError:
+            return False
+        # importers commit file by file, let a burst settle into one cycle
+        await asyncio.sleep(self.debounce)
+        self._event.clear()
+        return True
+
+    async def close(self):
+        if self._connection is not None and not self._connection.is_closed():
+            await self._connection.close()
+        self._connection = None
@@ -1,5 +1,9 @@
+import hashlib
+import json
 import logging
+import multiprocessing
 import statistics
+import time
 from typing import Tuple, List, Dict, Any, TypedDict
 from typing_extensions import deprecated
 from concurrent.futures import Future, ProcessPoolExecutor, as_completed
@@ -24,8 +28,14 @@ from persistence.enrichment_lookalike_scores import (
     EnrichmentLookalikeScoresPersistence,
 )
 from persistence.enrichment_users import EnrichmentUsersPersistence
+from persistence.lookalike_score_watermarks import (
+    LookalikeScoreWatermarkPersistence,
+)
 from schemas.similar_audiences import NormalizationConfig
 from services.audience_insights import AudienceInsightsService
+from services.lookalikes.lookalike_filler.model_cache import (
+    LookalikeModelCache,
+)
 from services.lookalikes.lookalike_filler.rabbitmq import (
     RabbitLookalikesMatchingService,
 )
@@ -34,14 +44,20 @@ from services.lookalikes.lookalike_filler.value_calculators import (
     MLValueCalculator,
     ValueCalculator,
 )
-from services.lookalikes.lookalike_filler.worker import filler_worker
+from services.lookalikes.lookalike_filler.worker import (
+    FillerWorkerResult,
+    SourceValues,
+    filler_worker,
+    init_filler_process,
+    split_buckets,
+)
 from services.lookalikes import AudienceLookalikesService
 from services.similar_audiences.similar_audiences import SimilarAudienceService
 from services.similar_audiences.audience_profile_fetcher import ProfileFetcher
 from services.similar_audiences.column_selector import AudienceColumnSelector
 from services.similar_audiences.similar_audience_scores import (
-    PersonScore,
     SimilarAudiencesScoresService,
+    TopScores,
 )
 
 logger = logging.getLogger(__name__)
@@ -77,6 +93,8 @@ class LookalikeFillerServiceBase:
         matched_sources: AudienceSourcesMatchedPersonsPersistence,
         rabbit: RabbitLookalikesMatchingService,
         insights_service: AudienceInsightsService,
+        model_cache: LookalikeModelCache,
+        score_watermarks: LookalikeScoreWatermarkPersistence,
     ):
         self.db = db
         self.clickhouse = clickhouse
@@ -92,15 +110,11 @@ class LookalikeFillerServiceBase:
         self.matched_sources = matched_sources
         self.rabbit = rabbit
         self.insights_service = insights_service
+        self.model_cache = model_cache
+        self.score_watermarks = score_watermarks
 
-    def get_buckets(self, num_workers: int):
-        buckets_per_worker = 100 // num_workers
-        bucket_ranges = [
-            list(range(i * buckets_per_worker, (i + 1) * buckets_per_worker))
-            for i in range(num_workers)
-        ]
-
-        return bucket_ranges
+    def get_buckets(self, buckets_per_task: int) -> list[list[int]]:
+        return split_buckets(buckets_per_task)
 
     def get_enrichment_users(
         self, significant_fields: dict[str, str]
@@ -187,17 +201,15 @@ class LookalikeFillerServiceBase:
 
         sig = audience_lookalike.significant_fields or {}
         config = self.audiences_scores.get_config(sig)
-        profiles = self.profile_fetcher.fetch_profiles_from_lookalike(
-            audience_lookalike
+        cache_key = self.model_cache.cache_key(
+            audience_lookalike.source_uuid, config
         )
 
-        logger.info(f"fetched profiles: {len(profiles)}")
-
         # build value calculator (ML or simple)
         calculator = self.build_value_calculator(
             lookalike=audience_lookalike,
-            user_profiles=profiles,
             config=config,
+            cache_key=cache_key,
         )
 
         logger.info(f"is_ml: {calculator.is_ml()} -> {type(calculator)}")
@@ -205,6 +217,7 @@ class LookalikeFillerServiceBase:
         self.calculate_and_store_scores(
             calculator=calculator,
             lookalike_id=audience_lookalike.id,
+            scoring_key=self.get_scoring_key(audience_lookalike, cache_key),
         )
 
         top_asids, scores = self.post_process_lookalike(audience_lookalike)
@@ -216,11 +229,11 @@ class LookalikeFillerServiceBase:
     def build_value_calculator(
         self,
         lookalike: AudienceLookalikes,
-        user_profiles: list[dict[str, str]],
         config: NormalizationConfig,
+        cache_key: str,
     ) -> "ValueCalculator":
         """
-        if scoring_type == "ml" — train model and return MLValueCalculator.
+        if scoring_type == "ml" — train model (or reuse a cached one) and return MLValueCalculator.
         if scoring_type == "simple" — get distribution(insights) and return SimpleStatsValueCalculator.
         """
         gen_type = getattr(lookalike, "scoring_type", "ml")
@@ -238,35 +251,85 @@ class LookalikeFillerServiceBase:
                 significant_fields=lookalike.significant_fields,
             )
             return calc
+        else:
+            model = self.model_cache.load_model(cache_key)
+            if model is not None:
+                logger.info(f"reusing cached model {cache_key}")
+            else:
+                model = self.train_model(lookalike, config, cache_key)
+
+            ml_calc = MLValueCalculator(model)
+            self.audiences_scores.save_enrichment_model(
+                lookalike_id=lookalike.id,
+                model=ml_calc.model,
+                cache_key=cache_key,
+            )
+            return ml_calc
+
+    def train_model(
+        self,
+        lookalike: AudienceLookalikes,
+        config: NormalizationConfig,
+        cache_key: str,
+    ) -> CatBoostRegressor:
+        training_data = self.model_cache.frames.get(cache_key)
+        if training_data is not None:
+            logger.info(f"reusing cached training frame {cache_key}")
         else:
             dict_enrichment = [
                 {
                     k: str(v) if v is not None else "None"
                     for k, v in profile.items()
                 }
-                for profile in user_profiles
+                for block in self.profile_fetcher.iter_profiles_from_lookalike(
+                    lookalike
+                )
+                for profile in block
             ]
-            trained = self.similar_audience_service.get_trained_model(
-                dict_enrichment, config
-            )
-            model_obj = (
-                trained[0] if isinstance(trained, (tuple, list)) else trained
-            )
-            ml_calc = MLValueCalculator(model_obj)
-            self.audiences_scores.save_enrichment_model(
-                lookalike_id=lookalike.id,
-                model=ml_calc.model,
+            logger.info(f"fetched profiles: {len(dict_enrichment)}")
+            training_data = (
+                self.similar_audience_service.normalize_training_data(
+                    dict_enrichment, config
+                )
             )
-            return ml_calc
+            self.model_cache.frames.put(cache_key, *training_data)
+
+        data, customer_value = training_data
+        return self.similar_audience_service.train_catboost(
+            data, customer_value
+        )
+
+    def get_scoring_key(
+        self, lookalike: AudienceLookalikes, cache_key: str
+    ) -> str:
+        """
+        Identifies what the stored scores depend on besides the enrichment
+        rows: the source snapshot and columns (``cache_key``) and the
+        scoring settings of the lookalike
+        """
+        payload = {
+            "cache_key": cache_key,
+            "scoring_type": lookalike.scoring_type,
+            "significant_fields": lookalike.significant_fields,
+            "lookalike_size": lookalike.lookalike_size,
+        }
+        return hashlib.sha256(
+            json.dumps(payload, sort_keys=True, default=str).encode()
+        ).hexdigest()
 
     def calculate_and_store_scores(
         self,
         calculator: "ValueCalculator",
         lookalike_id: UUID,
+        scoring_key: str | None = None,
     ):
         """
         Exception list is not exhaustive
 
+        With LookalikesConfig.INGESTED_AT_COLUMN set and a watermark stored
+        for the same ``scoring_key``, only enrichment users ingested after
+        the watermark are scored and merged into the stored top scores.
+
         Raises `LookalikeNotFound`
         """
         lookalike = self.lookalikes.get_lookalike_unsafe(lookalike_id)
@@ -276,17 +339,45 @@ class LookalikeFillerServiceBase:
         THREAD_COUNT = LookalikesConfig.THREAD_COUNT
         LOOKALIKE_MAX_SIZE = LookalikesConfig.LOOKALIKE_MAX_SIZE
 
+        buckets = self.get_buckets(LookalikesConfig.BUCKETS_PER_TASK)
+
         limit = self.get_lookalike_limit(
-            thread_count=THREAD_COUNT, total_limit=LOOKALIKE_MAX_SIZE
+            thread_count=len(buckets), total_limit=LOOKALIKE_MAX_SIZE
+        )
+
+        source_values = SourceValues.from_mapping(
+            {
+                asid: float(val)
+                for val, asid in self.profile_fetcher.get_value_and_user_asids(
+                    self.db, lookalike.source_uuid
+                )
+            }
         )
+        ingested_at_column = LookalikesConfig.INGESTED_AT_COLUMN
+        watermark = None
+        ingested_at = None
+        if ingested_at_column and scoring_key:
+            watermark = self.score_watermarks.get(lookalike_id)
+            # taken before scanning, rows ingested meanwhile are rescored
+            # by the next refresh
+            ingested_at = self.enrichment_users.get_max(ingested_at_column)
+
+        changed_since = None
+        stored_scores: dict[UUID, float] = {}
+        if watermark is not None and watermark.scoring_key == scoring_key:
+            changed_since = watermark.ingested_at
+            stored_scores = self.enrichment_scores.select_scores(lookalike_id)
+            logging.info(
+                f"incremental refresh since {changed_since}, "
+                f"{len(stored_scores)} stored scores"
+            )
 
-        value_by_asid: dict[UUID, float] = {
-            asid: float(val)
-            for val, asid in self.profile_fetcher.get_value_and_user_asids(
-                self.db, lookalike.source_uuid
+        if changed_since is not None:
+            users_count = self.enrichment_users.count_changed_since(
+                ingested_at_column, changed_since
             )
-        }
-        users_count = self.enrichment_users.count()
+        else:
+            users_count = self.enrichment_users.count()
 
         dataset_size = LOOKALIKE_MAX_SIZE if LOOKALIKE_MAX_SIZE else users_count
 
@@ -294,41 +385,69 @@ class LookalikeFillerServiceBase:
             lookalike_id=lookalike_id, dataset_size=dataset_size
         )
 
-        top_scores: list[PersonScore] = []
+        top_scores = TopScores(top_n)
 
         config = self.audiences_scores.prepare_config(lookalike_id)
 
-        buckets = self.get_buckets(THREAD_COUNT)
-
-        with ProcessPoolExecutor(max_workers=THREAD_COUNT) as executor:
-            futures: list[Future[list[PersonScore]]] = []
-
-            for bucket in buckets:
-                future = executor.submit(
+        context = multiprocessing.get_context()
+        next_bucket_range = context.Value("i", 0)
+        start = time.perf_counter()
+
+        with ProcessPoolExecutor(
+            max_workers=THREAD_COUNT,
+            mp_context=context,
+            initializer=init_filler_process,
+            initargs=(
+                next_bucket_range,
+                source_values,
+                SourceValues.from_mapping(stored_scores)
+                if changed_since is not None
+                else None,
+            ),
+        ) as executor:
+            futures: list[Future[FillerWorkerResult]] = [
+                executor.submit(
                     filler_worker,
                     significant_fields=significant_fields,
                     config=config,
-                    value_by_asid=value_by_asid,
                     lookalike_id=lookalike_id,
-                    bucket=bucket,
+                    bucket_ranges=buckets,
                     top_n=top_n,
                     calculator=calculator,
                     limit=limit,
+                    changed_since=changed_since,
                 )
+                for _ in range(THREAD_COUNT)
+            ]
 
-                futures.append(future)
-
+            total_rows = 0
+            rescored_asids: set[UUID] = set()
             for future in as_completed(futures):
-                scores = future.result()
-
-                top_scores = self.audiences_scores.top_scores(
-                    old_scores=top_scores,
-                    new_scores=scores,
-                    top_n=top_n,
+                result = future.result()
+                top_scores.push_scores(result.scores)
+                rescored_asids.update(result.rescored_asids)
+                worker_rows = sum(stats.rows for stats in result.stats)
+                total_rows += worker_rows
+                logging.info(
+                    f"worker done: {len(result.stats)} bucket ranges, "
+                    f"{worker_rows} rows, merged scores: {len(top_scores)}"
                 )
+            elapsed = time.perf_counter() - start
+            logging.info(
+                f"scored {total_rows} rows in {elapsed:.3f}s "
+                f"({total_rows / elapsed if elapsed else 0:.0f} rows/s)"
+            )
 
-                logging.info(f"sort done")
-            logging.info("done")
+        if changed_since is not None:
+            # stored scores of rescored users are outdated, the rest still
+            # compete for the top
+            top_scores.push_scores(
+                [
+                    (asid, score)
+                    for asid, score in stored_scores.items()
+                    if asid not in rescored_asids
+                ]
+            )
 
         logging.info("running clickhouse query")
 
@@ -336,9 +455,29 @@ class LookalikeFillerServiceBase:
         # so i re-init the client
         self.clickhouse = ClickhouseConfig.get_client()
         _ = self.clickhouse.command("SET max_query_size = 20485760")
-        self.enrichment_scores.bulk_insert(
-            lookalike_id=lookalike_id, scores=top_scores
-        )
+        if watermark is not None:
+            # readers switch to the new scores when the watermark commits,
+            # so they never see the lookalike half rewritten
+            generation = self.enrichment_scores.stage(
+                lookalike_id=lookalike_id, scores=top_scores.result()
+            )
+            self.score_watermarks.save(
+                lookalike_id,
+                scoring_key,
+                ingested_at,
+                scores_generation=generation,
+            )
+            self.enrichment_scores.drop_other_generations(
+                lookalike_id, generation
+            )
+        else:
+            self.enrichment_scores.bulk_insert(
+                lookalike_id=lookalike_id, scores=top_scores.result()
+            )
+            if ingested_at is not None:
+                self.score_watermarks.save(
+                    lookalike_id, scoring_key, ingested_at
+                )
         self.db_workaround(lookalike_id=lookalike_id)
 
     @deprecated("workaround")
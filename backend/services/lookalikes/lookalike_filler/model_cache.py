@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import os
+from uuid import UUID
+
+import pandas as pd
+import pyarrow as pa
+from catboost import CatBoostError, CatBoostRegressor
+from pandas import DataFrame
+
+from config.folders import Folders
+from config.lookalikes import LookalikesConfig
+from persistence.audience_sources_matched_persons import (
+    AudienceSourcesMatchedPersonsPersistence,
+)
+from persistence.enrichment_models import EnrichmentModelsPersistence
+from resolver import injectable
+from schemas.similar_audiences import NormalizationConfig
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 2
+"""
+Bump when normalization or training changes, so old entries stop matching
+"""
+TARGET_COLUMN = "customer_value"
+
+
+class TrainingFrameCache:
+    """
+    Normalized training frames stored as Parquet files named by cache key.
+
+    Reads touch the file, so the modification time doubles as the LRU order
+    used to evict files once the directory outgrows ``max_bytes``.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.parquet")
+
+    def get(self, key: str) -> tuple[DataFrame, DataFrame] | None:
+        path = self._path(key)
+        try:
+            frame = pd.read_parquet(path)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, pa.ArrowException) as e:
+            logger.warning(f"Dropping unreadable training frame {path}: {e}")
+            self._remove(path)
+            return None
+
+        # parquet infers e.g. bool for object columns, catboost must still
+        # see them as categorical
+        object_columns = frame.attrs.pop("object_columns", [])
+        frame[object_columns] = frame[object_columns].astype(object)
+        target = frame.pop(TARGET_COLUMN)
+        return frame, target
+
+    def put(self, key: str, data: DataFrame, target: DataFrame):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        frame = data.assign(**{TARGET_COLUMN: target.to_numpy()})
+        frame.attrs["object_columns"] = frame.select_dtypes(
+            include="object"
+        ).columns.tolist()
+        try:
+            frame.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except (OSError, pa.ArrowException, ValueError) as e:
+            logger.warning(f"Could not cache training frame {key}: {e}")
+            self._remove(tmp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".parquet"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            logger.info(f"Evicted training frame {path}")
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+@injectable
+class LookalikeModelCache:
+    """
+    Content-addressed cache of lookalike training results.
+
+    The key covers the source, a fingerprint of its matched persons and
+    their value scores, and the feature columns, so recalculating a
+    lookalike on unchanged data reuses the stored model instead of fetching
+    profiles and retraining. Models live in enrichment_models, normalized
+    training frames on local disk.
+    """
+
+    def __init__(
+        self,
+        matched_sources: AudienceSourcesMatchedPersonsPersistence,
+        enrichment_models: EnrichmentModelsPersistence,
+    ):
+        self.matched_sources = matched_sources
+        self.enrichment_models = enrichment_models
+        self.frames = TrainingFrameCache(
+            directory=LookalikesConfig.CACHE_DIR
+            or Folders.data("lookalike_cache"),
+            max_bytes=LookalikesConfig.CACHE_MAX_BYTES,
+        )
+
+    def cache_key(
+        self,
+        source_id: UUID,
+        config: NormalizationConfig,
+        random_seed: int = 42,
+    ) -> str:
+        fingerprint = self.matched_sources.snapshot_fingerprint(source_id)
+        payload = {
+            "version": CACHE_VERSION,
+            "source_id": str(source_id),
+            "matched_persons": fingerprint,
+            "numerical": sorted(config.numerical_features),
+            "ordered": sorted(config.ordered_features),
+            "unordered": sorted(config.unordered_features),
+            "random_seed": random_seed,
+        }
+        return hashlib.sha256(
+            json.dumps(payload, sort_keys=True).encode()
+        ).hexdigest()
+
+    def load_model(self, key: str) -> CatBoostRegressor | None:
+        stored = self.enrichment_models.by_cache_key(key)
+        if stored is None:
+            return None
+
+        model = CatBoostRegressor()
+        try:
+            model.load_model(blob=bytes(stored.model))
+        except CatBoostError as e:
+            logger.warning(f"Could not load cached model {stored.id}: {e}")
+            return None
+        return model
@@ -2,6 +2,9 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any, Optional
 from catboost import CatBoostRegressor
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
 import pickle
 import time
 
@@ -52,6 +55,107 @@ class MLValueCalculator(ValueCalculator):
         return MLValueCalculator(model=model)
 
 
+class FeatureDistribution:
+    """
+    One feature distribution ({value: percent}) compiled for lookups.
+
+    Matching order is the same as the original per-value rules: exact key,
+    then the first "lo-hi" bucket containing the numeric value, then a
+    case-insensitive key match, otherwise 0.
+    """
+
+    def __init__(self, distribution: Dict[str, Any]):
+        self.exact: Dict[str, float] = {}
+        self.lower: Dict[str, float] = {}
+        intervals = []
+        for key, pct in distribution.items():
+            try:
+                share = float(pct) / 100.0
+            except (TypeError, ValueError):
+                continue
+            key = str(key)
+            self.exact.setdefault(key, share)
+            self.lower.setdefault(key.lower(), share)
+            parts = key.split("-")
+            if "-" in key and len(parts) == 2:
+                try:
+                    intervals.append((float(parts[0]), float(parts[1]), share))
+                except ValueError:
+                    continue
+
+        # buckets keep their declaration order, the first match wins
+        self._intervals = intervals
+        self.lo = np.array([lo for lo, _, _ in intervals], dtype=np.float64)
+        self.hi = np.array([hi for _, hi, _ in intervals], dtype=np.float64)
+        self.shares = np.array(
+            [share for _, _, share in intervals], dtype=np.float64
+        )
+        order = np.argsort(self.lo, kind="stable")
+        sorted_lo, sorted_hi = self.lo[order], self.hi[order]
+        # searchsorted only works when buckets do not overlap, otherwise
+        # fall back to checking them in declaration order
+        self.is_disjoint = bool(np.all(sorted_lo[1:] > sorted_hi[:-1]))
+        self._sorted_lo = sorted_lo
+        self._sorted_hi = sorted_hi
+        self._sorted_shares = self.shares[order]
+
+    def _score_numbers(
+        self, numbers: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        scores = np.zeros(len(numbers), dtype=np.float64)
+        matched = np.zeros(len(numbers), dtype=bool)
+        if not len(self.lo):
+            return scores, matched
+
+        if self.is_disjoint:
+            index = np.searchsorted(self._sorted_lo, numbers, side="right") - 1
+            valid = index >= 0
+            index = np.where(valid, index, 0)
+            matched = valid & (numbers <= self._sorted_hi[index])
+            scores = np.where(matched, self._sorted_shares[index], 0.0)
+            return scores, matched
+
+        for lo, hi, share in self._intervals:
+            hit = ~matched & (numbers >= lo) & (numbers <= hi)
+            scores[hit] = share
+            matched |= hit
+        return scores, matched
+
+    def score_values(self, values) -> np.ndarray:
+        """
+        Scores distinct non-null values, e.g. the uniques of a column.
+        """
+        keys = [str(value) for value in values]
+        scores = np.array(
+            [self.exact.get(key, np.nan) for key in keys], dtype=np.float64
+        )
+        unresolved = np.isnan(scores)
+        if not unresolved.any():
+            return scores
+
+        numbers = np.full(len(keys), np.nan)
+        for i in np.flatnonzero(unresolved):
+            try:
+                numbers[i] = float(values[i])
+            except (TypeError, ValueError):
+                pass
+        interval_scores, matched = self._score_numbers(numbers)
+        matched &= unresolved
+        scores[matched] = interval_scores[matched]
+        unresolved &= ~matched
+
+        for i in np.flatnonzero(unresolved):
+            scores[i] = self.lower.get(keys[i].lower(), 0.0)
+        return scores
+
+    def score_column(self, column: pd.Series) -> np.ndarray:
+        codes, uniques = pd.factorize(column, use_na_sentinel=True)
+        if not len(uniques):
+            return np.zeros(len(column), dtype=np.float64)
+        unique_scores = self.score_values(np.asarray(uniques, dtype=object))
+        return np.where(codes >= 0, unique_scores[codes], 0.0)
+
+
 class SimpleStatsValueCalculator(ValueCalculator):
     def __init__(
         self,
@@ -68,18 +172,22 @@ class SimpleStatsValueCalculator(ValueCalculator):
         self.weights = feature_weights or {}
         self.significant_fields = significant_fields or {}
 
-        self._dist_cache: Dict[str, Dict[str, float]] = {}
+        self._dist_cache: Dict[str, FeatureDistribution] = {}
         for top in self.distribution.values():
             for cat_name, cat_map in top.items():
                 if isinstance(cat_map, dict):
                     for feat_name, feat_dist in cat_map.items():
                         if isinstance(feat_dist, dict):
-                            self._dist_cache[feat_name.lower()] = feat_dist
+                            self._dist_cache[feat_name.lower()] = (
+                                FeatureDistribution(feat_dist)
+                            )
 
     def is_ml(self) -> bool:
         return False
 
-    def _score_single_feature(self, feature_col: str, user_value) -> float:
+    def _score_feature_column(
+        self, feature_col: str, batch: DataFrame
+    ) -> np.ndarray:
         """
         Rules (simple method):
         - If there is a distribution for the column and it is a categorical variable in the form {val: percent}
@@ -87,75 +195,37 @@ class SimpleStatsValueCalculator(ValueCalculator):
           (i.e., a user receives more if their category appears frequently in the source)
           - if the value is missing or there is no distribution -> 0.0
         """
-        if user_value is None:
-            return 0.0
-
         dist = self._dist_cache.get(feature_col.lower())
-        if not dist:
-            return 0.0
-
-        key = str(user_value)
-
-        if key in dist:
-            return float(dist[key]) / 100.0
-
-        try:
-            num = float(user_value)
-            for bucket_key, pct in dist.items():
-                if "-" in bucket_key:
-                    parts = bucket_key.split("-")
-                    if len(parts) == 2:
-                        try:
-                            lo, hi = float(parts[0]), float(parts[1])
-                            if lo <= num <= hi:
-                                return float(pct) / 100.0
-                        except Exception:
-                            continue
-        except Exception:
-            pass
-
-        # Фаззи по lower()
-        for k, pct in dist.items():
-            if k.lower() == key.lower():
-                return float(pct) / 100.0
-
-        return 0.0
-
-    def calculate(self, batch: list[dict[str, Any]]) -> list[float]:
+        if dist is None or feature_col not in batch.columns:
+            return np.zeros(len(batch), dtype=np.float64)
+        return dist.score_column(batch[feature_col])
+
+    def calculate(self, batch: DataFrame) -> list[float]:
         """
         Unified interface for calculating scoring batches.
         Compatible with SimilarAudiencesScoresService.calculate_batch_scores_v3.
-        """
-        _, scores = self.predict_batch(
-            asids=[row.get("asid") for row in batch],
-            batch_buffer=batch,
-        )
-        return scores
-
-    def predict_batch(self, asids: List, batch_buffer: List[Dict[str, Any]]):
-        start = time.perf_counter()
-        scores = []
 
+        Values are matched by str(value), so ``batch`` should keep the
+        original Python values (dtype=object): a nullable int column turned
+        into float64 would look up "30.0" instead of "30".
+        """
         if self.weights:
             weights = self.weights
         else:
-            first = batch_buffer[0] if batch_buffer else {}
             feature_cols = [
-                k for k in first.keys() if k not in ("asid", "customer_value")
+                k for k in batch.columns if k not in ("asid", "customer_value")
             ]
             w = 1.0 / max(1, len(feature_cols))
             weights = {f: w for f in feature_cols}
 
-        _score_feature = self._score_single_feature
-        _weights_items = list(weights.items())
-
-        for row in batch_buffer:
-            s = 0.0
-            for feature_col, w in _weights_items:
-                val = row.get(feature_col)
-                s += w * _score_feature(feature_col, val)
-            scores.append(s)
+        scores = np.zeros(len(batch), dtype=np.float64)
+        for feature_col, w in weights.items():
+            scores += w * self._score_feature_column(feature_col, batch)
+        return scores.tolist()
 
+    def predict_batch(self, asids: List, batch_buffer: List[Dict[str, Any]]):
+        start = time.perf_counter()
+        scores = self.calculate(DataFrame(batch_buffer, dtype=object))
         elapsed = time.perf_counter() - start
         return elapsed, scores
 
@@ -4,13 +4,18 @@ This file is a workaround for python's atrocius multithreading support and issue
 
 import logging
 import time
-from typing import Any, cast
+from dataclasses import dataclass, field
+from datetime import datetime
+from multiprocessing.sharedctypes import Synchronized
+from typing import Sequence, cast
 from uuid import UUID
 
+import numpy as np
 from catboost import CatBoostRegressor
 from clickhouse_connect.driver.common import StreamContext
 from pandas import DataFrame
 from sqlalchemy import update
+from sqlalchemy.orm import Session
 
 from config.clickhouse import ClickhouseConfig
 from config.lookalikes import LookalikesConfig
@@ -30,30 +35,150 @@ from services.similar_audiences.column_selector import (
 )
 from services.similar_audiences.similar_audience_scores import (
     PersonScore,
+    TopScores,
     measure,
 )
 
 logger = logging.getLogger(__name__)
 
+BUCKETS_COUNT = 100
+
+
+def _uuid_bytes(asid) -> bytes:
+    if isinstance(asid, UUID):
+        return asid.bytes
+    return UUID(str(asid)).bytes
+
+
+class SourceValues:
+    """
+    customer_value of the source asids as two flat arrays (sorted 16-byte
+    asids and float64 values). Pickling them is a couple of buffer copies
+    instead of a dict of UUID objects, and lookups are one searchsorted.
+    """
+
+    def __init__(self, keys: np.ndarray, values: np.ndarray):
+        self.keys = keys
+        self.values = values
+
+    @classmethod
+    def from_mapping(cls, value_by_asid: dict[UUID, float]) -> "SourceValues":
+        keys = np.array(
+            [_uuid_bytes(asid) for asid in value_by_asid], dtype="S16"
+        )
+        values = np.fromiter(
+            value_by_asid.values(), dtype=np.float64, count=len(keys)
+        )
+        order = np.argsort(keys, kind="stable")
+        return cls(keys[order], values[order])
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _find(self, asids: Sequence) -> tuple[np.ndarray, np.ndarray]:
+        wanted = np.array([_uuid_bytes(asid) for asid in asids], dtype="S16")
+        index = np.searchsorted(self.keys, wanted)
+        index[index == len(self.keys)] = 0
+        return index, self.keys[index] == wanted
+
+    def lookup(self, asids: Sequence) -> np.ndarray:
+        """
+        Values for ``asids`` in order, 0.0 for asids outside the source.
+        """
+        if not len(self.keys) or not len(asids):
+            return np.zeros(len(asids), dtype=np.float64)
+        index, found = self._find(asids)
+        return np.where(found, self.values[index], 0.0)
+
+    def contains(self, asids: Sequence) -> np.ndarray:
+        if not len(self.keys) or not len(asids):
+            return np.zeros(len(asids), dtype=bool)
+        _, found = self._find(asids)
+        return found
+
+
+@dataclass
+class BucketRangeStats:
+    buckets: list[int]
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class FillerWorkerResult:
+    scores: list[PersonScore]
+    stats: list[BucketRangeStats]
+    # asids of the stored scores that were scored again, incremental only
+    rescored_asids: list[UUID] = field(default_factory=list)
+
+
+def split_buckets(buckets_per_task: int) -> list[list[int]]:
+    """
+    Covers all cityHash64(asid) % 100 buckets with ranges of
+    ``buckets_per_task`` buckets, the last one may be shorter.
+    """
+    step = max(1, buckets_per_task)
+    return [
+        list(range(start, min(start + step, BUCKETS_COUNT)))
+        for start in range(0, BUCKETS_COUNT, step)
+    ]
+
+
+# set in every pool process by init_filler_process
+_next_bucket_range: Synchronized | None = None
+_source_values: SourceValues | None = None
+_stored_scores: SourceValues | None = None
+
+
+def init_filler_process(
+    next_bucket_range: Synchronized,
+    source_values: SourceValues,
+    stored_scores: SourceValues | None = None,
+):
+    """
+    ProcessPoolExecutor initializer. The counter, the source values and,
+    for an incremental refresh, the stored scores are handed over once per
+    process instead of once per task.
+    """
+    global _next_bucket_range, _source_values, _stored_scores
+    _next_bucket_range = next_bucket_range
+    _source_values = source_values
+    _stored_scores = stored_scores
+
+
+def claim_bucket_range(bucket_ranges: list[list[int]]) -> list[int] | None:
+    with _next_bucket_range.get_lock():
+        index = _next_bucket_range.value
+        _next_bucket_range.value += 1
+    if index >= len(bucket_ranges):
+        return None
+    return bucket_ranges[index]
+
 
 def calculate_batch_scores_v3(
-    asids: list[UUID],
-    batch: list[dict[str, Any]],
+    batch: DataFrame,
     calculator: ValueCalculator | CatBoostRegressor,
     config: NormalizationConfig,
-) -> tuple[float, list[PersonScore]]:
+) -> tuple[float, list[float]]:
     """
     Universal calculate batch'а:
     - if calculator = MLValueCalculator / CatBoostRegressor → ML-predict
     - if calculator = SimpleStatsValueCalculator → simple method
+
+    Scores are returned in the row order of ``batch``.
     """
 
     def _calc(_):
         # ML вариант
         if isinstance(calculator, (MLValueCalculator, CatBoostRegressor)):
-            df = DataFrame(batch)
             normalization_service = AudienceDataNormalizationServiceBase()
-            df_normed, _ = normalization_service.normalize_dataframe(df, config)
+            df_normed, _ = normalization_service.normalize_dataframe(
+                batch, config
+            )
             if isinstance(calculator, MLValueCalculator):
                 model = calculator.model
             else:
@@ -73,30 +198,33 @@ def calculate_batch_scores_v3(
             )
 
     scores, duration = measure(_calc)
-    return duration, list(zip(asids, scores))
+    return duration, scores
 
 
-def get_top_scores(
-    old_scores: list[tuple[UUID, float]],
-    new_scores: list[tuple[UUID, float]],
-    top_n: int,
-) -> list[PersonScore]:
-    combined = {}
-
-    for uuid_, score in old_scores + new_scores:
-        if uuid_ not in combined or score > combined[uuid_]:
-            combined[uuid_] = score
-
-    return sorted(combined.items(), key=lambda x: x[1], reverse=True)[:top_n]
+def build_batch_frame(
+    columns: dict[str, list],
+    source_values: SourceValues,
+    dtype: type | None = None,
+) -> DataFrame:
+    """
+    Builds the scoring frame straight from column lists and adds
+    ``customer_value`` with one vectorized lookup.
+    """
+    batch = DataFrame(columns, dtype=dtype)
+    batch["customer_value"] = source_values.lookup(columns["asid"])
+    return batch
 
 
 def get_enrichment_users_partition(
     significant_fields: dict[str, float],
     bucket: list[int],
     limit: int | None = None,
+    changed_since: datetime | None = None,
 ) -> tuple[StreamContext, list[str]]:
     """
-    Returns a stream of blocks of enrichment users and a list of column names for a partition
+    Returns a stream of column-oriented blocks of enrichment users and a list of column names for a partition
+
+    With ``changed_since`` only rows ingested after it are returned
     """
     column_selector = AudienceColumnSelectorBase()
 
@@ -111,111 +239,163 @@ def get_enrichment_users_partition(
     client = ClickhouseConfig.get_client()
 
     limit_clause = f" LIMIT {limit}" if limit else ""
+    # inlined, query parameters would also format the `% 100` above
+    changed_clause = (
+        f" AND {LookalikesConfig.INGESTED_AT_COLUMN}"
+        f" > toDateTime64('{changed_since:%Y-%m-%d %H:%M:%S.%f}', 6)"
+        if changed_since
+        else ""
+    )
 
-    rows_stream = client.query_row_block_stream(
-        f"SELECT {columns} FROM enrichment_users WHERE cityHash64(asid) % 100 IN ({in_clause}){limit_clause}",
+    blocks_stream = client.query_column_block_stream(
+        f"SELECT {columns} FROM enrichment_users WHERE cityHash64(asid) % 100 IN ({in_clause}){changed_clause}{limit_clause}",
         settings={"max_block_size": 1000000},
     )
-    column_names: list[str] = cast(list[str], rows_stream.source.column_names)
+    column_names: list[str] = cast(list[str], blocks_stream.source.column_names)
 
-    return rows_stream, column_names
+    return blocks_stream, column_names
 
 
 def filler_worker(
     significant_fields: dict[str, float],
     config: NormalizationConfig,
-    value_by_asid: dict[UUID, float],
     lookalike_id: UUID,
-    bucket: list[int],
+    bucket_ranges: list[list[int]],
     top_n: int,
     calculator: "ValueCalculator",
     limit: int | None = None,
-) -> list[PersonScore]:
+    changed_since: datetime | None = None,
+) -> FillerWorkerResult:
+    """
+    Claims bucket ranges from the shared counter until none are left, so
+    processes that finish early keep taking work instead of idling.
+    """
     db = next(get_db())
+    top_scores = TopScores(top_n)
+    stats: list[BucketRangeStats] = []
+    rescored_asids: list[UUID] = []
+    while (bucket := claim_bucket_range(bucket_ranges)) is not None:
+        start = time.perf_counter()
+        rows = score_bucket_range(
+            significant_fields=significant_fields,
+            config=config,
+            lookalike_id=lookalike_id,
+            bucket=bucket,
+            top_scores=top_scores,
+            calculator=calculator,
+            db=db,
+            limit=limit,
+            changed_since=changed_since,
+            rescored_asids=rescored_asids,
+        )
+        range_stats = BucketRangeStats(
+            buckets=bucket, rows=rows, seconds=time.perf_counter() - start
+        )
+        stats.append(range_stats)
+        logger.info(
+            f"buckets {bucket}: {rows} rows in {range_stats.seconds:.3f}s "
+            f"({range_stats.rows_per_second:.0f} rows/s)"
+        )
+
+    return FillerWorkerResult(
+        scores=top_scores.result(),
+        stats=stats,
+        rescored_asids=rescored_asids,
+    )
+
+
+def score_bucket_range(
+    significant_fields: dict[str, float],
+    config: NormalizationConfig,
+    lookalike_id: UUID,
+    bucket: list[int],
+    top_scores: TopScores,
+    calculator: "ValueCalculator",
+    db: Session,
+    limit: int | None = None,
+    changed_since: datetime | None = None,
+    rescored_asids: list[UUID] | None = None,
+) -> int:
     BULK_SIZE: int = LookalikesConfig.BULK_SIZE
 
-    rows_stream, column_names = get_enrichment_users_partition(
+    blocks_stream, column_names = get_enrichment_users_partition(
         significant_fields=significant_fields,
         bucket=bucket,
         limit=limit,
+        changed_since=changed_since,
     )
 
-    batch_buffer = []
-
-    top_scores: list[PersonScore] = []
-
-    _ = db.execute(
-        update(AudienceLookalikes)
-        .where(AudienceLookalikes.id == lookalike_id)
-        .values(processed_train_model_size=0)
+    # simple scoring matches str(value), so keep ints from becoming floats
+    frame_dtype = (
+        object if isinstance(calculator, SimpleStatsValueCalculator) else None
     )
-    db.commit()
+    total_rows = 0
+
+    def score_batch(columns: dict[str, list]):
+        nonlocal total_rows
+        prepare_start = time.perf_counter()
+        batch = build_batch_frame(columns, _source_values, dtype=frame_dtype)
+        asids: list[UUID] = batch["asid"].tolist()
+        logger.info(
+            f"prepare batch time: {time.perf_counter() - prepare_start:.3f}"
+        )
+
+        times, scores = calculate_batch_scores_v3(
+            batch=batch,
+            calculator=calculator,
+            config=config,
+        )
+
+        logger.info(f"batch calculation time: {times:.3f}")
+
+        update_query = (
+            update(AudienceLookalikes)
+            .where(AudienceLookalikes.id == lookalike_id)
+            .values(
+                processed_train_model_size=AudienceLookalikes.processed_train_model_size
+                + len(scores),
+                processed_size=AudienceLookalikes.processed_size + len(scores),
+            )
+            .returning(AudienceLookalikes.processed_train_model_size)
+        )
 
-    fetch_start = time.perf_counter()
+        processed = db.execute(update_query).scalar()
+        db.commit()
 
-    with rows_stream:
-        for batch in rows_stream:
-            dict_batch = [
-                {
-                    **dict(zip(column_names, row)),
-                    "customer_value": value_by_asid.get(
-                        row[column_names.index("asid")], 0.0
-                    ),
-                }
-                for row in batch
-            ]
-
-            batch_buffer.extend(dict_batch)
-
-            if len(batch_buffer) < BULK_SIZE:
-                continue
+        logger.info(f"processed: {processed}")
 
-            fetch_end = time.perf_counter()
-            logger.info(f"fetch time: {fetch_end - fetch_start:.3f}")
+        top_scores.push(asids, scores)
+        total_rows += len(scores)
 
-            prepare_asids_start = time.perf_counter()
-            asids: list[UUID] = [doc["asid"] for doc in batch_buffer]
-            prepare_asids_end = time.perf_counter()
+        if _stored_scores is not None and rescored_asids is not None:
+            stored = _stored_scores.contains(asids)
+            rescored_asids.extend(asids[i] for i in np.flatnonzero(stored))
 
-            logger.info(
-                f"prepare asids time: {prepare_asids_end - prepare_asids_start:.3f}"
-            )
+        logging.info(f"top scores: {len(top_scores)}")
 
-            times, scores = calculate_batch_scores_v3(
-                asids=asids,
-                batch=batch_buffer,
-                calculator=calculator,
-                config=config,
-            )
+    columns_buffer: dict[str, list] = {name: [] for name in column_names}
+    buffered_rows = 0
 
-            logger.info(f"batch calculation time: {times:.3f}")
-
-            update_query = (
-                update(AudienceLookalikes)
-                .where(AudienceLookalikes.id == lookalike_id)
-                .values(
-                    processed_train_model_size=AudienceLookalikes.processed_train_model_size
-                    + len(scores),
-                    processed_size=AudienceLookalikes.processed_size
-                    + len(scores),
-                )
-                .returning(AudienceLookalikes.processed_train_model_size)
-            )
+    fetch_start = time.perf_counter()
 
-            processed = db.execute(update_query).scalar()
-            db.commit()
+    with blocks_stream:
+        for block in blocks_stream:
+            for name, values in zip(column_names, block):
+                columns_buffer[name].extend(values)
+            buffered_rows += len(block[0]) if block else 0
 
-            logger.info(f"processed: {processed}")
+            if buffered_rows < BULK_SIZE:
+                continue
 
-            top_scores = get_top_scores(
-                old_scores=top_scores,
-                new_scores=scores,
-                top_n=top_n,
-            )
+            logger.info(f"fetch time: {time.perf_counter() - fetch_start:.3f}")
 
-            logging.info("sorted scores")
+            score_batch(columns_buffer)
 
-            batch_buffer = []
+            columns_buffer = {name: [] for name in column_names}
+            buffered_rows = 0
             fetch_start = time.perf_counter()
 
-    return top_scores
+    if buffered_rows:
+        score_batch(columns_buffer)
+
+    return total_rows
@@ -1,10 +1,11 @@
 import string
 import warnings
-from typing import List, Annotated, Tuple
+from dataclasses import dataclass
+from typing import Any, Callable, List, Annotated, Tuple
 
 import pandas as pd
 from fastapi import Depends
-from pandas import DataFrame
+from pandas import DataFrame, Series
 from pandas.errors import PerformanceWarning
 import numpy as np
 from config.folders import Folders
@@ -55,6 +56,65 @@ def map_net_worth_code(letter: str):
     return letter_to_number_I.get(letter)
 
 
+def map_unique(
+    series: Series, func: Callable[[Any], Any], dtype: str = "Int64"
+) -> pd.api.extensions.ExtensionArray:
+    """
+    Same values as ``series.map(func).astype(dtype)``, but ``func`` runs once
+    per distinct value and the results are spread back through the
+    factorized codes.
+    """
+    codes, uniques = pd.factorize(series)
+    mapped = pd.array(
+        [func(value) for value in uniques] + [func(np.nan)], dtype=dtype
+    )
+    # NA rows get code -1, which takes the trailing func(nan)
+    return mapped.take(codes)
+
+
+@dataclass
+class GeoTable:
+    """
+    uszips.csv reduced to what normalization needs: a zip index and
+    categorical state_name / state_city columns aligned with it.
+    """
+
+    zips: pd.Index
+    state_names: pd.Categorical
+    state_cities: pd.Categorical
+
+    @classmethod
+    def from_dataframe(cls, df_geo: DataFrame) -> "GeoTable":
+        # a left merge would repeat rows for a duplicated zip, keep the first
+        df_geo = df_geo.drop_duplicates("zip")
+        return cls(
+            zips=pd.Index(df_geo["zip"]),
+            state_names=pd.Categorical(df_geo["state_name"]),
+            state_cities=pd.Categorical(
+                df_geo["state_name"] + "|" + df_geo["city"]
+            ),
+        )
+
+    def lookup(self, zip_codes: Series) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns state_name and state_city object arrays for ``zip_codes``,
+        NaN where the zip is unknown.
+        """
+        codes, uniques = pd.factorize(zip_codes)
+        positions = self.zips.get_indexer(uniques)
+
+        def take(column: pd.Categorical) -> np.ndarray:
+            values = np.asarray(
+                column.take(positions, allow_fill=True), dtype=object
+            )
+            return np.append(values, np.nan)[codes]
+
+        return take(self.state_names), take(self.state_cities)
+
+
+_geo_table: GeoTable | None = None
+
+
 def default_normalization_config() -> NormalizationConfig:
     return NormalizationConfig(
         numerical_features=[
@@ -108,7 +168,7 @@ class AudienceDataNormalizationServiceBase:
 
     def convert_int_columns(self, df: DataFrame, int_columns: List[str]):
         for name in int_columns:
-            df[name] = df[name].map(convert_to_int).astype("Int64")
+            df[name] = map_unique(df[name], convert_to_int)
 
     def convert_categorials(self, df: DataFrame, cat_columns: List[str]):
         for name in cat_columns:
@@ -122,21 +182,26 @@ class AudienceDataNormalizationServiceBase:
         self, df: DataFrame, rules: OrderedFeatureRules
     ):
         for name, operation in rules.items():
-            df[name] = df[name].map(operation).astype("Int64")
+            df[name] = map_unique(df[name], operation)
 
     def slice_zipcodes(self, df: DataFrame):
-        if "zip_code5" in df.columns:
-            df["zip_code5"] = (
-                df["zip_code5"]
-                .fillna(0)
-                .astype(int)
-                .astype(str)
-                .replace("0", "00000")
-            )
-        else:
+        if "zip_code5" not in df.columns:
             df["zip_code5"] = "00000"
-        df["zip_code4"] = df["zip_code5"].str[:4]
-        df["zip_code3"] = df["zip_code5"].str[:3]
+            df["zip_code4"] = "0000"
+            df["zip_code3"] = "000"
+            return
+
+        codes, uniques = pd.factorize(df["zip_code5"])
+        zip_codes = (
+            Series(np.append(np.asarray(uniques, dtype=object), 0))
+            .fillna(0)
+            .astype(int)
+            .astype(str)
+            .replace("0", "00000")
+        )
+        df["zip_code5"] = zip_codes.to_numpy(dtype=object)[codes]
+        df["zip_code4"] = zip_codes.str[:4].to_numpy(dtype=object)[codes]
+        df["zip_code3"] = zip_codes.str[:3].to_numpy(dtype=object)[codes]
 
     def fill_unknowns(self, df: DataFrame, cat_columns: List[str]):
         for cat in cat_columns:
@@ -166,16 +231,10 @@ class AudienceDataNormalizationServiceBase:
         df.loc[:, "state_city"] = df["state_city"].fillna("unknown")
 
     def merge_with_geo(self, df: DataFrame) -> DataFrame:
-        df_geo = self.get_states_dataframe()
-
-        df_with_geo = df.merge(
-            df_geo, how="left", left_on="zip_code5", right_on="zip"
-        )
-        df_with_geo["state_city"] = (
-            df_with_geo["state_name"] + "|" + df_with_geo["city"]
-        )
-
-        return df_with_geo
+        state_names, state_cities = self.get_geo_table().lookup(df["zip_code5"])
+        df["state_name"] = state_names
+        df["state_city"] = state_cities
+        return df
 
     def filter_columns(
         self, df_with_geo: DataFrame, config: NormalizationConfig
@@ -216,6 +275,15 @@ class AudienceDataNormalizationServiceBase:
         df["zip_code5"] = df["zip_code5"].astype("object")
         return df
 
+    def get_geo_table(self) -> GeoTable:
+        """
+        Loaded once per process, normalization runs for every scoring batch
+        """
+        global _geo_table
+        if _geo_table is None:
+            _geo_table = GeoTable.from_dataframe(self.get_states_dataframe())
+        return _geo_table
+
     def get_states_dataframe(self) -> DataFrame:
         path = Folders.data("uszips.csv")
         dataframe = pd.read_csv(
@@ -1,8 +1,9 @@
 import math
 from decimal import Decimal
-from typing import List, Dict, Tuple
+from typing import Iterator, List, Dict, Tuple
 from uuid import UUID
 
+from clickhouse_connect.driver.external import ExternalData
 from clickhouse_connect.driver.query import QueryResult
 from sqlalchemy import select
 from sqlalchemy.orm import Session
@@ -20,6 +21,30 @@ from services.similar_audiences.audience_profile_fetcher.interface import (
 )
 from services.similar_audiences.column_selector import AudienceColumnSelector
 
+SOURCE_VALUES_TABLE = "source_values"
+PROFILE_BLOCK_SIZE = 100_000
+TSV_NULL = "\\N"
+
+
+def pad_with_zeros(zip_code: None | str) -> str:
+    if not zip_code or zip_code.strip().lower() in {
+        "none",
+        "null",
+        "nan",
+    }:
+        return "00000"
+    cleaned = zip_code.strip()
+    return cleaned.zfill(5) if cleaned.isdigit() else "00000"
+
+
+def with_zip_code5(row: dict) -> dict:
+    return {
+        **row,
+        "zip_code5": pad_with_zeros(row["zip_code5"])
+        if "zip_code5" in row
+        else "00000",
+    }
+
 
 @injectable
 class ClickhouseProfileFetcher(ProfileFetcherInterface):
@@ -45,32 +70,65 @@ class ClickhouseProfileFetcher(ProfileFetcherInterface):
         result = self.clickhouse.query(query, parameters={"asids": asids})
 
         result = self.parse_clickhouse_result(result)
-
-        def pad_with_zeros(zip_code: None | str) -> str:
-            if not zip_code or zip_code.strip().lower() in {
-                "none",
-                "null",
-                "nan",
-            }:
-                return "00000"
-            cleaned = zip_code.strip()
-            return cleaned.zfill(5) if cleaned.isdigit() else "00000"
-
-        result = [
-            {
-                **row,
-                "zip_code5": pad_with_zeros(row["zip_code5"])
-                if "zip_code5" in row
-                else "00000",
-            }
-            for row in result
-        ]
+        result = [with_zip_code5(row) for row in result]
 
         return result
 
-    def fetch_profiles_from_lookalike(
+    def stream_profiles_with_values(
+        self,
+        selected_columns: List[str],
+        users: List[Tuple[Decimal | None, UUID]],
+    ) -> Iterator[List[dict]]:
+        """
+        Yields blocks of profiles of ``users``, each with the customer_value
+        it was paired with.
+
+        The (value, asid) pairs travel as an external table joined on the
+        server, so the query size does not grow with the source and values
+        cannot drift onto another person's row.
+        """
+        if not users:
+            return
+
+        data = "\n".join(
+            f"{asid}\t{TSV_NULL if value is None else value}"
+            for value, asid in users
+        ).encode()
+        external_data = ExternalData(
+            file_name=f"{SOURCE_VALUES_TABLE}.tsv",
+            data=data,
+            fmt="TabSeparated",
+            structure="asid UUID, customer_value Nullable(Decimal(20, 5))",
+        )
+
+        columns = ", ".join(
+            f"enrichment_users.{column} AS {column}"
+            for column in selected_columns
+        )
+        query = (
+            f"SELECT {columns}, {SOURCE_VALUES_TABLE}.customer_value "
+            f"AS customer_value FROM enrichment_users "
+            f"INNER JOIN {SOURCE_VALUES_TABLE} "
+            f"ON enrichment_users.asid = {SOURCE_VALUES_TABLE}.asid "
+            f"WHERE enrichment_users.asid IN "
+            f"(SELECT asid FROM {SOURCE_VALUES_TABLE})"
+        )
+
+        with self.clickhouse.query_row_block_stream(
+            query,
+            external_data=external_data,
+            settings={"max_block_size": PROFILE_BLOCK_SIZE},
+        ) as stream:
+            column_names = stream.source.column_names
+            for block in stream:
+                yield [
+                    with_zip_code5(dict(zip(column_names, row)))
+                    for row in block
+                ]
+
+    def iter_profiles_from_lookalike(
         self, audience_lookalike: AudienceLookalikes
-    ) -> List[dict]:
+    ) -> Iterator[List[dict]]:
         column_names = self.column_selector.clickhouse_columns(
             audience_lookalike.significant_fields
         )
@@ -79,16 +137,16 @@ class ClickhouseProfileFetcher(ProfileFetcherInterface):
             self.db, audience_lookalike.source_uuid
         )
 
-        customer_values = [customer[0] for customer in users]
-        asids = [user[1] for user in users]
-
-        profiles = self.fetch_profiles(column_names, asids)
+        return self.stream_profiles_with_values(column_names, users)
 
-        profiles = [
-            {**profile, "customer_value": customer_value}
-            for customer_value, profile in zip(customer_values, profiles)
+    def fetch_profiles_from_lookalike(
+        self, audience_lookalike: AudienceLookalikes
+    ) -> List[dict]:
+        return [
+            profile
+            for block in self.iter_profiles_from_lookalike(audience_lookalike)
+            for profile in block
         ]
-        return profiles
 
     def parse_clickhouse_result(
         self, clickhouse_result: QueryResult
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Iterator, List
 from models import AudienceLookalikes
 
 
@@ -15,3 +15,12 @@ class ProfileFetcherInterface(ABC):
         self, audience_lookalike: AudienceLookalikes
     ) -> List[dict]:
         pass
+
+    @abstractmethod
+    def iter_profiles_from_lookalike(
+        self, audience_lookalike: AudienceLookalikes
+    ) -> Iterator[List[dict]]:
+        """
+        Same profiles as fetch_profiles_from_lookalike, in blocks
+        """
+        pass
@@ -2,9 +2,10 @@ import logging
 import time
 import psycopg2
 
-from typing import Callable, List, Any, TypeVar
+from typing import Callable, List, Any, Sequence, TypeVar
 from uuid import UUID
 
+import numpy as np
 from catboost import CatBoostRegressor
 
 from pandas import DataFrame
@@ -38,6 +39,7 @@ logger = logging.getLogger(__name__)
 
 T = TypeVar("T")
 
+
 def is_uuid(value):
     try:
         UUID(str(value))
@@ -61,6 +63,79 @@ def measure_print(func, prefix):
     return result
 
 
+class TopScores:
+    """
+    Streaming top-N of (asid, score) pairs that keeps the best score of
+    every asid.
+
+    Candidates at or below the current N-th best score are dropped with one
+    vectorized comparison, so after warm-up a batch costs little more than
+    that comparison. Accepted rows are appended until there are 2 * N of
+    them, then trimmed back to N with ``np.argpartition``.
+    """
+
+    def __init__(self, top_n: int):
+        self.top_n = top_n
+        self._asids: list[UUID] = []
+        self._scores = np.empty(0, dtype=np.float64)
+        self._positions: dict[UUID, int] = {}
+        self._threshold = -np.inf
+
+    def __len__(self) -> int:
+        return min(len(self._asids), self.top_n)
+
+    def push(self, asids: Sequence[UUID], scores: Sequence[float]):
+        if self.top_n <= 0:
+            return
+        scores = np.asarray(scores, dtype=np.float64)
+        candidates = np.flatnonzero(scores > self._threshold)
+        if not len(candidates):
+            return
+
+        stored_count = len(self._asids)
+        new_asids: list[UUID] = []
+        new_scores: list[float] = []
+        for i, score in zip(candidates.tolist(), scores[candidates].tolist()):
+            asid = asids[i]
+            position = self._positions.get(asid)
+            if position is None:
+                self._positions[asid] = stored_count + len(new_asids)
+                new_asids.append(asid)
+                new_scores.append(score)
+            elif position < stored_count:
+                if score > self._scores[position]:
+                    self._scores[position] = score
+            elif score > new_scores[position - stored_count]:
+                new_scores[position - stored_count] = score
+
+        self._asids.extend(new_asids)
+        self._scores = np.concatenate([self._scores, new_scores])
+        if len(self._asids) >= 2 * self.top_n:
+            self._trim()
+
+    def push_scores(self, scores: Sequence[PersonScore]):
+        if scores:
+            asids, values = zip(*scores)
+            self.push(asids, values)
+
+    def _trim(self):
+        keep = np.argpartition(-self._scores, self.top_n - 1)[: self.top_n]
+        self._asids = [self._asids[i] for i in keep.tolist()]
+        self._scores = self._scores[keep]
+        self._positions = {asid: i for i, asid in enumerate(self._asids)}
+        self._threshold = self._scores.min()
+
+    def result(self) -> list[PersonScore]:
+        """
+        Best scores first, at most ``top_n`` of them.
+        """
+        order = np.argsort(-self._scores, kind="stable")[: self.top_n]
+        return [
+            (self._asids[i], score)
+            for i, score in zip(order.tolist(), self._scores[order].tolist())
+        ]
+
+
 @injectable
 class SimilarAudiencesScoresService:
     enrichment_models_persistence: EnrichmentModelsPersistence
@@ -89,9 +164,14 @@ class SimilarAudiencesScoresService:
         self.db = db
 
     def save_enrichment_model(
-        self, lookalike_id: UUID, model: CatBoostRegressor
+        self,
+        lookalike_id: UUID,
+        model: CatBoostRegressor,
+        cache_key: str | None = None,
     ):
-        return self.enrichment_models_persistence.save(lookalike_id, model)
+        return self.enrichment_models_persistence.save(
+            lookalike_id, model, cache_key=cache_key
+        )
 
     @deprecated("deprecated")
     def calculate_scores(
@@ -244,15 +324,10 @@ class SimilarAudiencesScoresService:
         new_scores: list[tuple[UUID, float]],
         top_n: int,
     ) -> list[PersonScore]:
-        combined = {}
-
-        for uuid_, score in old_scores + new_scores:
-            if uuid_ not in combined or score > combined[uuid_]:
-                combined[uuid_] = score
-
-        return sorted(combined.items(), key=lambda x: x[1], reverse=True)[
-            :top_n
-        ]
+        top_scores = TopScores(top_n)
+        top_scores.push_scores(old_scores)
+        top_scores.push_scores(new_scores)
+        return top_scores.result()
 
     def prepare_config(self, lookalike_id: UUID) -> NormalizationConfig:
         lookalike = self.lookalikes.get_lookalike(lookalike_id)
@@ -54,20 +54,25 @@ class SimilarAudienceService:
         config: NormalizationConfig,
         random_seed: int = 42,
     ) -> CatBoostRegressor:
-        if len(audience_data) == 0:
-            raise EmptyTrainDataset("Empty train dataset")
-
-        df = pd.DataFrame(audience_data)
-        data, customer_value = (
-            self.audience_data_normalization_service.normalize_dataframe(
-                df, config
-            )
+        data, customer_value = self.normalize_training_data(
+            audience_data, config
         )
         model = self.train_catboost(
             data, customer_value, random_seed=random_seed
         )
         return model
 
+    def normalize_training_data(
+        self, audience_data: List[dict], config: NormalizationConfig
+    ) -> tuple[DataFrame, DataFrame]:
+        if len(audience_data) == 0:
+            raise EmptyTrainDataset("Empty train dataset")
+
+        df = pd.DataFrame(audience_data)
+        return self.audience_data_normalization_service.normalize_dataframe(
+            df, config
+        )
+
     def get_audience_feature_importance_with_config(
         self,
         audience_data: List[dict],
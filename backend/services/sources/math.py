@@ -1,5 +1,7 @@
 from decimal import Decimal
 
+import numpy as np
+
 
 class AudienceSourceMath:
     @staticmethod
@@ -25,6 +27,14 @@ class AudienceSourceMath:
             else Decimal("0.0")
         )
 
+    @staticmethod
+    def normalize_array(
+        values: np.ndarray, min_val: float, max_val: float, coefficient=1.0
+    ) -> np.ndarray:
+        if not max_val > min_val:
+            return np.zeros(len(values), dtype=np.float64)
+        return coefficient * ((values - min_val) / (max_val - min_val))
+
     @staticmethod
     def inverted_float(value: float) -> float:
         return 1 / (value + 1) if value != -1 else float("inf")
@@ -37,6 +47,11 @@ class AudienceSourceMath:
             else Decimal("Infinity")
         )
 
+    @staticmethod
+    def inverted_array(values: np.ndarray) -> np.ndarray:
+        with np.errstate(divide="ignore"):
+            return 1.0 / (values + 1.0)
+
     @staticmethod
     def weighted_score(
         first_data: Decimal,
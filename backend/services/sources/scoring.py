@@ -0,0 +1,487 @@
+"""
+Batch versions of the value score formulas of bin/audience_source_agent.py.
+
+A whole chunk of persons is scored with NumPy in float64. The score columns
+of audience_sources_matched_persons are DECIMAL(20, 5), so results are
+rounded the way Postgres stores the Decimal result of the per-person
+formula: to 5 places, half away from zero. Rows whose float result is
+within its error bound of a rounding tie, or is not finite, are recomputed
+with the per-person Decimal formula, which keeps the stored values
+identical. The ``*_decimal`` functions are those per-person formulas.
+"""
+
+from decimal import Decimal
+from typing import Callable, Sequence
+
+import numpy as np
+
+from services.sources.agent import ProfContact
+from services.sources.math import AudienceSourceMath
+
+SCORE_PLACES = 5
+_SCALE = 10.0**SCORE_PLACES
+_EPS = float(np.finfo(np.float64).eps)
+# Decimal keeps 28 digits, this covers it in units of the last stored place
+_MIN_TOLERANCE = 1e-6
+
+Score = float | Decimal
+
+JOB_LEVEL_WEIGHTS = {
+    "Executive": Decimal("1.0"),
+    "Senior": Decimal("0.8"),
+    "Manager": Decimal("0.6"),
+    "Entry": Decimal("0.4"),
+}
+DEPARTMENT_WEIGHTS = {
+    "Sales": Decimal("1.0"),
+    "Marketing": Decimal("0.8"),
+    "Engineering": Decimal("0.6"),
+}
+COMPANY_SIZE_WEIGHTS = {
+    "1000+": Decimal("1.0"),
+    "501-1000": Decimal("0.8"),
+    "101-500": Decimal("0.6"),
+    "51-100": Decimal("0.4"),
+}
+
+
+def round_scores(
+    values: np.ndarray, error: float, exact: Callable[[int], Decimal]
+) -> list[Score]:
+    """
+    Rounds ``values`` half away from zero to SCORE_PLACES. Rows that are
+    not finite or lie within ``error`` of a rounding tie take
+    ``exact(row)`` instead.
+    """
+    magnitude = np.abs(values) * _SCALE
+    with np.errstate(invalid="ignore"):
+        distance_to_tie = np.abs(magnitude - np.floor(magnitude) - 0.5)
+        unsafe = ~np.isfinite(values) | (
+            distance_to_tie <= error * _SCALE + _MIN_TOLERANCE
+        )
+        rounded = np.copysign(np.floor(magnitude + 0.5), values) / _SCALE
+
+    result: list[Score] = rounded.tolist()
+    for row in np.flatnonzero(unsafe):
+        result[row] = exact(int(row))
+    return result
+
+
+def _max_abs(values: np.ndarray) -> float:
+    finite = values[np.isfinite(values)]
+    return float(np.max(np.abs(finite))) if len(finite) else 0.0
+
+
+def _inverted(values: np.ndarray) -> tuple[np.ndarray, float]:
+    """
+    AudienceSourceMath.inverted_array and a bound of its float64 error
+    """
+    inverted = AudienceSourceMath.inverted_array(values)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative = _EPS * ((2 * np.abs(values) + 1) / np.abs(values + 1) + 1)
+    return inverted, 2 * _max_abs(np.abs(inverted) * relative)
+
+
+def _normalize(
+    values: np.ndarray,
+    values_error: float,
+    min_val: Decimal,
+    max_val: Decimal,
+    coefficient: Decimal = Decimal("1.0"),
+) -> tuple[np.ndarray, float]:
+    """
+    AudienceSourceMath.normalize_array and a bound of its float64 error,
+    with the min/max comparison done on the Decimal bounds
+    """
+    if not max_val > min_val:
+        return np.zeros(len(values), dtype=np.float64), 0.0
+
+    low, high = float(min_val), float(max_val)
+    span = high - low
+    if not span > 0:
+        # bounds too close for float64, every row goes the Decimal way
+        return np.full(len(values), np.nan), 0.0
+
+    scale = _max_abs(values) + abs(low) + abs(high)
+    error = (2 * _EPS * scale + values_error) / span + (scale / span) * (
+        2 * _EPS * scale / span + _EPS
+    )
+    normalized = AudienceSourceMath.normalize_array(
+        values, low, high, float(coefficient)
+    )
+    return normalized, 2 * abs(float(coefficient)) * error
+
+
+def _as_array(values: Sequence[float | None]) -> np.ndarray:
+    return np.array(
+        [np.nan if value is None else value for value in values],
+        dtype=np.float64,
+    )
+
+
+def failed_leads_decimal(
+    recency: float | None, inverted_min: Decimal, inverted_max: Decimal
+) -> tuple[Decimal, Decimal]:
+    """
+    Returns inverted_recency and value_score of one failed lead
+    """
+    current_recency = (
+        Decimal(str(recency)) if recency is not None else Decimal("0.0")
+    )
+    inverted_recency = AudienceSourceMath.inverted_decimal(current_recency)
+    value_score = AudienceSourceMath.normalize_decimal(
+        value=inverted_recency, min_val=inverted_min, max_val=inverted_max
+    )
+    return inverted_recency, value_score
+
+
+def score_failed_leads(
+    recencies: Sequence[float | None],
+    inverted_min: Decimal,
+    inverted_max: Decimal,
+) -> dict[str, list[Score]]:
+    values = np.nan_to_num(_as_array(recencies), nan=0.0)
+    inverted, inverted_error = _inverted(values)
+    value_score, value_error = _normalize(
+        inverted, inverted_error, inverted_min, inverted_max
+    )
+
+    def exact(row: int) -> tuple[Decimal, Decimal]:
+        return failed_leads_decimal(recencies[row], inverted_min, inverted_max)
+
+    return {
+        "inverted_recency": round_scores(
+            inverted, inverted_error, lambda row: exact(row)[0]
+        ),
+        "value_score": round_scores(
+            value_score, value_error, lambda row: exact(row)[1]
+        ),
+    }
+
+
+def interest_leads_decimal(
+    recency: float | None,
+    count: int,
+    inverted_min: Decimal,
+    inverted_max: Decimal,
+    min_count: Decimal,
+    max_count: Decimal,
+) -> tuple[Decimal, Decimal, Decimal, Decimal]:
+    """
+    Returns inverted_recency, recency_score, view_score and value_score of
+    one interest lead
+    """
+    current_recency = (
+        Decimal(str(recency)) if recency is not None else Decimal("0.0")
+    )
+    inverted_recency = AudienceSourceMath.inverted_decimal(
+        value=current_recency
+    )
+    recency_normalized = AudienceSourceMath.normalize_decimal(
+        value=inverted_recency,
+        min_val=inverted_min,
+        max_val=inverted_max,
+        coefficient=Decimal("0.5"),
+    )
+    orders_count_score = AudienceSourceMath.normalize_decimal(
+        value=Decimal(str(count)),
+        min_val=min_count,
+        max_val=max_count,
+        coefficient=Decimal("0.5"),
+    )
+    return (
+        inverted_recency,
+        recency_normalized,
+        orders_count_score,
+        recency_normalized + orders_count_score,
+    )
+
+
+def score_interest_leads(
+    recencies: Sequence[float | None],
+    counts: Sequence[int],
+    inverted_min: Decimal,
+    inverted_max: Decimal,
+    min_count: Decimal,
+    max_count: Decimal,
+) -> dict[str, list[Score]]:
+    values = np.nan_to_num(_as_array(recencies), nan=0.0)
+    inverted, inverted_error = _inverted(values)
+    recency_score, recency_error = _normalize(
+        inverted, inverted_error, inverted_min, inverted_max, Decimal("0.5")
+    )
+    view_score, view_error = _normalize(
+        np.array(counts, dtype=np.float64),
+        0.0,
+        min_count,
+        max_count,
+        Decimal("0.5"),
+    )
+    value_score = recency_score + view_score
+    value_error = recency_error + view_error + 2 * _EPS * _max_abs(value_score)
+
+    def exact(row: int) -> tuple[Decimal, Decimal, Decimal, Decimal]:
+        return interest_leads_decimal(
+            recencies[row],
+            counts[row],
+            inverted_min,
+            inverted_max,
+            min_count,
+            max_count,
+        )
+
+    return {
+        "inverted_recency": round_scores(
+            inverted, inverted_error, lambda row: exact(row)[0]
+        ),
+        "recency_score": round_scores(
+            recency_score, recency_error, lambda row: exact(row)[1]
+        ),
+        "view_score": round_scores(
+            view_score, view_error, lambda row: exact(row)[2]
+        ),
+        "value_score": round_scores(
+            value_score, value_error, lambda row: exact(row)[3]
+        ),
+    }
+
+
+def customer_conversion_b2c_decimal(
+    amount: float,
+    recency: float | None,
+    amount_min: Decimal,
+    amount_max: Decimal,
+    inverted_min: Decimal,
+    inverted_max: Decimal,
+    with_recency: bool,
+) -> tuple[Decimal, Decimal, Decimal, Decimal]:
+    """
+    Returns inverted_recency, recency_score, sum_score and value_score of
+    one B2C customer conversion
+    """
+    amt = Decimal(str(amount or 0))
+    if amount_max == amount_min:
+        amt_score = Decimal("0.5")
+    else:
+        amt_score = AudienceSourceMath.normalize_decimal(
+            value=amt, min_val=amount_min, max_val=amount_max
+        )
+
+    if with_recency:
+        if recency is None or Decimal(str(recency)) <= 0:
+            # without date -> worst case
+            rec_score = Decimal("0")
+            inv = inverted_min
+        else:
+            inv = AudienceSourceMath.inverted_decimal(Decimal(str(recency)))
+            inv = min(max(inv, inverted_min), inverted_max)
+            rec_score = AudienceSourceMath.normalize_decimal(
+                value=inv, min_val=inverted_min, max_val=inverted_max
+            )
+        w1, w2 = Decimal("0.6"), Decimal("0.4")
+    else:
+        rec_score = Decimal("0")
+        inv = Decimal("0")
+        w1, w2 = Decimal("0.0"), Decimal("1.0")
+
+    lead_value = w1 * rec_score + w2 * amt_score
+    lead_value = min(max(lead_value, Decimal("0.0")), Decimal("1.0"))
+    return inv, rec_score, amt_score, lead_value
+
+
+def score_customer_conversion_b2c(
+    amounts: Sequence[float],
+    recencies: Sequence[float | None],
+    amount_min: Decimal,
+    amount_max: Decimal,
+    inverted_min: Decimal,
+    inverted_max: Decimal,
+) -> dict[str, list[Score]]:
+    """
+    ``amount_min`` <= ``amount_max`` and ``inverted_min`` <= ``inverted_max``
+    """
+    size = len(amounts)
+    values = _as_array(recencies)
+    with_recency = bool(np.any(values > 0))
+
+    if amount_max == amount_min:
+        amt_score, amt_error = np.full(size, 0.5), 0.0
+    else:
+        amt_score, amt_error = _normalize(
+            np.nan_to_num(_as_array(amounts), nan=0.0),
+            0.0,
+            amount_min,
+            amount_max,
+        )
+
+    if with_recency:
+        low, high = float(inverted_min), float(inverted_max)
+        missing = ~(values > 0)
+        inverted, inverted_error = _inverted(np.where(missing, 0.0, values))
+        inverted = np.clip(inverted, low, high)
+        rec_score, rec_error = _normalize(
+            inverted, inverted_error, inverted_min, inverted_max
+        )
+        inverted[missing] = low
+        rec_score[missing] = 0.0
+        w1, w2 = 0.6, 0.4
+    else:
+        inverted, inverted_error = np.zeros(size), 0.0
+        rec_score, rec_error = np.zeros(size), 0.0
+        w1, w2 = 0.0, 1.0
+
+    lead_value = np.clip(w1 * rec_score + w2 * amt_score, 0.0, 1.0)
+    lead_error = (
+        w1 * rec_error + w2 * amt_error + 4 * _EPS * (_max_abs(lead_value) + 1)
+    )
+
+    def exact(row: int) -> tuple[Decimal, Decimal, Decimal, Decimal]:
+        return customer_conversion_b2c_decimal(
+            amounts[row],
+            recencies[row],
+            amount_min,
+            amount_max,
+            inverted_min,
+            inverted_max,
+            with_recency,
+        )
+
+    return {
+        "inverted_recency": round_scores(
+            inverted, inverted_error, lambda row: exact(row)[0]
+        ),
+        "recency_score": round_scores(
+            rec_score, rec_error, lambda row: exact(row)[1]
+        ),
+        "sum_score": round_scores(
+            amt_score, amt_error, lambda row: exact(row)[2]
+        ),
+        "value_score": round_scores(
+            lead_value, lead_error, lambda row: exact(row)[3]
+        ),
+    }
+
+
+def professional_scores(prof: ProfContact | None) -> tuple[Decimal, Decimal]:
+    """
+    Returns the professional and completeness scores of a B2B contact
+    """
+    job_level = getattr(prof, "job_level", None)
+    department = getattr(prof, "department", None)
+    company_size = getattr(prof, "company_size", None)
+
+    professional_score = (
+        Decimal("0.5") * JOB_LEVEL_WEIGHTS.get(job_level, Decimal("0.2"))
+        + Decimal("0.3") * DEPARTMENT_WEIGHTS.get(department, Decimal("0.4"))
+        + Decimal("0.2")
+        * COMPANY_SIZE_WEIGHTS.get(company_size, Decimal("0.2"))
+    )
+
+    completeness_score = Decimal("0.0")
+    if (
+        prof
+        and prof.business_email
+        and prof.business_email_validation_status == "Valid"
+    ):
+        completeness_score += Decimal("0.4")
+    if prof and prof.linkedin_url:
+        completeness_score += Decimal("0.3")
+    if job_level:
+        completeness_score += Decimal("0.2")
+    if department:
+        completeness_score += Decimal("0.1")
+    return professional_score, completeness_score
+
+
+def customer_conversion_b2b_decimal(
+    recency: float | None,
+    sentinel_recency: Decimal,
+    professional_score: Decimal,
+    completeness_score: Decimal,
+    inverted_min: Decimal,
+    inverted_max: Decimal,
+    with_recency: bool,
+) -> tuple[Decimal, Decimal, Decimal]:
+    """
+    Returns inverted_recency, recency_score and value_score of one B2B
+    customer conversion
+    """
+    if with_recency:
+        recency_inv = AudienceSourceMath.inverted_decimal(
+            Decimal(recency) if recency is not None else sentinel_recency
+        )
+        recency_score = AudienceSourceMath.normalize_decimal(
+            recency_inv, inverted_min, inverted_max
+        )
+        w_rec, w_prof, w_comp = Decimal("0.4"), Decimal("0.4"), Decimal("0.2")
+    else:
+        recency_inv = Decimal("0")
+        recency_score = Decimal("0")
+        w_rec, w_prof, w_comp = (
+            Decimal("0.0"),
+            Decimal("0.67"),
+            Decimal("0.33"),
+        )
+
+    value_score = (
+        w_rec * recency_score
+        + w_prof * professional_score
+        + w_comp * completeness_score
+    )
+    return recency_inv, recency_score, value_score
+
+
+def score_customer_conversion_b2b(
+    recencies: Sequence[float | None],
+    sentinel_recency: Decimal,
+    professional: Sequence[Decimal],
+    completeness: Sequence[Decimal],
+    inverted_min: Decimal,
+    inverted_max: Decimal,
+) -> dict[str, list[Score]]:
+    size = len(recencies)
+    values = _as_array(recencies)
+    with_recency = bool(np.any(values > 0))
+
+    if with_recency:
+        inverted, inverted_error = _inverted(
+            np.where(np.isnan(values), float(sentinel_recency), values)
+        )
+        rec_score, rec_error = _normalize(
+            inverted, inverted_error, inverted_min, inverted_max
+        )
+        w_rec, w_prof, w_comp = 0.4, 0.4, 0.2
+    else:
+        inverted, inverted_error = np.zeros(size), 0.0
+        rec_score, rec_error = np.zeros(size), 0.0
+        w_rec, w_prof, w_comp = 0.0, 0.67, 0.33
+
+    value_score = (
+        w_rec * rec_score
+        + w_prof * np.array(professional, dtype=np.float64)
+        + w_comp * np.array(completeness, dtype=np.float64)
+    )
+    value_error = w_rec * rec_error + 8 * _EPS * (_max_abs(value_score) + 1)
+
+    def exact(row: int) -> tuple[Decimal, Decimal, Decimal]:
+        return customer_conversion_b2b_decimal(
+            recencies[row],
+            sentinel_recency,
+            professional[row],
+            completeness[row],
+            inverted_min,
+            inverted_max,
+            with_recency,
+        )
+
+    return {
+        "inverted_recency": round_scores(
+            inverted, inverted_error, lambda row: exact(row)[0]
+        ),
+        "recency_score": round_scores(
+            rec_score, rec_error, lambda row: exact(row)[1]
+        ),
+        "value_score": round_scores(
+            value_score, value_error, lambda row: exact(row)[2]
+        ),
+    }
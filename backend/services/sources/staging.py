@@ -0,0 +1,205 @@
+import csv
+import io
+import logging
+from datetime import datetime, timezone
+from typing import Iterable, NamedTuple
+from uuid import UUID
+
+from sqlalchemy import (
+    DECIMAL,
+    TIMESTAMP,
+    UUID as SA_UUID,
+    VARCHAR,
+    Column,
+    Integer,
+    MetaData,
+    Table,
+    and_,
+    case,
+    exists,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, aliased
+
+from models.audience_sources_matched_persons import AudienceSourcesMatchedPerson
+
+logger = logging.getLogger(__name__)
+
+STAGING_TABLE = "audience_sources_matched_persons_staging"
+
+staging = Table(
+    STAGING_TABLE,
+    MetaData(),
+    Column("email", VARCHAR(64)),
+    Column("enrichment_user_asid", SA_UUID(as_uuid=True)),
+    Column("count", Integer),
+    Column("amount", DECIMAL),
+    Column("start_date", TIMESTAMP),
+    Column("recency", Integer),
+)
+
+# temporary tables skip the WAL like unlogged ones, and ON COMMIT keeps
+# the pooled connection's copy empty between batches
+CREATE_STAGING = text(
+    f"CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} ("
+    "email VARCHAR(64), enrichment_user_asid UUID NOT NULL, "
+    "count INTEGER NOT NULL, amount NUMERIC, start_date TIMESTAMP, "
+    "recency INTEGER) ON COMMIT DELETE ROWS"
+)
+
+
+class StagedPerson(NamedTuple):
+    email: str | None
+    enrichment_user_asid: str
+    count: int
+    amount: object
+    start_date: datetime | None
+    recency: int | None
+
+
+def copy_staged_persons(db_session: Session, persons: Iterable[StagedPerson]):
+    """
+    Streams the batch into the staging table with COPY.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for person in persons:
+        writer.writerow(
+            (
+                person.email,
+                person.enrichment_user_asid,
+                person.count,
+                person.amount,
+                person.start_date.isoformat() if person.start_date else None,
+                person.recency,
+            )
+        )
+    buffer.seek(0)
+
+    db_session.execute(CREATE_STAGING)
+    cursor = db_session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} (email, enrichment_user_asid, count, "
+            "amount, start_date, recency) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def merge_staged_persons(
+    db_session: Session, source_id: UUID | str, include_amount: bool
+) -> int:
+    """
+    Merges the staging table into audience_sources_matched_persons and
+    returns the number of inserted persons.
+
+    An existing person of the source with the same email wins over the
+    staged asid, as the per-row matching did: the staged row is moved to
+    its asid, or the asid is filled in when the person has none. The rest
+    is one INSERT ... ON CONFLICT (source_id, enrichment_user_asid) that
+    adds up count and amount and keeps the latest start_date.
+    """
+    source_id = UUID(str(source_id))
+    matched = AudienceSourcesMatchedPerson
+    other = aliased(AudienceSourcesMatchedPerson)
+    by_email = and_(
+        matched.source_id == source_id,
+        matched.email == staging.c.email,
+    )
+
+    db_session.execute(
+        update(staging)
+        .where(
+            by_email,
+            matched.enrichment_user_asid.is_not(None),
+            matched.enrichment_user_asid != staging.c.enrichment_user_asid,
+        )
+        .values(enrichment_user_asid=matched.enrichment_user_asid),
+        execution_options={"synchronize_session": False},
+    )
+    db_session.execute(
+        update(matched)
+        .where(
+            by_email,
+            matched.enrichment_user_asid.is_(None),
+            ~exists().where(
+                other.source_id == source_id,
+                other.enrichment_user_asid == staging.c.enrichment_user_asid,
+            ),
+        )
+        .values(enrichment_user_asid=staging.c.enrichment_user_asid),
+        execution_options={"synchronize_session": False},
+    )
+
+    # several staged rows can land on one asid after the email remap, and
+    # ON CONFLICT may touch a row only once per statement. Recency falls
+    # with start_date, so the smallest one belongs to the latest date.
+    grouped = (
+        select(
+            literal(source_id, SA_UUID(as_uuid=True)).label("source_id"),
+            func.min(staging.c.email).label("email"),
+            func.sum(staging.c.count).label("count"),
+            (
+                func.sum(staging.c.amount)
+                if include_amount
+                else literal(None, Integer)
+            ).label("amount"),
+            func.max(staging.c.start_date).label("start_date"),
+            func.min(staging.c.recency).label("recency"),
+            staging.c.enrichment_user_asid,
+        )
+        .group_by(staging.c.enrichment_user_asid)
+        # a stable lock order keeps concurrent agents from deadlocking
+        .order_by(staging.c.enrichment_user_asid)
+    )
+    stmt = insert(matched).from_select(
+        [
+            "source_id",
+            "email",
+            "count",
+            "amount",
+            "start_date",
+            "recency",
+            "enrichment_user_asid",
+        ],
+        grouped,
+    )
+    newer = and_(
+        stmt.excluded.start_date.is_not(None),
+        or_(
+            matched.start_date.is_(None),
+            stmt.excluded.start_date > matched.start_date,
+        ),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["source_id", "enrichment_user_asid"],
+        set_={
+            "count": matched.count + stmt.excluded.count,
+            "amount": (
+                func.coalesce(matched.amount, 0)
+                + func.coalesce(stmt.excluded.amount, 0)
+                if include_amount
+                else None
+            ),
+            "start_date": case(
+                (newer, stmt.excluded.start_date), else_=matched.start_date
+            ),
+            "recency": case(
+                (newer, stmt.excluded.recency), else_=matched.recency
+            ),
+            "email": func.coalesce(matched.email, stmt.excluded.email),
+            "updated_at": datetime.now(timezone.utc).replace(tzinfo=None),
+        },
+    ).returning(literal_column("xmax = 0"))
+
+    inserted = db_session.execute(stmt).scalars().all()
+    return sum(inserted)
@@ -0,0 +1,164 @@
+import logging
+from dataclasses import dataclass
+from urllib.parse import parse_qs, urlparse
+
+from persistence.integrations.suppression import (
+    IntegrationsSuppressionPersistence,
+)
+from persistence.suppression_persistence import SuppressionPersistence
+from resolver import injectable
+from utils import compile_certain_urls, match_certain_urls
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DomainSuppressionSnapshot:
+    domain_id: int
+    suppressed_emails: frozenset[str] = frozenset()
+    integration_suppressed_emails: frozenset[str] = frozenset()
+    certain_urls: list[str] | None = None
+    based_urls: frozenset[str] | None = None
+
+    @property
+    def requires_confirmation(self) -> bool:
+        return self.certain_urls is not None or self.based_urls is not None
+
+    def find_suppressed_email(self, emails: list[str]) -> str | None:
+        if not self.suppressed_emails:
+            return None
+        for email in emails:
+            if email in self.suppressed_emails:
+                return email
+        return None
+
+    def is_suppressed_by_integration(self, emails: list[str]) -> bool:
+        return not self.integration_suppressed_emails.isdisjoint(emails)
+
+    def matches_certain_urls(self, page: str) -> bool:
+        return self.certain_urls is not None and match_certain_urls(
+            page, self.certain_urls
+        )
+
+    def matches_based_urls(self, page: str) -> bool:
+        if self.based_urls is None:
+            return False
+        query_params = parse_qs(urlparse(page).query)
+        return any(
+            not self.based_urls.isdisjoint(values)
+            for values in query_params.values()
+        )
+
+
+@injectable
+class SuppressionSnapshotService:
+    """
+    Per-domain suppression rules, lists and integration suppressions, loaded
+    on first use and kept until ``refresh`` sees that they changed.
+
+    ``refresh`` compares cheap fingerprints of the rules and lists tables and
+    the newest integration suppression id, so it is meant to be called once
+    per processing cycle rather than per lead.
+    """
+
+    def __init__(
+        self,
+        suppression_persistence: SuppressionPersistence,
+        integrations_suppression_persistence: IntegrationsSuppressionPersistence,
+    ):
+        self.suppression_persistence = suppression_persistence
+        self.integrations_suppression_persistence = (
+            integrations_suppression_persistence
+        )
+        self._snapshots: dict[int, DomainSuppressionSnapshot] = {}
+        self._rule_fingerprints: dict[int, str] = {}
+        self._list_fingerprints: dict[int, tuple[int, int, int]] = {}
+        self._integration_ids: set[int] | None = None
+        self._last_integration_suppression_id = 0
+
+    def invalidate(self, domain_id: int | None = None):
+        if domain_id is None:
+            self._snapshots.clear()
+        else:
+            self._snapshots.pop(domain_id, None)
+
+    def refresh(self):
+        rule_fingerprints = self.suppression_persistence.get_rule_fingerprints()
+        list_fingerprints = self.suppression_persistence.get_list_fingerprints()
+        changed = {
+            domain_id
+            for domain_id in rule_fingerprints.keys() | self._rule_fingerprints
+            if rule_fingerprints.get(domain_id)
+            != self._rule_fingerprints.get(domain_id)
+        } | {
+            domain_id
+            for domain_id in list_fingerprints.keys() | self._list_fingerprints
+            if list_fingerprints.get(domain_id)
+            != self._list_fingerprints.get(domain_id)
+        }
+        self._rule_fingerprints = rule_fingerprints
+        self._list_fingerprints = list_fingerprints
+
+        persistence = self.integrations_suppression_persistence
+        last_integration_suppression_id = persistence.get_max_id()
+        integration_ids = persistence.get_suppression_integration_ids()
+        if integration_ids != self._integration_ids:
+            self._integration_ids = integration_ids
+            self.invalidate()
+        else:
+            changed |= persistence.get_domain_ids_added_after(
+                self._last_integration_suppression_id
+            )
+        self._last_integration_suppression_id = last_integration_suppression_id
+
+        for domain_id in changed:
+            self.invalidate(domain_id)
+        logger.info(
+            f"Suppression snapshots refreshed: {len(changed)} domains changed, {len(self._snapshots)} cached"
+        )
+
+    def get(self, domain_id: int) -> DomainSuppressionSnapshot:
+        snapshot = self._snapshots.get(domain_id)
+        if snapshot is None:
+            snapshot = self._load(domain_id)
+            self._snapshots[domain_id] = snapshot
+        return snapshot
+
+    def _load(self, domain_id: int) -> DomainSuppressionSnapshot:
+        persistence = self.integrations_suppression_persistence
+        if self._integration_ids is None:
+            self._integration_ids = (
+                persistence.get_suppression_integration_ids()
+            )
+
+        suppressed_emails = set()
+        suppression_lists = (
+            self.suppression_persistence.get_all_suppression_list(domain_id)
+        )
+        for suppression_list in suppression_lists:
+            if suppression_list.total_emails:
+                suppressed_emails.update(
+                    suppression_list.total_emails.split(", ")
+                )
+
+        snapshot = DomainSuppressionSnapshot(domain_id=domain_id)
+        rule = self.suppression_persistence.get_rules(domain_id)
+        if rule:
+            if rule.suppressions_multiple_emails:
+                suppressed_emails.update(
+                    rule.suppressions_multiple_emails.split(", ")
+                )
+            if rule.is_url_certain_activation and rule.activate_certain_urls:
+                snapshot.certain_urls = compile_certain_urls(
+                    rule.activate_certain_urls
+                )
+            if rule.is_based_activation and rule.activate_based_urls:
+                snapshot.based_urls = frozenset(
+                    rule.activate_based_urls.split(", ")
+                )
+
+        snapshot.suppressed_emails = frozenset(suppressed_emails)
+        snapshot.integration_suppressed_emails = frozenset(
+            persistence.get_suppressed_emails(domain_id, self._integration_ids)
+        )
+        return snapshot
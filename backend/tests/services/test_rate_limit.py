@@ -0,0 +1,84 @@
+import unittest
+import os, sys
+
+import httpx
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
+parent_parent_dir = os.path.abspath(os.path.join(parent_dir, os.pardir))
+sys.path.append(parent_parent_dir)
+
+from services.integrations.rate_limit import (
+    RateKey,
+    RateLimit,
+    RateLimiterRegistry,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestRateLimiterRegistry(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.registry = RateLimiterRegistry(
+            limits={"klaviyo": RateLimit(rate=10.0, burst=20.0)},
+            clock=self.clock,
+        )
+        self.key = RateKey.of("klaviyo", "token")
+
+    def test_keys_by_credential(self):
+        self.assertEqual(self.key, RateKey.of("klaviyo", "token"))
+        self.assertNotEqual(self.key, RateKey.of("klaviyo", "other"))
+        self.assertNotIn("token", self.key.credential)
+
+    def test_reserve_spends_burst_then_waits(self):
+        self.assertEqual(0, self.registry.reserve(self.key, 20))
+        self.assertAlmostEqual(0.5, self.registry.reserve(self.key, 5))
+        self.clock.now += 0.5
+        self.assertEqual(0, self.registry.reserve(self.key, 5))
+
+    def test_cost_above_burst_goes_into_debt(self):
+        self.assertEqual(0, self.registry.reserve(self.key, 50))
+        self.assertAlmostEqual(3.1, self.registry.delay(self.key))
+
+    def test_zero_cost_reserve_only_waits_out_backoff(self):
+        self.assertEqual(0, self.registry.reserve(self.key, 0))
+        self.assertEqual(20, self.registry.bucket(self.key).tokens)
+
+        self.registry.throttled(self.key, 30)
+        self.assertAlmostEqual(30, self.registry.reserve(self.key, 0))
+
+    def test_retry_after_blocks_and_halves_rate(self):
+        response = httpx.Response(429, headers={"Retry-After": "30"})
+        self.registry.observe(self.key, response)
+        self.assertAlmostEqual(30, self.registry.delay(self.key))
+        self.assertEqual(5.0, self.registry.bucket(self.key).rate)
+
+        self.clock.now += 30
+        self.registry.observe(self.key, httpx.Response(200))
+        self.assertAlmostEqual(5.625, self.registry.bucket(self.key).rate)
+
+    def test_exhausted_headers_block_until_reset(self):
+        response = httpx.Response(
+            200,
+            headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "12"},
+        )
+        self.registry.observe(self.key, response)
+        self.assertAlmostEqual(12, self.registry.delay(self.key))
+
+    def test_throttled_without_retry_after_backs_off_exponentially(self):
+        self.registry.throttled(self.key)
+        self.assertAlmostEqual(5, self.registry.delay(self.key))
+        self.clock.now += 5
+        self.registry.throttled(self.key)
+        self.assertAlmostEqual(10, self.registry.delay(self.key))
+
+
+if __name__ == "__main__":
+    unittest.main()
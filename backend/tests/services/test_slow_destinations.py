@@ -0,0 +1,106 @@
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import os, sys
+
+import httpx
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
+parent_parent_dir = os.path.abspath(os.path.join(parent_dir, os.pardir))
+sys.path.append(parent_parent_dir)
+
+from enums import ProccessDataSyncResult
+from models.five_x_five_users import FiveXFiveUser
+from services.integrations.webhook import WebhookIntegrationService
+from services.integrations.zapier import ZapierIntegrationService
+
+DESTINATION_SECONDS = 0.3
+
+
+def slow_client() -> httpx.Client:
+    def handler(request: httpx.Request) -> httpx.Response:
+        time.sleep(DESTINATION_SECONDS)
+        return httpx.Response(200)
+
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+
+def service(cls):
+    lead_persistence = MagicMock()
+    lead_persistence.get_visit_stats.return_value = (0, 1)
+    return cls(
+        lead_persistence=lead_persistence,
+        domain_persistence=MagicMock(),
+        sync_persistence=MagicMock(),
+        integration_persistence=MagicMock(),
+        client=slow_client(),
+        million_verifier_integrations=MagicMock(),
+    )
+
+
+def lead():
+    lead_user = SimpleNamespace(id=1, first_visit_id=None)
+    five_x_five_user = FiveXFiveUser(
+        id=1,
+        first_name="Ada",
+        last_name="Lovelace",
+        business_email="ada@example.com",
+    )
+    return [(lead_user, five_x_five_user)]
+
+
+class TestSlowDestinations(unittest.TestCase):
+    """
+    The data sync worker runs many messages on one event loop, so a slow
+    destination must not hold the loop while its request is in flight
+    """
+
+    def assert_does_not_block(self, cls, data_sync):
+        async def run():
+            async def ticker():
+                start = time.perf_counter()
+                await asyncio.sleep(0.01)
+                return time.perf_counter() - start
+
+            integration = service(cls)
+            ticker_task = asyncio.create_task(ticker())
+            results = await asyncio.gather(
+                integration.process_data_sync_lead(
+                    MagicMock(), data_sync, lead(), False
+                ),
+                integration.process_data_sync_lead(
+                    MagicMock(), data_sync, lead(), False
+                ),
+            )
+            return results, await ticker_task
+
+        start = time.perf_counter()
+        results, ticker_seconds = asyncio.run(run())
+        elapsed = time.perf_counter() - start
+
+        for message_results in results:
+            self.assertEqual(
+                ProccessDataSyncResult.SUCCESS.value,
+                message_results[0]["status"],
+            )
+        self.assertLess(ticker_seconds, DESTINATION_SECONDS / 2)
+        self.assertLess(elapsed, DESTINATION_SECONDS * 1.8)
+
+    def test_webhook(self):
+        data_sync = SimpleNamespace(
+            hook_url="https://hooks.example.com/leads",
+            method="POST",
+            data_map=[{"type": "first_name", "value": "first_name"}],
+        )
+        self.assert_does_not_block(WebhookIntegrationService, data_sync)
+
+    def test_zapier(self):
+        data_sync = SimpleNamespace(hook_url="https://hooks.zapier.com/leads")
+        self.assert_does_not_block(ZapierIntegrationService, data_sync)
+
+
+if __name__ == "__main__":
+    unittest.main()
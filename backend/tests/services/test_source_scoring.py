@@ -0,0 +1,296 @@
+import unittest
+import os, sys
+import random
+from decimal import Decimal, ROUND_HALF_UP
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
+parent_parent_dir = os.path.abspath(os.path.join(parent_dir, os.pardir))
+sys.path.append(parent_parent_dir)
+
+from services.sources.agent import ProfContact
+from services.sources.math import AudienceSourceMath
+from services.sources.scoring import (
+    customer_conversion_b2b_decimal,
+    customer_conversion_b2c_decimal,
+    failed_leads_decimal,
+    interest_leads_decimal,
+    professional_scores,
+    score_customer_conversion_b2b,
+    score_customer_conversion_b2c,
+    score_failed_leads,
+    score_interest_leads,
+)
+
+PLACES = Decimal("0.00001")
+
+RECENCIES = [0.0, 1.0, 63.0, 7.5, None, 200.0]
+AMOUNTS = [0.0, 12.5, 250.0, 999.99, 40.0, 1000.0]
+COUNTS = [0, 1, 5, 30, 12, 3]
+INVERTED_MIN = AudienceSourceMath.inverted_decimal(Decimal("200"))
+INVERTED_MAX = AudienceSourceMath.inverted_decimal(Decimal("1"))
+
+
+def stored(value) -> str:
+    """
+    The value as DECIMAL(20, 5) keeps it
+    """
+    return str(Decimal(str(value)).quantize(PLACES, rounding=ROUND_HALF_UP))
+
+
+class TestSourceScoring(unittest.TestCase):
+    """
+    Golden values were produced by the per-person Decimal loops that
+    bin/audience_source_agent.py used before the batch scoring.
+    """
+
+    def assertStored(self, expected: list[str], values: list):
+        self.assertEqual(expected, [stored(value) for value in values])
+
+    def test_failed_leads(self):
+        scores = score_failed_leads(RECENCIES, INVERTED_MIN, INVERTED_MAX)
+        self.assertStored(
+            ["1.00000", "0.50000", "0.01563", "0.11765", "1.00000", "0.00498"],
+            scores["inverted_recency"],
+        )
+        self.assertStored(
+            ["2.01005", "1.00000", "0.02151", "0.22761", "2.01005", "0.00000"],
+            scores["value_score"],
+        )
+
+    def test_interest_leads(self):
+        scores = score_interest_leads(
+            RECENCIES,
+            COUNTS,
+            INVERTED_MIN,
+            INVERTED_MAX,
+            Decimal("0"),
+            Decimal("30"),
+        )
+        self.assertStored(
+            ["1.00503", "0.50000", "0.01076", "0.11380", "1.00503", "0.00000"],
+            scores["recency_score"],
+        )
+        self.assertStored(
+            ["0.00000", "0.01667", "0.08333", "0.50000", "0.20000", "0.05000"],
+            scores["view_score"],
+        )
+        self.assertStored(
+            ["1.00503", "0.51667", "0.09409", "0.61380", "1.20503", "0.05000"],
+            scores["value_score"],
+        )
+
+    def test_customer_conversion_b2c(self):
+        scores = score_customer_conversion_b2c(
+            AMOUNTS,
+            RECENCIES,
+            Decimal("0"),
+            Decimal("1000"),
+            INVERTED_MIN,
+            INVERTED_MAX,
+        )
+        self.assertStored(
+            ["0.00498", "0.50000", "0.01563", "0.11765", "0.00498", "0.00498"],
+            scores["inverted_recency"],
+        )
+        self.assertStored(
+            ["0.00000", "0.01250", "0.25000", "0.99999", "0.04000", "1.00000"],
+            scores["sum_score"],
+        )
+        self.assertStored(
+            ["0.00000", "0.60500", "0.11291", "0.53656", "0.01600", "0.40000"],
+            scores["value_score"],
+        )
+
+    def test_customer_conversion_b2c_same_amounts(self):
+        scores = score_customer_conversion_b2c(
+            [5.0, 5.0],
+            [None, 0.0],
+            Decimal("5"),
+            Decimal("5"),
+            INVERTED_MIN,
+            INVERTED_MAX,
+        )
+        self.assertStored(["0.50000", "0.50000"], scores["sum_score"])
+        self.assertStored(["0.00000", "0.00000"], scores["inverted_recency"])
+        self.assertStored(["0.50000", "0.50000"], scores["value_score"])
+
+    def test_customer_conversion_b2b(self):
+        profiles = [
+            ProfContact(
+                job_level="Executive",
+                department="Sales",
+                company_size="1000+",
+                business_email="x",
+                business_email_validation_status="Valid",
+                linkedin_url="l",
+            ),
+            None,
+            ProfContact(
+                job_level="Manager",
+                department=None,
+                company_size="51-100",
+                business_email=None,
+                business_email_validation_status=None,
+                linkedin_url="l",
+            ),
+            None,
+            None,
+            None,
+        ]
+        professional, completeness = zip(*map(professional_scores, profiles))
+        scores = score_customer_conversion_b2b(
+            RECENCIES,
+            Decimal("200"),
+            professional,
+            completeness,
+            INVERTED_MIN,
+            INVERTED_MAX,
+        )
+        self.assertStored(
+            ["1.00000", "0.26000", "0.50000", "0.26000", "0.26000", "0.26000"],
+            professional,
+        )
+        self.assertStored(
+            ["1.00000", "0.00000", "0.50000", "0.00000", "0.00000", "0.00000"],
+            completeness,
+        )
+        self.assertStored(
+            ["2.01005", "1.00000", "0.02151", "0.22761", "0.00000", "0.00000"],
+            scores["recency_score"],
+        )
+        self.assertStored(
+            ["1.40402", "0.50400", "0.30861", "0.19504", "0.10400", "0.10400"],
+            scores["value_score"],
+        )
+
+    def test_matches_decimal_formulas(self):
+        rng = random.Random(7)
+        size = 5000
+        recencies = [
+            rng.choice(
+                [
+                    None,
+                    0.0,
+                    float(rng.randint(0, 400)),
+                    rng.uniform(0, 200),
+                    round(rng.uniform(0, 50), 3),
+                ]
+            )
+            for _ in range(size)
+        ]
+        amounts = [round(rng.uniform(0, 500), 2) for _ in range(size)]
+        counts = [rng.randint(0, 40) for _ in range(size)]
+        inverted_min, inverted_max = (
+            AudienceSourceMath.inverted_decimal(Decimal("400")),
+            AudienceSourceMath.inverted_decimal(Decimal("0.5")),
+        )
+        min_count, max_count = Decimal("0"), Decimal("40")
+        min_amount, max_amount = Decimal("0"), Decimal("500")
+        professional = [
+            Decimal(rng.choice(["0.26", "0.74", "1.0"])) for _ in range(size)
+        ]
+        completeness = [
+            Decimal(rng.choice(["0.0", "0.3", "0.9"])) for _ in range(size)
+        ]
+
+        failed = score_failed_leads(recencies, inverted_min, inverted_max)
+        interest = score_interest_leads(
+            recencies, counts, inverted_min, inverted_max, min_count, max_count
+        )
+        b2c = score_customer_conversion_b2c(
+            amounts,
+            recencies,
+            min_amount,
+            max_amount,
+            inverted_min,
+            inverted_max,
+        )
+        b2b = score_customer_conversion_b2b(
+            recencies,
+            Decimal("400"),
+            professional,
+            completeness,
+            inverted_min,
+            inverted_max,
+        )
+
+        for row in range(size):
+            expected = failed_leads_decimal(
+                recencies[row], inverted_min, inverted_max
+            )
+            actual = (
+                failed["inverted_recency"][row],
+                failed["value_score"][row],
+            )
+            self.assertEqual(
+                list(map(stored, expected)), list(map(stored, actual))
+            )
+
+            expected = interest_leads_decimal(
+                recencies[row],
+                counts[row],
+                inverted_min,
+                inverted_max,
+                min_count,
+                max_count,
+            )
+            actual = [
+                interest[column][row]
+                for column in (
+                    "inverted_recency",
+                    "recency_score",
+                    "view_score",
+                    "value_score",
+                )
+            ]
+            self.assertEqual(
+                list(map(stored, expected)), list(map(stored, actual))
+            )
+
+            expected = customer_conversion_b2c_decimal(
+                amounts[row],
+                recencies[row],
+                min_amount,
+                max_amount,
+                inverted_min,
+                inverted_max,
+                True,
+            )
+            actual = [
+                b2c[column][row]
+                for column in (
+                    "inverted_recency",
+                    "recency_score",
+                    "sum_score",
+                    "value_score",
+                )
+            ]
+            self.assertEqual(
+                list(map(stored, expected)), list(map(stored, actual))
+            )
+
+            expected = customer_conversion_b2b_decimal(
+                recencies[row],
+                Decimal("400"),
+                professional[row],
+                completeness[row],
+                inverted_min,
+                inverted_max,
+                True,
+            )
+            actual = [
+                b2b[column][row]
+                for column in (
+                    "inverted_recency",
+                    "recency_score",
+                    "value_score",
+                )
+            ]
+            self.assertEqual(
+                list(map(stored, expected)), list(map(stored, actual))
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
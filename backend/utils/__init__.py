@@ -11,6 +11,7 @@ from urllib.parse import urlparse, parse_qs
 import httpx
 import regex
 
+from config.http import get_sync_http_client
 from config.rmq_connection import publish_rabbitmq_message_with_channel
 from config.sentry import SentryConfig
 from domains.leads.entities import DelivrUser
@@ -38,7 +39,7 @@ def get_utc_aware_date():
 
 
 def get_http_client() -> httpx.Client:
-    return httpx.Client()
+    return get_sync_http_client()
 
 
 def get_md5_hash(email):
@@ -260,14 +261,23 @@ def normalize_url(url):
     return normalized_url
 
 
+URL_SCHEME_PREFIX_RE = re.compile(r"^(https?://)?(www\.)?")
+
+
+def compile_certain_urls(activate_certain_urls: str) -> list[str]:
+    return [
+        URL_SCHEME_PREFIX_RE.sub("", url.strip()).strip("/")
+        for url in activate_certain_urls.split(", ")
+    ]
+
+
+def match_certain_urls(page, certain_urls: list[str]) -> bool:
+    page_path = URL_SCHEME_PREFIX_RE.sub("", page).strip("/")
+    return any(url in page_path for url in certain_urls)
+
+
 def check_certain_urls(page, activate_certain_urls):
-    page_path = re.sub(r"^(https?://)?(www\.)?", "", page).strip("/")
-    urls_to_check = activate_certain_urls.split(", ")
-    for url in urls_to_check:
-        url = re.sub(r"^(https?://)?(www\.)?", "", url.strip()).strip("/")
-        if (page_path == url) or (url in page_path):
-            return True
-    return False
+    return match_certain_urls(page, compile_certain_urls(activate_certain_urls))
 
 
 async def send_sse(channel, user_id: int, data: dict):